@@ -0,0 +1,63 @@
+"""Measure the time and memory allocated by each action_is_authorized call.
+
+Builds a graph of actors in overlapping groups with conflicting ALLOW and DENY
+edges, then reports the mean time per check, and the mean peak memory
+allocated during a check as reported by tracemalloc.
+
+Usage:
+
+python benchmarks/authorize_allocations.py
+"""
+import time
+import tracemalloc
+
+from permission_graph import PermissionGraph
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+
+def build_graph() -> tuple[PermissionGraph, list[tuple[Actor, Action]]]:
+    """Return a graph, and the checks to run against it."""
+    actors = [Actor(name=f"actor{i}") for i in range(100)]
+    groups = [Group(name=f"group{i}") for i in range(10)]
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(100)]
+    actions = [Action(name="View", resource_type="Document", resource=r.name) for r in resources]
+    graph = PermissionGraph()
+    graph.bulk_load(
+        actors=actors,
+        groups=groups,
+        resource_types=[ResourceType(name="Document", actions=["View", "Edit"])],
+        resources=resources,
+        memberships=[(actor, groups[i % 10]) for i, actor in enumerate(actors)]
+        + [(actor, groups[(i + 1) % 10]) for i, actor in enumerate(actors)],
+        allows=[(group, action) for group in groups for action in actions[:60]],
+        denies=[(group, action) for group in groups[:5] for action in actions[60:]],
+    )
+    checks = [(actor, action) for actor in actors[:10] for action in actions]
+    return graph, checks
+
+
+def main():
+    graph, checks = build_graph()
+    for actor, action in checks:
+        graph.action_is_authorized(actor, action)
+
+    start = time.perf_counter()
+    for actor, action in checks:
+        graph.action_is_authorized(actor, action)
+    elapsed = time.perf_counter() - start
+
+    peak = 0
+    tracemalloc.start()
+    for actor, action in checks:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        graph.action_is_authorized(actor, action)
+        peak += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    print(f"{elapsed / len(checks) * 1e6:.1f} us per check")
+    print(f"{peak / len(checks):.0f} bytes allocated at peak per check")
+
+
+if __name__ == "__main__":
+    main()
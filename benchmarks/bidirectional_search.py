@@ -0,0 +1,102 @@
+"""Compare a single action_is_authorized check using all shortest paths against the bidirectional search.
+
+Builds two graphs:
+
+- wide: actors in many large groups, each group allowed to perform
+    thousands of actions, so a search from an actor fans out quickly.
+- deep: actions granted through long chains of action propagation, so the
+    shortest paths are long.
+
+and reports the mean time per check of deciding from
+`IGraphMemoryBackend.shortest_paths` (the previous implementation) and of
+`action_is_authorized`, which uses `search_between`. Both must agree.
+
+Usage:
+
+python benchmarks/bidirectional_search.py
+"""
+import random
+import time
+
+from permission_graph import PermissionGraph
+from permission_graph.search import decide
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+CHECKS = 200
+
+
+def build_wide(n_groups: int = 50, actions_per_group: int = 2_000) -> PermissionGraph:
+    """Return a graph of 1000 actors, each in 5 of n_groups groups granted actions_per_group actions."""
+    rng = random.Random(0)
+    actors = [Actor(name=f"actor{i}") for i in range(1_000)]
+    groups = [Group(name=f"group{i}") for i in range(n_groups)]
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(10 * actions_per_group)]
+    actions = [Action(name="View", resource_type="Document", resource=r.name) for r in resources]
+    allows, denies = [], []
+    for group in groups:
+        granted = rng.sample(actions, actions_per_group)
+        allows.extend((group, action) for action in granted[: actions_per_group // 2])
+        denies.extend((group, action) for action in granted[actions_per_group // 2 :])
+    graph = PermissionGraph()
+    graph.bulk_load(
+        actors=actors,
+        groups=groups,
+        resource_types=[ResourceType(name="Document", actions=["View"])],
+        resources=resources,
+        memberships=[(actor, group) for actor in actors for group in rng.sample(groups, 5)],
+        allows=allows,
+        denies=denies,
+    )
+    return graph
+
+
+def build_deep(n_chains: int = 200, length: int = 50) -> PermissionGraph:
+    """Return a graph where actors are granted the first action of chains of propagated actions."""
+    rng = random.Random(0)
+    actors = [Actor(name=f"actor{i}") for i in range(100)]
+    groups = [Group(name=f"group{i}") for i in range(10)]
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(n_chains * length)]
+    actions = [Action(name="View", resource_type="Document", resource=r.name) for r in resources]
+    chains = [actions[i * length : (i + 1) * length] for i in range(n_chains)]
+    graph = PermissionGraph()
+    graph.bulk_load(
+        actors=actors,
+        groups=groups,
+        resource_types=[ResourceType(name="Document", actions=["View"])],
+        resources=resources,
+        memberships=[(actor, group) for actor in actors for group in rng.sample(groups, 2)],
+        allows=[(chain[i], chain[i + 1]) for chain in chains for i in range(length - 1)]
+        + [(group, chain[0]) for group in groups for chain in rng.sample(chains, n_chains // 5)],
+        denies=[(group, chain[length // 2]) for group in groups for chain in rng.sample(chains, n_chains // 10)],
+    )
+    return graph
+
+
+def time_checks(fn, checks: list[tuple[Actor, Action]]) -> tuple[float, list[bool]]:
+    """Return the mean time in microseconds of fn per check, and its decisions."""
+    start = time.perf_counter()
+    decisions = [fn(actor, action) for actor, action in checks]
+    return (time.perf_counter() - start) / len(checks) * 1e6, decisions
+
+
+def decide_from_shortest_paths(graph: PermissionGraph, actor: Actor, action: Action) -> bool:
+    """Decide a check from the last edge of every shortest path from actor to action."""
+    paths = graph.backend.shortest_paths(actor, action)
+    return decide({graph.backend.get_edge_type(path[-2], path[-1]) for path in paths}, graph.tie_breaker_policy)
+
+
+def main():
+    print(f"{'graph':>8} {'shortest_paths':>16} {'bidirectional':>16}  (us/check)")
+    for name, graph in [("wide", build_wide()), ("deep", build_deep())]:
+        rng = random.Random(1)
+        actors = graph.backend.get_vertices("actor")
+        actions = graph.backend.get_vertices("action")
+        checks = [(rng.choice(actors), rng.choice(actions)) for _ in range(CHECKS)]
+        old, expected = time_checks(lambda a, b: decide_from_shortest_paths(graph, a, b), checks)
+        new, decisions = time_checks(graph.action_is_authorized, checks)
+        assert decisions == expected
+        print(f"{name:>8} {old:>16.1f} {new:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare replaying a change log with reloading a snapshot.
+
+Builds a primary graph of actors in groups and an identical replica, both
+with tombstone deletes, then makes a number of changes to the primary
+(granting and revoking permissions, and adding actors) with a change log
+written to a file. Reports the time to record the changes, to replay them
+onto the replica with `apply_changes`, and to save and reload the whole
+graph from a snapshot instead.
+
+Usage:
+
+python benchmarks/changelog.py [number of actors] [number of changes]
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from permission_graph import PermissionGraph
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.changelog import ChangeLog, FileSink, read_changes
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+
+def build_graph(n_actors: int, changelog: ChangeLog) -> tuple[PermissionGraph, list[Actor], list[Group], list[Action]]:
+    """Return a graph of n_actors actors in 100 groups, each group allowed 100 actions."""
+    rng = random.Random(0)
+    actors = [Actor(name=f"actor{i}") for i in range(n_actors)]
+    groups = [Group(name=f"group{i}") for i in range(100)]
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(n_actors // 10)]
+    actions = [Action(name="View", resource_type="Document", resource=r.name) for r in resources]
+    graph = PermissionGraph(backend=IGraphMemoryBackend(tombstones=True))
+    graph.bulk_load(
+        actors=actors,
+        groups=groups,
+        resource_types=[ResourceType(name="Document", actions=["View"])],
+        resources=resources,
+        memberships=[(actor, rng.choice(groups)) for actor in actors],
+        allows=[(group, action) for group in groups for action in rng.sample(actions, 100)],
+    )
+    graph.changelog = changelog
+    return graph, actors, groups, actions
+
+
+def main() -> None:
+    n_actors = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_changes = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path, snapshot = Path(directory) / "changes.log", Path(directory) / "graph.pg"
+        with FileSink(log_path) as sink:
+            primary, actors, groups, actions = build_graph(n_actors, ChangeLog(sink=sink))
+            replica, _, _, _ = build_graph(n_actors, ChangeLog())
+
+            start = time.perf_counter()
+            granted = []
+            for i in range(n_changes):
+                if i % 3 == 2:
+                    primary.revoke(*granted.pop())
+                elif i % 3 == 1:
+                    new_actor = Actor(name=f"new{i}")
+                    primary.add_actor(new_actor)
+                    primary.add_actor_to_group(new_actor, rng.choice(groups))
+                else:
+                    grant = (rng.choice(actors), rng.choice(actions))
+                    if not primary.backend.edge_exists(*grant):
+                        primary.allow(*grant)
+                        granted.append(grant)
+            print(f"record {primary.changelog.version} changes: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        replica.apply_changes(read_changes(log_path))
+        elapsed = time.perf_counter() - start
+        print(f"apply_changes: {elapsed:.2f}s, {elapsed / replica.changelog.version * 1e3:.2f}ms per change")
+
+        start = time.perf_counter()
+        primary.save(snapshot)
+        PermissionGraph.load(snapshot)
+        print(f"save and load snapshot of {n_actors} actors: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
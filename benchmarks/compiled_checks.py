@@ -0,0 +1,51 @@
+"""Benchmark checks against a CompiledPermissionGraph as the number of actions grows.
+
+Each size compiles bitsets for a few actors over n actions, allowing every
+other action, then times `action_is_authorized` on random actions. Each check
+tests one byte of the actor's bitset, so the time per check should stay flat
+as the action count grows.
+
+Usage:
+
+python benchmarks/compiled_checks.py
+"""
+import random
+import time
+
+from permission_graph.compiled import CompiledPermissionGraph
+from permission_graph.structs import Action, Actor
+
+SIZES = [1_000, 100_000, 2_000_000]
+ACTORS = 10
+CHECKS = 10_000
+
+
+def build_compiled(n_actions: int) -> tuple[CompiledPermissionGraph, list[Actor], list[Action]]:
+    """Return a compiled graph of ACTORS actors allowed every other one of n_actions actions."""
+    actors = [Actor(name=f"actor{i}") for i in range(ACTORS)]
+    action_ids = [f"action:Document:doc{i}:View" for i in range(n_actions)]
+    bits = bytes([0b01010101]) * ((n_actions + 7) // 8)
+    compiled = CompiledPermissionGraph(
+        action_index={action_id: i for i, action_id in enumerate(action_ids)},
+        allowed={actor.id: bytearray(bits) for actor in actors},
+    )
+    rng = random.Random(0)
+    actions = [Action.from_id(action_id) for action_id in rng.sample(action_ids, min(CHECKS, n_actions))]
+    return compiled, actors, actions
+
+
+def main():
+    print(f"{'actions':>10} {'action_is_authorized':>22}  (us/check)")
+    for n_actions in SIZES:
+        compiled, actors, actions = build_compiled(n_actions)
+        rng = random.Random(1)
+        checks = [(rng.choice(actors), rng.choice(actions)) for _ in range(CHECKS)]
+        start = time.perf_counter()
+        for actor, action in checks:
+            compiled.action_is_authorized(actor, action)
+        per_check = (time.perf_counter() - start) / len(checks) * 1e6
+        print(f"{n_actions:>10} {per_check:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark edge lookups in the igraph backend as the number of edges grows.
+
+Each size builds a graph of actors allowed to perform actions, then times
+`edge_exists`, `get_edge_type` and `add_edge` (including its duplicate check).
+With an indexed edge lookup the time per operation should stay roughly flat
+as the edge count grows.
+
+Usage:
+
+python benchmarks/edge_lookup.py
+"""
+import random
+import time
+
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.structs import Action, Actor, EdgeType
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 1_000
+
+
+def build_backend(n_edges: int) -> tuple[IGraphMemoryBackend, list[tuple[Actor, Action]]]:
+    """Return a backend with n_edges ALLOW edges, and the edges that were added."""
+    n_actors = max(n_edges // 100, 1)
+    actors = [Actor(name=f"actor{i}") for i in range(n_actors)]
+    actions = [Action(name=f"action{i}", resource_type="Document", resource="doc") for i in range(100)]
+    backend = IGraphMemoryBackend()
+    backend.add_vertices(actors + actions)
+    edges = [(actor, action) for actor in actors for action in actions][:n_edges]
+    backend.add_edges([(EdgeType.ALLOW, actor, action) for actor, action in edges])
+    return backend, edges
+
+
+def time_per_op(fn, args: list[tuple]) -> float:
+    """Return the mean time in microseconds of calling fn with each args tuple."""
+    start = time.perf_counter()
+    for a in args:
+        fn(*a)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def main():
+    print(f"{'edges':>10} {'edge_exists':>14} {'get_edge_type':>14} {'add_edge':>14}  (us/op)")
+    for n_edges in SIZES:
+        backend, edges = build_backend(n_edges)
+        sample = random.sample(edges, min(LOOKUPS, len(edges)))
+        exists = time_per_op(backend.edge_exists, sample)
+        edge_type = time_per_op(backend.get_edge_type, sample)
+        # add_edge is dominated by igraph rebuilding its adjacency lists, so use fewer samples
+        new_edges = [(EdgeType.DENY, action, actor) for actor, action in sample[:100]]
+        add = time_per_op(backend.add_edge, new_edges)
+        print(f"{n_edges:>10} {exists:>14.1f} {edge_type:>14.1f} {add:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare the size of a graph with and without lazy Action vertices.
+
+Builds a graph of documents with six actions each, where only 1% of the
+documents have any ALLOW or DENY edge, once with every Action vertex added
+and once with `lazy_actions=True`. Each graph is built in its own process,
+which reports the number of vertices and edges, the growth of its resident
+memory, and the mean time of a check. Both graphs must give the same
+decisions.
+
+Usage:
+
+python benchmarks/lazy_actions.py [number of documents]
+"""
+import random
+import subprocess
+import sys
+import time
+
+from permission_graph import PermissionGraph
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+ACTIONS = ["View", "Edit", "Share", "Delete", "Comment", "Download"]
+CHECKS = 2_000
+
+
+def rss_kb() -> int:
+    """Return the resident memory of this process, in kB."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS not found")
+
+
+def build_graph(n_documents: int, lazy_actions: bool) -> tuple[PermissionGraph, list[tuple[Actor, Action]]]:
+    """Return a graph of n_documents documents, 1% of them granted to groups, and random checks against it."""
+    rng = random.Random(0)
+    actors = [Actor(name=f"actor{i}") for i in range(1_000)]
+    groups = [Group(name=f"group{i}") for i in range(20)]
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(n_documents)]
+    granted = [
+        Action(name=name, resource_type="Document", resource=resource.name)
+        for resource in rng.sample(resources, n_documents // 100)
+        for name in ACTIONS
+    ]
+    graph = PermissionGraph(lazy_actions=lazy_actions)
+    graph.bulk_load(
+        actors=actors,
+        groups=groups,
+        resource_types=[ResourceType(name="Document", actions=ACTIONS)],
+        resources=resources,
+        memberships=[(actor, group) for actor in actors for group in rng.sample(groups, 2)],
+        allows=[(group, action) for group in groups for action in rng.sample(granted, len(granted) // 10)],
+    )
+    checks = [
+        (
+            rng.choice(actors),
+            Action(name=rng.choice(ACTIONS), resource_type="Document", resource=rng.choice(resources).name),
+        )
+        for _ in range(CHECKS)
+    ]
+    checks.extend((rng.choice(actors), rng.choice(granted)) for _ in range(CHECKS))
+    return graph, checks
+
+
+def measure(n_documents: int, lazy_actions: bool) -> None:
+    """Build one graph, and print its size, memory and time per check."""
+    before = rss_kb()
+    graph, checks = build_graph(n_documents, lazy_actions)
+    memory = rss_kb() - before
+    start = time.perf_counter()
+    decisions = [graph.action_is_authorized(actor, action) for actor, action in checks]
+    elapsed = time.perf_counter() - start
+    n_vertices = len(graph.backend.get_vertices())
+    n_edges = sum(len(graph.backend.get_vertices_from(vertex)) for vertex in graph.backend.get_vertices())
+    print(
+        f"lazy_actions={lazy_actions}: {n_vertices:,} vertices, {n_edges:,} edges, {memory / 1024:,.0f}MB, "
+        f"{elapsed / len(checks) * 1e6:.1f}us per check, {sum(decisions)} allowed"
+    )
+
+
+def main() -> None:
+    n_documents = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for lazy_actions in (False, True):
+        subprocess.run([sys.executable, __file__, str(n_documents), str(lazy_actions)], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        measure(int(sys.argv[1]), sys.argv[2] == "True")
+    else:
+        main()
@@ -0,0 +1,7 @@
+"""A benchmark suite of PermissionGraph operations on generated enterprise-shaped graphs.
+
+Usage:
+
+python -m benchmarks.suite run --size xs s m --backend igraph sqlite --output head.json
+python -m benchmarks.suite compare base.json head.json
+"""
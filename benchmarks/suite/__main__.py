@@ -0,0 +1,80 @@
+"""Command line interface of the benchmark suite.
+
+Usage:
+
+python -m benchmarks.suite run [--size xs s ...] [--backend igraph ...] [--cases ...] [--nested-fraction 0.5]
+    [--group-closure] [--output results.json]
+python -m benchmarks.suite compare base.json head.json [--threshold 1.25]
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.suite.generators import SIZES, GraphSpec
+from benchmarks.suite.runner import CASES, backend_factory, compare, environment, run
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="time the cases and print or save the results")
+    run_parser.add_argument("--size", nargs="+", default=["s"], choices=SIZES, help="graph sizes (default s)")
+    run_parser.add_argument(
+        "--backend", nargs="+", default=["igraph"], help="backend names, or module:Class (default igraph)"
+    )
+    run_parser.add_argument("--cases", nargs="+", choices=CASES, help="cases to run (default all)")
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs of each read case (default 3)")
+    run_parser.add_argument("--seed", type=int, default=0, help="seed of the graph generator (default 0)")
+    run_parser.add_argument(
+        "--nested-fraction", type=float, default=0.0, help="fraction of groups in another group (default 0)"
+    )
+    run_parser.add_argument("--group-closure", action="store_true", help="index the nesting of groups")
+    run_parser.add_argument("--output", help="file to save the results to, as JSON")
+
+    compare_parser = commands.add_parser("compare", help="compare the results of two runs")
+    compare_parser.add_argument("base", help="results of the base commit")
+    compare_parser.add_argument("head", help="results to compare with the base")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=1.25, help="exit with status 1 if a case is this many times slower"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = {"environment": environment(), "runs": []}
+        for size in args.size:
+            for backend in args.backend:
+                print(f"{size} ({SIZES[size]:,} edges), {backend}:", file=sys.stderr)
+                spec = GraphSpec.for_edges(SIZES[size], seed=args.seed, nested_fraction=args.nested_fraction)
+                result = run(
+                    spec,
+                    backend_factory(backend),
+                    cases=args.cases,
+                    repeat=args.repeat,
+                    group_closure=args.group_closure,
+                    progress=lambda name, r: print(
+                        f"  {name:<30} {r['ops']:>10,} ops {r['seconds']:>9.3f}s {r['us_per_op']:>12.1f}us/op",
+                        file=sys.stderr,
+                    ),
+                )
+                results["runs"].append({"size": size, "backend": backend, **result})
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+        return 0
+
+    with open(args.base) as base, open(args.head) as head:
+        rows = compare(json.load(base), json.load(head))
+    regressions = [row for row in rows if row["ratio"] > args.threshold]
+    print(f"{'size':<5} {'backend':<20} {'case':<30} {'base us/op':>12} {'head us/op':>12} {'ratio':>7}")
+    for row in rows:
+        flag = "  slower" if row in regressions else ""
+        print(
+            f"{row['size']:<5} {row['backend']:<20} {row['case']:<30} "
+            f"{row['base_us_per_op']:>12.1f} {row['head_us_per_op']:>12.1f} {row['ratio']:>7.2f}{flag}"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Generators of synthetic permission graphs shaped like an enterprise's.
+
+A `GraphSpec` describes the shape of a graph: how many actors, groups and
+resource types it has, how group sizes are distributed, how groups are
+nested in other groups, how many permissions
+groups and actors are granted and what fraction of them are DENY edges, and
+how many chains of action propagation it has. `generate` turns a spec into a
+`Workload`: the arguments of one `PermissionGraph.bulk_load` call, and sample
+checks against the graph. Generation is deterministic for a given spec.
+"""
+import math
+import random
+from dataclasses import dataclass, field
+
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+# Named sizes, as the approximate number of edges in the graph
+SIZES = {"xs": 1_000, "s": 10_000, "m": 100_000, "l": 1_000_000, "xl": 10_000_000}
+
+
+@dataclass(frozen=True)
+class GraphSpec:
+    """The shape of a synthetic permission graph.
+
+    Attributes:
+        n_actors: The number of actors
+        n_groups: The number of groups
+        group_size_exponent: Group sizes follow a power law: the k-th largest
+            group is chosen for a membership with weight 1 / k ** exponent
+        memberships_per_actor: The mean number of groups each actor is in
+        nested_fraction: The fraction of groups that are members of another
+            group. Groups only join groups created before them, so the
+            nesting has no cycles.
+        n_resource_types: The number of resource types
+        actions_per_type: The number of actions of each resource type
+        n_resources: The number of resources, spread evenly over the types
+        grants_per_group: The mean number of actions each group is granted
+        direct_grants: The number of actions granted directly to actors
+        deny_fraction: The fraction of grants that are DENY edges
+        n_chains: The number of chains of action propagation
+        chain_length: The number of actions in each chain
+        n_checks: The number of sample (actor, action) checks
+        seed: The seed of the random generator
+    """
+
+    n_actors: int
+    n_groups: int
+    group_size_exponent: float = 1.0
+    memberships_per_actor: float = 1.5
+    nested_fraction: float = 0.0
+    n_resource_types: int = 10
+    actions_per_type: int = 3
+    n_resources: int = 1_000
+    grants_per_group: int = 20
+    direct_grants: int = 100
+    deny_fraction: float = 0.1
+    n_chains: int = 10
+    chain_length: int = 4
+    n_checks: int = 1_000
+    seed: int = 0
+
+    @classmethod
+    def for_edges(cls, n_edges: int, **overrides) -> "GraphSpec":
+        """Return a spec for a graph of about n_edges edges.
+
+        About 40% of the edges connect resources and actions to their
+        resource types and resources, 15% are group memberships, and the
+        rest are grants to groups and actors.
+
+        Args:
+            n_edges: The approximate number of edges
+            **overrides: Attributes to set instead of the derived values
+        """
+        n_actors = max(n_edges // 10, 10)
+        n_groups = max(n_actors // 50, 4)
+        values = dict(
+            n_actors=n_actors,
+            n_groups=n_groups,
+            n_resources=max(n_edges // 10, 10),
+            n_resource_types=max(round(math.log10(n_edges)) * 4, 4),
+            grants_per_group=max(n_edges * 3 // 10 // n_groups, 1),
+            direct_grants=n_edges // 10,
+            n_chains=max(n_edges // 1_000, 1),
+        )
+        values.update(overrides)
+        return cls(**values)
+
+
+@dataclass
+class Workload:
+    """A generated graph, as arguments to `PermissionGraph.bulk_load`, and checks against it."""
+
+    actors: list[Actor] = field(default_factory=list)
+    groups: list[Group] = field(default_factory=list)
+    resource_types: list[ResourceType] = field(default_factory=list)
+    resources: list[Resource] = field(default_factory=list)
+    memberships: list[tuple[Actor | Group, Group]] = field(default_factory=list)
+    allows: list[tuple[Actor | Group | Action, Action]] = field(default_factory=list)
+    denies: list[tuple[Actor | Group | Action, Action]] = field(default_factory=list)
+    actions: list[Action] = field(default_factory=list)
+    checks: list[tuple[Actor, Action]] = field(default_factory=list)
+
+    def bulk_load_kwargs(self) -> dict[str, list]:
+        """Return the keyword arguments of `bulk_load` that build the graph."""
+        return dict(
+            actors=self.actors,
+            groups=self.groups,
+            resource_types=self.resource_types,
+            resources=self.resources,
+            memberships=self.memberships,
+            allows=self.allows,
+            denies=self.denies,
+        )
+
+
+def generate(spec: GraphSpec) -> Workload:
+    """Generate a graph and sample checks with the shape of spec."""
+    rng = random.Random(spec.seed)
+    workload = Workload()
+    workload.actors = [Actor(name=f"actor{i}") for i in range(spec.n_actors)]
+    workload.groups = [Group(name=f"group{i}") for i in range(spec.n_groups)]
+    workload.resource_types = [
+        ResourceType(name=f"type{i}", actions=[f"action{j}" for j in range(spec.actions_per_type)])
+        for i in range(spec.n_resource_types)
+    ]
+    for i in range(spec.n_resources):
+        resource_type = workload.resource_types[i % spec.n_resource_types]
+        resource = Resource(name=f"resource{i}", resource_type=resource_type.name)
+        workload.resources.append(resource)
+        workload.actions.extend(
+            Action(name=name, resource_type=resource_type.name, resource=resource.name)
+            for name in resource_type.actions
+        )
+
+    # Each actor joins at least one group, chosen with power law weights
+    weights = [1 / (k + 1) ** spec.group_size_exponent for k in range(spec.n_groups)]
+    groups_of = {}
+    for actor in workload.actors:
+        n_memberships = min(max(1, round(rng.expovariate(1 / spec.memberships_per_actor))), spec.n_groups)
+        groups = set(rng.choices(range(spec.n_groups), weights=weights, k=n_memberships))
+        groups_of[actor.id] = [workload.groups[i] for i in groups]
+        workload.memberships.extend((actor, group) for group in groups_of[actor.id])
+
+    for i, group in enumerate(workload.groups[1:], 1):
+        if rng.random() < spec.nested_fraction:
+            workload.memberships.append((group, workload.groups[rng.randrange(i)]))
+
+    grants = set()
+
+    def grant(source: Actor | Group | Action, action: Action) -> None:
+        if source.id == action.id or (source.id, action.id) in grants:
+            return
+        grants.add((source.id, action.id))
+        (workload.denies if rng.random() < spec.deny_fraction else workload.allows).append((source, action))
+
+    for group in workload.groups:
+        for action in rng.sample(workload.actions, min(spec.grants_per_group, len(workload.actions))):
+            grant(group, action)
+    for _ in range(spec.direct_grants):
+        grant(rng.choice(workload.actors), rng.choice(workload.actions))
+    for _ in range(spec.n_chains):
+        chain = rng.sample(workload.actions, min(spec.chain_length, len(workload.actions)))
+        for source, target in zip(chain, chain[1:]):
+            grant(source, target)
+
+    # Half of the checks are for actions granted to one of the actor's groups
+    granted = {}
+    for source, action in workload.allows + workload.denies:
+        granted.setdefault(source.id, []).append(action)
+    for i in range(spec.n_checks):
+        actor = rng.choice(workload.actors)
+        candidates = [action for group in groups_of[actor.id] for action in granted.get(group.id, [])]
+        if i % 2 == 0 and candidates:
+            workload.checks.append((actor, rng.choice(candidates)))
+        else:
+            workload.checks.append((actor, rng.choice(workload.actions)))
+    return workload
@@ -0,0 +1,275 @@
+"""Time the operations of PermissionGraph on generated graphs, and compare results between commits.
+
+Each case times one kind of operation on a graph built from a `Workload`,
+and reports the number of operations and the time they took. Cases that only
+read the graph run first and report their best of `repeat` runs; cases that
+change the graph run once each, in order, on the same graph.
+"""
+import dataclasses
+import datetime
+import importlib
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from functools import partial
+from typing import Any, Callable
+
+from benchmarks.suite.generators import GraphSpec, Workload, generate
+from permission_graph import PermissionGraph
+from permission_graph.backends.base import PermissionGraphBackend
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.backends.sqlite import SQLiteBackend
+from permission_graph.structs import Action, Actor
+
+# Backends that can be named on the command line
+BACKENDS: dict[str, Callable[[], PermissionGraphBackend]] = {
+    "igraph": IGraphMemoryBackend,
+    "igraph-tombstones": partial(IGraphMemoryBackend, tombstones=True),
+    "sqlite": SQLiteBackend,
+}
+
+
+def backend_factory(name: str) -> Callable[[], PermissionGraphBackend]:
+    """Return the factory of a backend named in `BACKENDS`, or given as "module:Class"."""
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown backend {name!r}: use one of {sorted(BACKENDS)} or module:Class")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _time(fn: Callable[[], Any]) -> float:
+    """Return the time in seconds taken by calling fn."""
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def action_is_authorized(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time the workload's checks, one action_is_authorized call each."""
+    checks = workload.checks
+    return len(checks), _time(lambda: [graph.action_is_authorized(actor, action) for actor, action in checks])
+
+
+def authorize_many(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time the workload's checks in a single authorize_many call."""
+    return len(workload.checks), _time(lambda: graph.authorize_many(workload.checks))
+
+
+def paths_to_targets(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time paths_to_targets from up to 100 of the checked actors to every action, keeping up to 1,000 paths each."""
+    actors = list({actor.id: actor for actor, _ in workload.checks}.values())[:100]
+    return len(actors), _time(lambda: [graph.paths_to_targets(actor, Action, max_paths=1_000) for actor in actors])
+
+
+def allow_and_revoke(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time allowing up to 200 random (actor, action) pairs with no edge between them, then revoking each."""
+    pairs = {}
+    while len(pairs) < min(200, len(workload.actors)):
+        actor, action = rng.choice(workload.actors), rng.choice(workload.actions)
+        if not graph.backend.edge_exists(actor, action):
+            pairs[(actor.id, action.id)] = (actor, action)
+
+    def run():
+        for actor, action in pairs.values():
+            graph.allow(actor, action)
+        for actor, action in pairs.values():
+            graph.revoke(actor, action)
+
+    return 2 * len(pairs), _time(run)
+
+
+def bulk_load_into_existing(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time bulk_load adding 1% more actors, each in a random group and allowed a random action."""
+    actors = [Actor(name=f"new_actor{i}") for i in range(max(len(workload.actors) // 100, 1))]
+    memberships = [(actor, rng.choice(workload.groups)) for actor in actors]
+    allows = [(actor, rng.choice(workload.actions)) for actor in actors]
+    seconds = _time(lambda: graph.bulk_load(actors=actors, memberships=memberships, allows=allows))
+    return len(actors) + len(memberships) + len(allows), seconds
+
+
+def update_resource_type_actions(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time replacing the first action of the first resource type with a new one, on all its resources."""
+    resource_type = workload.resource_types[0]
+    n_resources = sum(resource.resource_type == resource_type.name for resource in workload.resources)
+    new_actions = [*resource_type.actions[1:], "new_action"]
+    return n_resources, _time(lambda: graph.update_resource_type_actions(resource_type.name, new_actions))
+
+
+def nest_and_unnest_groups(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time adding up to 100 groups to groups created before them, then removing each membership."""
+    groups = workload.groups
+    pairs = {}
+    for _ in range(min(100, len(groups))):
+        # A group joining a group created before it can't make a cycle
+        child = rng.randrange(1, len(groups))
+        parent = rng.randrange(child)
+        if not graph.backend.edge_exists(groups[child], groups[parent]):
+            pairs[(child, parent)] = (groups[child], groups[parent])
+
+    def run():
+        for child, parent in pairs.values():
+            graph.add_actor_to_group(child, parent)
+        for child, parent in pairs.values():
+            graph.remove_actor_from_group(child, parent)
+
+    return 2 * len(pairs), _time(run)
+
+
+def remove_resource(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time removing up to 20 random resources not of the first resource type, along with their actions."""
+    # Resources of the first type were changed by update_resource_type_actions
+    resources = [r for r in workload.resources if r.resource_type != workload.resource_types[0].name]
+    resources = rng.sample(resources, min(20, len(resources)))
+    return len(resources), _time(lambda: [graph.remove_resource(resource) for resource in resources])
+
+
+def remove_actor(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time removing up to 100 random actors, along with their memberships and permissions."""
+    actors = rng.sample(workload.actors, min(100, len(workload.actors)))
+    return len(actors), _time(lambda: [graph.remove_actor(actor) for actor in actors])
+
+
+def remove_group(graph: PermissionGraph, workload: Workload, rng: random.Random) -> tuple[int, float]:
+    """Time removing up to 10 of the smallest groups, along with their memberships and permissions."""
+    # The smallest groups, as the largest are in most checks
+    groups = workload.groups[-min(10, len(workload.groups) // 2) :]
+    return len(groups), _time(lambda: [graph.remove_group(group) for group in groups])
+
+
+# Cases that only read the graph, and are repeated
+READ_CASES = {
+    "action_is_authorized": action_is_authorized,
+    "authorize_many": authorize_many,
+    "paths_to_targets": paths_to_targets,
+}
+# Cases that change the graph, run once each in this order
+WRITE_CASES = {
+    "allow_and_revoke": allow_and_revoke,
+    "bulk_load_into_existing": bulk_load_into_existing,
+    "nest_and_unnest_groups": nest_and_unnest_groups,
+    "update_resource_type_actions": update_resource_type_actions,
+    "remove_resource": remove_resource,
+    "remove_actor": remove_actor,
+    "remove_group": remove_group,
+}
+CASES = ["bulk_load", *READ_CASES, *WRITE_CASES]
+
+
+def _result(ops: int, seconds: float) -> dict[str, float]:
+    return {"ops": ops, "seconds": seconds, "us_per_op": seconds / max(ops, 1) * 1e6}
+
+
+def run(
+    spec: GraphSpec,
+    backend: Callable[[], PermissionGraphBackend] = IGraphMemoryBackend,
+    cases: list[str] | None = None,
+    repeat: int = 3,
+    progress: Callable[[str, dict[str, float]], None] | None = None,
+    group_closure: bool = False,
+) -> dict[str, Any]:
+    """Build a graph from spec and time each case against it.
+
+    Args:
+        spec: The shape of the graph
+        backend: Returns an empty backend to build the graph in
+        cases: The names of the cases to run (default all of `CASES`).
+            `bulk_load` builds the graph, and is always run.
+        repeat: The number of times to run each read case, keeping the best
+        progress: If given, called with the name and result of each case
+            as it finishes
+        group_closure: Passed to `PermissionGraph`
+
+    Returns:
+        A dict with the spec, the number of vertices and edges in the
+        graph, and the result of each case: the number of operations, the
+        seconds they took, and the microseconds per operation.
+    """
+    cases = CASES if cases is None else cases
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        raise ValueError(f"Unknown cases: {sorted(unknown)}")
+    workload = generate(spec)
+    results = {}
+
+    def report(name: str, ops: int, seconds: float) -> None:
+        results[name] = _result(ops, seconds)
+        if progress is not None:
+            progress(name, results[name])
+
+    graph = PermissionGraph(backend=backend(), group_closure=group_closure)
+    kwargs = workload.bulk_load_kwargs()
+    n_edges = len(workload.memberships) + len(workload.allows) + len(workload.denies)
+    n_edges += len(workload.resources) + len(workload.actions)
+    report("bulk_load", n_edges, _time(lambda: graph.bulk_load(**kwargs)))
+    counts = {
+        "vertices": graph.backend.count_vertices(),
+        "edges": {etype.value: n for etype, n in graph.backend.count_edges().items()},
+    }
+    for name, case in READ_CASES.items():
+        if name in cases:
+            best = min((case(graph, workload, random.Random(spec.seed)) for _ in range(repeat)), key=lambda r: r[1])
+            report(name, *best)
+    rng = random.Random(spec.seed)
+    for name, case in WRITE_CASES.items():
+        if name in cases:
+            report(name, *case(graph, workload, rng))
+    return {"spec": dataclasses.asdict(spec), "group_closure": group_closure, "graph": counts, "results": results}
+
+
+def environment() -> dict[str, Any]:
+    """Return a description of the commit and machine that results were measured on."""
+
+    def git(*args: str) -> str | None:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(base: dict[str, Any], head: dict[str, Any]) -> list[dict[str, Any]]:
+    """Compare the results of two runs of the suite.
+
+    Returns:
+        One row per case measured in both, for each size, backend and
+        group_closure setting run in both, with the microseconds per
+        operation of each and their ratio (head / base, so above 1 is
+        slower).
+    """
+
+    def key(run_: dict[str, Any]) -> tuple:
+        return run_["size"], run_["backend"], run_.get("group_closure", False)
+
+    base_runs = {key(r): r for r in base["runs"]}
+    rows = []
+    for run_ in head["runs"]:
+        if (base_run := base_runs.get(key(run_))) is None:
+            continue
+        for case, result in run_["results"].items():
+            if case in base_run["results"]:
+                before = base_run["results"][case]["us_per_op"]
+                after = result["us_per_op"]
+                rows.append(
+                    {
+                        "size": run_["size"],
+                        "backend": run_["backend"],
+                        "case": case,
+                        "base_us_per_op": before,
+                        "head_us_per_op": after,
+                        "ratio": after / before if before else float("inf"),
+                    }
+                )
+    return rows
@@ -0,0 +1,67 @@
+"""Compare removing many vertices and edges one at a time, with and without tombstones.
+
+Builds a graph of actors in groups granted many actions, then offboards a
+department: revokes the direct permissions of 1000 actors, and removes them
+with `remove_actor`. Reports the time of the offboarding and the mean time of
+a check afterwards, for `IGraphMemoryBackend` with and without tombstones.
+
+Usage:
+
+python benchmarks/tombstones.py [number of actors]
+"""
+import random
+import sys
+import time
+
+from permission_graph import PermissionGraph
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+OFFBOARDED = 1_000
+CHECKS = 1_000
+
+
+def build_graph(n_actors: int, backend: IGraphMemoryBackend) -> tuple[PermissionGraph, list[Actor], list[Action]]:
+    """Return a graph of n_actors actors in 100 groups, each actor allowed one action of its own."""
+    rng = random.Random(0)
+    actors = [Actor(name=f"actor{i}") for i in range(n_actors)]
+    groups = [Group(name=f"group{i}") for i in range(100)]
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(n_actors)]
+    actions = [Action(name="View", resource_type="Document", resource=r.name) for r in resources]
+    graph = PermissionGraph(backend=backend)
+    graph.bulk_load(
+        actors=actors,
+        groups=groups,
+        resource_types=[ResourceType(name="Document", actions=["View", "Edit"])],
+        resources=resources,
+        memberships=[(actor, rng.choice(groups)) for actor in actors],
+        allows=[(group, action) for group in groups for action in rng.sample(actions, 100)]
+        + list(zip(actors, actions)),
+    )
+    return graph, actors, actions
+
+
+def main() -> None:
+    n_actors = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(1)
+    for backend in (IGraphMemoryBackend(), IGraphMemoryBackend(tombstones=True)):
+        graph, actors, actions = build_graph(n_actors, backend)
+        start = time.perf_counter()
+        for actor, action in zip(actors[:OFFBOARDED], actions):
+            graph.revoke(actor, action)
+            graph.remove_actor(actor)
+        offboarding = time.perf_counter() - start
+
+        checks = [(rng.choice(actors[OFFBOARDED:]), rng.choice(actions)) for _ in range(CHECKS)]
+        start = time.perf_counter()
+        for actor, action in checks:
+            graph.action_is_authorized(actor, action)
+        per_check = (time.perf_counter() - start) / CHECKS
+        print(
+            f"tombstones={backend.tombstones}: offboarding {OFFBOARDED} of {n_actors} actors {offboarding:.2f}s, "
+            f"tombstone ratio {backend.tombstone_ratio:.3f}, {per_check * 1e6:.0f}us per check"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Measure the time to change the actions of, and remove, a resource type with many resources.
+
+Builds a graph with one resource type of n resources, renames one of its
+actions with `update_resource_type_actions`, then removes the type with
+`remove_resource_type`, and reports the time of each.
+
+Usage:
+
+python benchmarks/update_resource_type.py [number of resources]
+"""
+import sys
+import time
+
+from permission_graph import PermissionGraph
+from permission_graph.structs import Action, Group, Resource, ResourceType
+
+
+def build_graph(n_resources: int) -> PermissionGraph:
+    """Return a graph of n_resources documents, with one group allowed to view each of the first 1000."""
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(n_resources)]
+    group = Group(name="staff")
+    graph = PermissionGraph()
+    graph.bulk_load(
+        groups=[group],
+        resource_types=[ResourceType(name="Document", actions=["View", "Edit", "Share"])],
+        resources=resources,
+        allows=[(group, Action(name="View", resource_type="Document", resource=r.name)) for r in resources[:1000]],
+    )
+    return graph
+
+
+def main() -> None:
+    n_resources = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    graph = build_graph(n_resources)
+
+    start = time.perf_counter()
+    graph.update_resource_type_actions("Document", ["View", "Edit", "Publish"])
+    print(f"update_resource_type_actions, {n_resources} resources: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    graph.remove_resource_type(ResourceType(name="Document", actions=["View", "Edit", "Publish"]))
+    print(f"remove_resource_type, {n_resources} resources: {time.perf_counter() - start:.2f}s")
+    assert graph.backend.get_vertices() == [Group(name="staff")]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure the throughput of authorization checks in a WorkerPool.
+
+Builds a graph of actors in groups granted many actions, and reports the
+number of checks per second made in the current process and in a
+`WorkerPool` of 1, 2, 4, ... processes, up to the number of CPUs. Checks are
+sent to the pool in batches through `authorize_many`, which splits each batch
+between the workers, so throughput should grow with the number of processes
+until it runs out of cores.
+
+Usage:
+
+python benchmarks/worker_pool.py [max processes]
+"""
+import os
+import random
+import sys
+import time
+
+from permission_graph import PermissionGraph
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+from permission_graph.workers import WorkerPool
+
+CHECKS = 20_000
+BATCH_SIZE = 1_000
+
+
+def build_graph() -> tuple[PermissionGraph, list[tuple[Actor, Action]]]:
+    """Return a graph of 1000 actors in 50 groups each granted 200 actions, and random checks against it."""
+    rng = random.Random(0)
+    actors = [Actor(name=f"actor{i}") for i in range(1_000)]
+    groups = [Group(name=f"group{i}") for i in range(50)]
+    resources = [Resource(name=f"doc{i}", resource_type="Document") for i in range(5_000)]
+    actions = [Action(name="View", resource_type="Document", resource=r.name) for r in resources]
+    graph = PermissionGraph()
+    graph.bulk_load(
+        actors=actors,
+        groups=groups,
+        resource_types=[ResourceType(name="Document", actions=["View"])],
+        resources=resources,
+        memberships=[(actor, group) for actor in actors for group in rng.sample(groups, 3)],
+        allows=[(group, action) for group in groups for action in rng.sample(actions, 200)],
+    )
+    checks = [(rng.choice(actors), rng.choice(actions)) for _ in range(CHECKS)]
+    return graph, checks
+
+
+def throughput(authorize_many, checks: list[tuple[Actor, Action]]) -> tuple[float, list[bool]]:
+    """Return the checks per second of authorize_many over batches of checks, and its decisions."""
+    decisions = []
+    start = time.perf_counter()
+    for i in range(0, len(checks), BATCH_SIZE):
+        decisions.extend(authorize_many(checks[i : i + BATCH_SIZE]))
+    return len(checks) / (time.perf_counter() - start), decisions
+
+
+def main() -> None:
+    max_processes = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    graph, checks = build_graph()
+    baseline, expected = throughput(graph.authorize_many, checks)
+    print(f"{os.cpu_count()} CPUs, {CHECKS} checks in batches of {BATCH_SIZE}")
+    print(f"in process: {baseline:,.0f} checks/s")
+    processes = 1
+    while processes <= max_processes:
+        with WorkerPool(graph, processes=processes) as pool:
+            rate, decisions = throughput(pool.authorize_many, checks)
+        assert decisions == expected
+        print(f"{processes} processes: {rate:,.0f} checks/s ({rate / baseline:.2f}x)")
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
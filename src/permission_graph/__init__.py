@@ -8,12 +8,13 @@ The permissions graph consists of Vertices and Edges.
 * `Resource`: a resource with actions requiring authorization
 * `Action`: an action on a resource
 * `Actor`: an identity that will take actions on resources
-* `Group`: a named collection of `Actors` with shared permission policies
+* `Group`: a named collection of `Actors` and other `Groups` with shared permission policies
 
 **Edges**
 
 * `MemberOf`: indicates membership in a collection
     - `Actor -> MemberOf -> Group`
+    - `Group -> MemberOf -> Group`
     - `Action -> MemberOf -> Resource`
     - `Resource -> MemberOf -> ResourceType`
 * `Allow`: indicates positive permission to act on a resource
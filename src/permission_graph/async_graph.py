@@ -0,0 +1,309 @@
+"""An asyncio interface to a permission graph.
+
+Checks and changes run in a thread pool so that large graphs don't block the
+event loop. Checks made while others are waiting are batched into a single
+`authorize_many` call, and identical checks waiting at the same time share
+one result.
+"""
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterable, Self, TypeVar
+
+from permission_graph.changelog import ChangeEntry
+from permission_graph.concurrent import ConcurrentPermissionGraph
+from permission_graph.explain import Decision
+from permission_graph.permission_graph import PermissionGraph
+from permission_graph.structs import (
+    Action,
+    Actor,
+    Group,
+    Resource,
+    ResourceType,
+    Vertex,
+    VertexHandle,
+)
+
+T = TypeVar("T")
+
+Check = tuple[Actor | VertexHandle, Action | VertexHandle]
+
+
+class AsyncPermissionGraph:
+    """A permission graph with coroutine methods, for use from asyncio code.
+
+    Reads and writes go through a `ConcurrentPermissionGraph`, so checks run
+    against the current version of the graph while changes build the next.
+    Checks are queued until the event loop next runs its callbacks, and then
+    made in one `authorize_many` call in the thread pool. Up to
+    `max_batch_size` checks go in each call. If the backend sets
+    `supports_async`, checks instead await
+    `PermissionGraph.action_is_authorized_async` on the event loop.
+
+    Use as an async context manager, or call `close`, to shut down the pool.
+    """
+
+    def __init__(
+        self,
+        graph: PermissionGraph | ConcurrentPermissionGraph | None = None,
+        max_workers: int = 4,
+        max_batch_size: int = 1000,
+    ) -> None:
+        """Initialize a new AsyncPermissionGraph.
+
+        Args:
+            graph: The graph to use (default an empty `PermissionGraph`). A
+                PermissionGraph is wrapped in a ConcurrentPermissionGraph, and
+                must not be changed directly after this.
+            max_workers: The number of threads to run checks and changes in
+            max_batch_size: The maximum number of checks made in one call
+        """
+        if not isinstance(graph, ConcurrentPermissionGraph):
+            graph = ConcurrentPermissionGraph(graph)
+        self.graph = graph
+        self.max_batch_size = max_batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="permission-graph")
+        # Checks waiting for a batch, and the futures of checks waiting for a result, by key
+        self._pending: list[tuple[Check, asyncio.Future]] = []
+        self._in_flight: dict[tuple[Any, Any], asyncio.Future] = {}
+        self._flush_scheduled = False
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Wait for running checks and changes, and shut down the thread pool."""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run a function in the thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def write(self, fn: Callable[[PermissionGraph], T]) -> T:
+        """Change the graph in the thread pool.
+
+        Calls fn with the next version of the graph (see
+        `ConcurrentPermissionGraph.write`), and returns its result. Make
+        related changes in one call, as each call copies the graph.
+        """
+
+        def write() -> T:
+            with self.graph.write() as graph:
+                return fn(graph)
+
+        return await self.run(write)
+
+    async def add_actor(self, actor: Actor) -> None:
+        """Add a actor to the permission graph."""
+        await self.write(lambda graph: graph.add_actor(actor))
+
+    async def remove_actor(self, actor: Actor) -> None:
+        """Remove a actor from the permission graph."""
+        await self.write(lambda graph: graph.remove_actor(actor))
+
+    async def add_group(self, group: Group) -> None:
+        """Add a group to the permission graph."""
+        await self.write(lambda graph: graph.add_group(group))
+
+    async def remove_group(self, group: Group) -> None:
+        """Remove a group from the permission graph."""
+        await self.write(lambda graph: graph.remove_group(group))
+
+    async def add_resource_type(self, resource_type: ResourceType) -> None:
+        """Register a resource type to the permission graph."""
+        await self.write(lambda graph: graph.add_resource_type(resource_type))
+
+    async def remove_resource_type(self, resource_type: ResourceType) -> None:
+        """Remove a resource type from the permission graph."""
+        await self.write(lambda graph: graph.remove_resource_type(resource_type))
+
+    async def add_resource(self, resource: Resource) -> None:
+        """Add a resource to the permission graph."""
+        await self.write(lambda graph: graph.add_resource(resource))
+
+    async def remove_resource(self, resource: Resource) -> None:
+        """Remove a resource from the permission graph."""
+        await self.write(lambda graph: graph.remove_resource(resource))
+
+    async def allow(self, actor: Actor | Group | Action, action: Action) -> None:
+        """Grant actor or group permission to take action on resource or group."""
+        await self.write(lambda graph: graph.allow(actor, action))
+
+    async def deny(self, actor: Actor | Group | Action, action: Action) -> None:
+        """Deny actor or group permission to take action on resource or group."""
+        await self.write(lambda graph: graph.deny(actor, action))
+
+    async def revoke(self, actor: Actor | Group | Action, action: Action) -> None:
+        """Revoke a permission (either allow or deny)."""
+        await self.write(lambda graph: graph.revoke(actor, action))
+
+    async def add_actor_to_group(self, actor: Actor | Group, group: Group) -> None:
+        """Add a actor, or another group, to a group."""
+        await self.write(lambda graph: graph.add_actor_to_group(actor, group))
+
+    async def remove_actor_from_group(self, actor: Actor | Group, group: Group) -> None:
+        """Remove a actor, or another group, from a group."""
+        await self.write(lambda graph: graph.remove_actor_from_group(actor, group))
+
+    async def bulk_load(self, **kwargs: Any) -> None:
+        """Add many vertices and edges at once. See `PermissionGraph.bulk_load`."""
+        await self.write(lambda graph: graph.bulk_load(**kwargs))
+
+    async def update_resource_type_actions(
+        self,
+        resource_type_name: str,
+        new_actions: list[str],
+        batch_size: int = 100_000,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
+        """Update the set of actions supported by ResourceType. See `PermissionGraph.update_resource_type_actions`.
+
+        progress, if given, is called from the thread pool.
+        """
+        await self.write(
+            lambda graph: graph.update_resource_type_actions(
+                resource_type_name, new_actions, batch_size=batch_size, progress=progress
+            )
+        )
+
+    async def apply_changes(self, entries: Iterable[ChangeEntry], batch_size: int = 10_000) -> int:
+        """Replay the changes recorded in another graph's change log. See `PermissionGraph.apply_changes`.
+
+        Returns:
+            The number of entries applied.
+        """
+        return await self.write(lambda graph: graph.apply_changes(entries, batch_size=batch_size))
+
+    async def save(self, path: str | Path) -> None:
+        """Save the current version of the graph to a snapshot file."""
+        await self.run(self.graph.snapshot().save, path)
+
+    async def action_is_authorized(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool:
+        """Authorize actor to perform action on resource.
+
+        Raises ValueError if the actor or action does not exist.
+        """
+        key = (_key(actor), _key(action))
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._in_flight[key] = loop.create_future()
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self._pending.append(((actor, action), future))
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                loop.call_soon(self._flush)
+        # A cancelled caller mustn't cancel the check for others waiting on it
+        return await asyncio.shield(future)
+
+    async def explain(
+        self, actor: Actor | VertexHandle, action: Action | VertexHandle, max_paths: int | None = 100
+    ) -> Decision:
+        """Explain the decision `action_is_authorized` makes for an actor and action, in the thread pool.
+
+        See `PermissionGraph.explain`.
+        """
+        return await self.run(self.graph.snapshot().explain, actor, action, max_paths)
+
+    async def authorize_many(self, checks: Iterable[Check]) -> list[bool]:
+        """Authorize many (actor, action) pairs at once.
+
+        Returns:
+            A list of decisions, in the same order as `checks`.
+        """
+        return list(await asyncio.gather(*(self.action_is_authorized(actor, action) for actor, action in checks)))
+
+    async def actors_authorized_for(self, action: Action, chunk_size: int = 1000) -> AsyncIterator[Actor]:
+        """Yield every actor authorized to perform an action.
+
+        Actors are found in the thread pool, chunk_size at a time. See
+        `PermissionGraph.actors_authorized_for`.
+        """
+        actors = await self.run(self.graph.actors_authorized_for, action)
+        while chunk := await self.run(list, itertools.islice(actors, chunk_size)):
+            for actor in chunk:
+                yield actor
+
+    async def authorized_actions(
+        self,
+        actor: Actor,
+        resource_type: ResourceType | None = None,
+        resource: Resource | None = None,
+        page_size: int = 1000,
+    ) -> AsyncIterator[list[Action]]:
+        """Yield pages of the actions an actor is authorized to perform.
+
+        Each page is found in the thread pool. See `PermissionGraph.authorized_actions`.
+        """
+        pages = await self.run(
+            lambda: self.graph.authorized_actions(
+                actor, resource_type=resource_type, resource=resource, page_size=page_size
+            )
+        )
+        while page := await self.run(next, pages, None):
+            yield page
+
+    def _flush(self) -> None:
+        """Start a batch for each max_batch_size of the pending checks."""
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        graph = self.graph.snapshot()
+        for start in range(0, len(pending), self.max_batch_size):
+            batch = pending[start : start + self.max_batch_size]
+            checks = [check for check, _ in batch]
+            if graph.backend.supports_async:
+                task = asyncio.ensure_future(_authorize_async(graph, checks))
+            else:
+                task = asyncio.get_running_loop().run_in_executor(self._executor, _authorize_batch, graph, checks)
+            task.add_done_callback(lambda task, batch=batch: _resolve(batch, task))
+
+
+def _key(vertex: Vertex | VertexHandle) -> Any:
+    """Return a key identifying a vertex or handle in a check."""
+    return vertex if isinstance(vertex, int) else vertex.id
+
+
+def _authorize_batch(graph: PermissionGraph, checks: list[Check]) -> list[bool | Exception]:
+    """Authorize a batch of checks, returning the exception of any check that fails.
+
+    Checks are made together with `authorize_many`, unless one of them fails,
+    in which case they are made one at a time so that the others still succeed.
+    """
+    try:
+        return graph.authorize_many(checks)
+    except ValueError:
+        results = []
+        for actor, action in checks:
+            try:
+                results.append(graph.action_is_authorized(actor, action))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+
+async def _authorize_async(graph: PermissionGraph, checks: list[Check]) -> list[bool | Exception]:
+    """Authorize a batch of checks with `PermissionGraph.action_is_authorized_async`."""
+    return await asyncio.gather(
+        *(graph.action_is_authorized_async(actor, action) for actor, action in checks), return_exceptions=True
+    )
+
+
+def _resolve(batch: list[tuple[Check, asyncio.Future]], task: asyncio.Future) -> None:
+    """Set the result of each check in a batch from the task that made them."""
+    if task.cancelled():
+        results = [asyncio.CancelledError()] * len(batch)
+    elif task.exception() is not None:
+        results = [task.exception()] * len(batch)
+    else:
+        results = task.result()
+    for (_, future), result in zip(batch, results):
+        if future.done():
+            continue
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
@@ -1,11 +1,44 @@
 import abc
-from typing import Any
+from collections import Counter
+from pathlib import Path
+from typing import Any, Self
 
-from permission_graph.structs import EdgeType, ResourceType, Vertex
+from permission_graph.bidirectional import bidirectional_search
+from permission_graph.snapshot import Snapshot, read_snapshot, write_snapshot
+from permission_graph.structs import (
+    VERTEX_TYPES,
+    EdgeType,
+    ResourceType,
+    Vertex,
+    VertexHandle,
+    VertexRef,
+)
 
 
 class PermissionGraphBackend(abc.ABC):
-    """Base class for PermissionGraph interface."""
+    """Base class for PermissionGraph interface.
+
+    Methods that traverse the graph may return lightweight `VertexRef`s
+    instead of `Vertex` models, and every method accepts a VertexRef wherever
+    it accepts a Vertex. Methods that look up existing vertices also accept a
+    `VertexHandle`.
+
+    Attributes:
+        supports_async: True if the backend implements `search_between_async`
+            without blocking the event loop, so that `AsyncPermissionGraph`
+            can await it instead of running checks in a thread pool.
+        persistent: True if the backend stores the graph somewhere that
+            outlives it, such as a file. Copies made by `copy` need not be
+            persistent, so `ConcurrentPermissionGraph`, which changes copies,
+            does not accept persistent backends.
+        fork_safe: False if a forked process can't use the backend it
+            inherits, e.g. because it holds an open database connection, so
+            `WorkerPool` gives workers a snapshot of the graph instead.
+    """
+
+    supports_async: bool = False
+    persistent: bool = False
+    fork_safe: bool = True
 
     @abc.abstractmethod
     def add_vertex(self, vertex: Vertex, **kwargs) -> None:
@@ -14,22 +47,110 @@ class PermissionGraphBackend(abc.ABC):
         Raises ValueError if vertex already exists.
         """
 
+    def add_vertices(self, vertices: list[Vertex], **kwargs: list[Any]) -> None:
+        """Add many vertices to the permission graph.
+
+        Backends should override this to add all vertices at once. The default
+        implementation calls `add_vertex` per vertex.
+
+        Args:
+            vertices: The vertices to add
+            **kwargs: additional attributes to add to the vertices, each a list
+                with one value per vertex (None to leave unset)
+
+        Raises ValueError if any vertex already exists, or appears more than once.
+        """
+        seen = set()
+        for vertex in vertices:
+            if vertex.id in seen or self.vertex_exists(vertex):
+                raise ValueError(f"Vertex already exists: {vertex}")
+            seen.add(vertex.id)
+        for i, vertex in enumerate(vertices):
+            self.add_vertex(vertex, **{k: v[i] for k, v in kwargs.items() if v[i] is not None})
+
     @abc.abstractmethod
     def remove_vertex(self, vertex: Vertex, **kwargs) -> None:
         """Remove a vertex from the permission graph."""
 
+    def remove_vertices(self, vertices: list[Vertex]) -> None:
+        """Remove many vertices, and their edges, from the permission graph.
+
+        Backends should override this to remove all vertices at once. The
+        default implementation calls `remove_vertex` per vertex.
+
+        Raises ValueError if any vertex does not exist, or appears more than once.
+        """
+        seen = set()
+        for vertex in vertices:
+            key = vertex if isinstance(vertex, int) else vertex.id
+            if key in seen or not self.vertex_exists(vertex):
+                raise ValueError(f"Vertex does not exist: {vertex}")
+            seen.add(key)
+        for vertex in vertices:
+            self.remove_vertex(vertex)
+
     @abc.abstractmethod
     def vertex_exists(self, vertex: Vertex) -> bool:
         """Check if a vertex with vtype=vtype and id=id already exists."""
 
     @abc.abstractmethod
-    def get_vertices_to(self, vertex: Vertex) -> list[Vertex]:
+    def get_handle(self, vertex: Vertex) -> VertexHandle:
+        """Return the handle of a vertex.
+
+        Raises ValueError if the vertex does not exist.
+        """
+
+    @abc.abstractmethod
+    def get_vertex_ref(self, handle: VertexHandle) -> VertexRef:
+        """Return a VertexRef for the vertex with a handle.
+
+        Raises ValueError if no vertex has the handle.
+        """
+
+    @abc.abstractmethod
+    def get_vertices_to(self, vertex: Vertex) -> list[Vertex | VertexRef]:
         """Get all vertices that target a vertex."""
 
     @abc.abstractmethod
-    def get_vertices_from(self, vertex: Vertex) -> list[Vertex]:
+    def get_vertices_from(self, vertex: Vertex) -> list[Vertex | VertexRef]:
         """Get all vertices that a vertex targets."""
 
+    @abc.abstractmethod
+    def get_vertices(self, vtype: str | None = None) -> list[Vertex]:
+        """Get all vertices, or all vertices of a vtype if one is given."""
+
+    def get_edges_from(self, vertex: Vertex) -> list[tuple[Vertex | VertexRef, EdgeType]]:
+        """Get all vertices that a vertex targets, along with the type of each edge.
+
+        Backends should override this to avoid looking up each edge separately.
+        The default implementation calls `get_edge_type` per target.
+        """
+        return [(target, self.get_edge_type(vertex, target)) for target in self.get_vertices_from(vertex)]
+
+    def get_edges_to(self, vertex: Vertex) -> list[tuple[Vertex | VertexRef, EdgeType]]:
+        """Get all vertices that target a vertex, along with the type of each edge.
+
+        Backends should override this to avoid looking up each edge separately.
+        The default implementation calls `get_edge_type` per source.
+        """
+        return [(source, self.get_edge_type(source, vertex)) for source in self.get_vertices_to(vertex)]
+
+    def count_vertices(self) -> dict[str, int]:
+        """Return the number of vertices of each vtype in the graph.
+
+        Backends should override this to count without building every vertex.
+        The default implementation calls `get_vertices`.
+        """
+        return dict(Counter(vertex.vtype for vertex in self.get_vertices()))
+
+    def count_edges(self) -> dict[EdgeType, int]:
+        """Return the number of edges of each EdgeType in the graph.
+
+        Backends should override this to count without visiting every vertex.
+        The default implementation calls `get_edges_from` per vertex.
+        """
+        return dict(Counter(etype for vertex in self.get_vertices() for _, etype in self.get_edges_from(vertex)))
+
     @abc.abstractmethod
     def update_vertex_attributes(self, vertex: Vertex, **kwargs):
         """Update one or more attributes of a vertex."""
@@ -47,6 +168,26 @@ class PermissionGraphBackend(abc.ABC):
         Raises ValueError if an edge from source to target already exists.
         """
 
+    def add_edges(self, edges: list[tuple[EdgeType, Vertex, Vertex]]) -> None:
+        """Add many edges to the permission graph.
+
+        Backends should override this to add all edges at once. The default
+        implementation calls `add_edge` per edge.
+
+        Args:
+            edges: (etype, source, target) tuples
+
+        Raises ValueError if an edge from source to target already exists, or
+        appears more than once.
+        """
+        seen = set()
+        for _, source, target in edges:
+            if (source.id, target.id) in seen or self.edge_exists(source, target):
+                raise ValueError(f"There is already an edge from {source} to {target}")
+            seen.add((source.id, target.id))
+        for etype, source, target in edges:
+            self.add_edge(etype, source, target)
+
     @abc.abstractmethod
     def edge_exists(self, source: Vertex, target: Vertex) -> bool:
         """Return True if edge exists."""
@@ -56,7 +197,7 @@ class PermissionGraphBackend(abc.ABC):
         """Remove an edge from the permission graph."""
 
     @abc.abstractmethod
-    def shortest_paths(self, source: Vertex, target: Vertex) -> list[list[Vertex]]:
+    def shortest_paths(self, source: Vertex, target: Vertex) -> list[list[Vertex | VertexRef]]:
         """Return the lists of vertices that make the shortest paths from source to target.
 
         Returns:
@@ -66,6 +207,55 @@ class PermissionGraphBackend(abc.ABC):
                 shortest path.
         """
 
+    def shortest_paths_many(self, source: Vertex, targets: list[Vertex]) -> list[list[list[Vertex | VertexRef]]]:
+        """Return the shortest paths from source to each of many targets.
+
+        Backends should override this to search from source once for all
+        targets. The default implementation calls `shortest_paths` per target.
+
+        Returns:
+            A list with one element per target, in the same order as `targets`,
+            each formatted like the return value of `shortest_paths`.
+        """
+        return [self.shortest_paths(source, target) for target in targets]
+
+    def search_between(
+        self, source: Vertex | VertexHandle, target: Vertex | VertexHandle
+    ) -> tuple[int, set[EdgeType]] | None:
+        """Find the length and final edge types of the shortest paths from source to target.
+
+        Backends should override this to search their own representation of
+        the graph. The default implementation runs `bidirectional_search` over
+        `get_vertices_from` and `get_edges_to`.
+
+        Returns:
+            A (length, final edge types) tuple, or None if there is no path
+            from source to target.
+        """
+
+        def ref(vertex: Vertex | VertexRef | VertexHandle) -> VertexRef:
+            if isinstance(vertex, int):
+                return self.get_vertex_ref(vertex)
+            return vertex if isinstance(vertex, VertexRef) else VertexRef(id=vertex.id, vtype=vertex.vtype)
+
+        return bidirectional_search(
+            ref(source),
+            ref(target),
+            successors=lambda vertex: map(ref, self.get_vertices_from(vertex)),
+            predecessors=lambda vertex: ((ref(v), etype) for v, etype in self.get_edges_to(vertex)),
+        )
+
+    async def search_between_async(
+        self, source: Vertex | VertexHandle, target: Vertex | VertexHandle
+    ) -> tuple[int, set[EdgeType]] | None:
+        """Find the length and final edge types of the shortest paths from source to target.
+
+        Backends that can search without blocking (e.g. over an async database
+        driver) should override this and set `supports_async`. The default
+        implementation calls `search_between`, blocking the event loop.
+        """
+        return self.search_between(source, target)
+
     @abc.abstractmethod
     def get_edge_type(self, source: Vertex, target: Vertex) -> EdgeType:
         """Return the EdgeType of the edge connecting two vertices.
@@ -79,3 +269,65 @@ class PermissionGraphBackend(abc.ABC):
 
         Given a vertex id, return an vertex object of the appropriate subclass.
         """
+
+    def copy(self) -> Self:
+        """Return an independent copy of this backend.
+
+        Backends should override this with a faster implementation that also
+        keeps vertex handles. The default implementation creates the backend
+        with no arguments and adds this backend's vertices and edges to it.
+        """
+        backend = type(self)()
+        vertices = self.get_vertices()
+        actions = [vertex.actions if isinstance(vertex, ResourceType) else None for vertex in vertices]
+        backend.add_vertices(vertices, actions=actions)
+        backend.add_edges(
+            [(etype, source, target) for source in vertices for target, etype in self.get_edges_from(source)]
+        )
+        return backend
+
+    def save(self, path: str | Path) -> None:
+        """Save the permission graph to a snapshot file.
+
+        Backends may override this with a faster implementation. The default
+        implementation saves resource type actions, but no other attributes.
+        """
+        vertices = self.get_vertices()
+        indices = {vertex.id: i for i, vertex in enumerate(vertices)}
+        adjacency = [
+            [(indices[target.id], etype.value) for target, etype in self.get_edges_from(vertex)] for vertex in vertices
+        ]
+        actions = {i: vertex.actions for i, vertex in enumerate(vertices) if isinstance(vertex, ResourceType)}
+        snapshot = Snapshot.from_adjacency(
+            vertex_ids=[vertex.id for vertex in vertices],
+            vtypes=[vertex.vtype for vertex in vertices],
+            adjacency=adjacency,
+            attributes={"actions": actions},
+        )
+        write_snapshot(path, snapshot)
+
+    @classmethod
+    def load(cls, path: str | Path) -> Self:
+        """Return a new backend containing the permission graph saved in a snapshot file.
+
+        Backends may override this with a faster implementation. The default
+        implementation creates the backend with no arguments and adds the
+        saved vertices and edges to it.
+        """
+        backend = cls()
+        with read_snapshot(path) as snapshot:
+            vertices = []
+            for i, (vertex_id, vtype) in enumerate(zip(snapshot.vertex_ids, snapshot.vtypes)):
+                attributes = {name: values[i] for name, values in snapshot.attributes.items() if i in values}
+                vertices.append(VERTEX_TYPES[vtype].from_id(vertex_id, **attributes))
+            backend.add_vertices(
+                vertices,
+                **{name: [values.get(i) for i in range(len(vertices))] for name, values in snapshot.attributes.items()},
+            )
+            backend.add_edges(
+                [
+                    (EdgeType(etype), vertices[source], vertices[target])
+                    for (source, target), etype in zip(snapshot.edge_pairs(), snapshot.etypes)
+                ]
+            )
+        return backend
@@ -1,80 +1,304 @@
-from typing import Any
+import warnings
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterable, Self
 
 import igraph
 
 from permission_graph.backends.base import PermissionGraphBackend
+from permission_graph.bidirectional import bidirectional_search
+from permission_graph.snapshot import Snapshot, read_snapshot, write_snapshot
 from permission_graph.structs import (
-    Action,
-    Actor,
+    VERTEX_TYPES,
     EdgeType,
-    Group,
-    Resource,
-    ResourceType,
     Vertex,
+    VertexHandle,
+    VertexRef,
 )
 
+# igraph vertex attributes that aren't attributes of the Vertex
+RESERVED_ATTRIBUTES = ("name", "vtype", "handle")
+
 
 class IGraphMemoryBackend(PermissionGraphBackend):
-    """IGraph based PermissionGraphBackend implementation."""
+    """IGraph based PermissionGraphBackend implementation.
+
+    Each vertex stores its handle in a "handle" attribute. igraph renumbers
+    vertices when one is deleted, so the handle to index mapping is rebuilt
+    from that attribute the first time a handle is used after a deletion.
+
+    Every igraph deletion rebuilds the graph's indices, so removing many
+    vertices or edges one at a time takes time proportional to the size of
+    the graph for each. With `tombstones=True`, removals instead mark the
+    vertex (a vtype of None) or edge (an etype of None) as dead, and
+    traversals skip dead edges. Vertex ids are looked up through the handle
+    tables rather than igraph's name index, which would still find dead
+    vertices. Dead vertices and edges are deleted together by `compact`,
+    which runs automatically once `tombstone_ratio` exceeds the compaction
+    threshold. A `MetricsRegistry` watching the backend exports the ratio as
+    a gauge.
+    """
+
+    def __init__(self, tombstones: bool = False, compaction_threshold: float = 0.25):
+        """Initialize a new IGraphMemoryBackend.
 
-    def __init__(self):
+        Args:
+            tombstones: If True, mark removed vertices and edges as dead
+                instead of deleting them straight away
+            compaction_threshold: With tombstones, compact the graph once the
+                fraction of dead vertices and edges exceeds this
+        """
         self._g = igraph.Graph(directed=True)
+        self._handles: dict[str, VertexHandle] = {}
+        self._handle_indices: dict[VertexHandle, int] | None = {}
+        self._next_handle = 0
+        self.tombstones = tombstones
+        self.compaction_threshold = compaction_threshold
+        self._dead_vertices = 0
+        self._dead_edges = 0
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """The fraction of the vertices and edges in the igraph graph that are dead."""
+        return (self._dead_vertices + self._dead_edges) / max(1, self._g.vcount() + self._g.ecount())
+
+    def compact(self) -> None:
+        """Delete dead vertices and edges from the igraph graph.
+
+        Renumbers the igraph graph once. Vertex handles don't change.
+        """
+        if self._dead_edges:
+            self._g.delete_edges([eid for eid, etype in enumerate(self._g.es["etype"]) if etype is None])
+        if self._dead_vertices:
+            self._g.delete_vertices([index for index, vtype in enumerate(self._g.vs["vtype"]) if vtype is None])
+        self._dead_vertices = self._dead_edges = 0
+        handles = self._g.vs["handle"] if self._g.vcount() else []
+        self._handle_indices = {handle: index for index, handle in enumerate(handles)}
+
+    def _compact_if_needed(self) -> None:
+        """Compact the graph if the fraction of dead vertices and edges exceeds the compaction threshold."""
+        if self.tombstone_ratio > self.compaction_threshold:
+            self.compact()
 
     def add_vertex(self, vertex: Vertex, **kwargs) -> None:
-        try:
-            self._get_igraph_vertex(vertex.id)
-        except ValueError:
-            self._g.add_vertex(f"{vertex.id}", vtype=vertex.vtype, **kwargs)
-        else:
+        if self.vertex_exists(vertex):
             raise ValueError(f"Vertex already exists: {vertex}")
+        (handle,) = self._new_handles([vertex.id])
+        self._g.add_vertex(f"{vertex.id}", vtype=vertex.vtype, handle=handle, **kwargs)
+
+    def add_vertices(self, vertices: list[Vertex], **kwargs: list[Any]) -> None:
+        vertex_ids = [vertex.id for vertex in vertices]
+        seen = set()
+        for vertex, vertex_id in zip(vertices, vertex_ids):
+            if vertex_id in seen or self.vertex_exists(vertex):
+                raise ValueError(f"Vertex already exists: {vertex}")
+            seen.add(vertex_id)
+        handles = self._new_handles(vertex_ids)
+        attributes = dict(name=vertex_ids, vtype=[vertex.vtype for vertex in vertices], handle=handles, **kwargs)
+        self._g.add_vertices(len(vertices), attributes=attributes)
+
+    def _new_handles(self, vertex_ids: list[str]) -> list[VertexHandle]:
+        """Assign handles to vertices about to be appended to the igraph graph."""
+        handles = list(range(self._next_handle, self._next_handle + len(vertex_ids)))
+        self._next_handle += len(vertex_ids)
+        self._handles.update(zip(vertex_ids, handles))
+        if self._handle_indices is not None:
+            self._handle_indices.update(zip(handles, range(self._g.vcount(), self._g.vcount() + len(handles))))
+        return handles
+
+    def remove_vertex(self, vertex: Vertex | VertexHandle) -> None:
+        self.remove_vertices([vertex])
+
+    def remove_vertices(self, vertices: list[Vertex | VertexHandle]) -> None:
+        """Remove many vertices with a single igraph `delete_vertices` call, which renumbers the graph once.
 
-    def remove_vertex(self, vertex: Vertex) -> None:
-        v = self._g.vs.find(vertex.id)
-        self._g.delete_vertices(v.index)
+        With tombstones, the vertices and their edges are marked as dead instead.
+        """
+        indices = [self._index(vertex) for vertex in vertices]
+        if len(set(indices)) != len(indices):
+            raise ValueError("A vertex appears more than once")
+        if not indices:
+            return
+        removed = self._g.vs.select(indices)
+        for name in removed["name"]:
+            del self._handles[name]
+        if not self.tombstones:
+            self._g.delete_vertices(indices)
+            self._handle_indices = None
+            return
+        for handle in removed["handle"]:
+            del self._handle_indices[handle]
+        removed["vtype"] = None
+        self._dead_vertices += len(indices)
+        self._kill_edges({eid for index in indices for eid in self._g.incident(index, mode="all")})
+        self._compact_if_needed()
 
-    def update_vertex_attributes(self, vertex: Vertex, **kwargs: Any) -> None:
-        v = self._g.vs.find(vertex.id)
+    def _kill_edges(self, eids: Iterable[int]) -> None:
+        """Mark edges as dead, if they aren't already."""
+        edges = self._g.es.select(list(eids))
+        if len(edges) == 0:
+            return
+        live = [edge.index for edge, etype in zip(edges, edges["etype"]) if etype is not None]
+        if live:
+            self._g.es.select(live)["etype"] = None
+            self._dead_edges += len(live)
+
+    def update_vertex_attributes(self, vertex: Vertex | VertexHandle, **kwargs: Any) -> None:
+        v = self._g.vs[self._index(vertex)]
         for key, value in kwargs.items():
             v[key] = value
 
-    def get_vertices_to(self, vertex: Vertex) -> list[Vertex]:
-        v = self._get_igraph_vertex(vertex.id)
-        sources = [self.vertex_factory(edge.source_vertex["name"]) for edge in self._g.es.select(_target=v)]
-        return sources
+    def get_handle(self, vertex: Vertex) -> VertexHandle:
+        try:
+            return self._handles[vertex.id]
+        except KeyError:
+            raise ValueError(f"Vertex does not exist: {vertex}") from None
+
+    def get_vertex_ref(self, handle: VertexHandle) -> VertexRef:
+        (ref,) = self._refs([self._index(handle)])
+        return ref
+
+    def _index(self, vertex: Vertex | VertexRef | VertexHandle) -> int:
+        """Return the igraph index of a vertex, given the vertex or its handle.
 
-    def get_vertices_from(self, vertex: Vertex) -> list[Vertex]:
-        v = self._get_igraph_vertex(vertex.id)
-        sources = [self.vertex_factory(edge.target_vertex["name"]) for edge in self._g.es.select(_source=v)]
-        return sources
+        Raises ValueError if the vertex does not exist.
+        """
+        if isinstance(vertex, int):
+            if self._handle_indices is None:
+                handles = self._g.vs["handle"] if self._g.vcount() else []
+                self._handle_indices = {handle: index for index, handle in enumerate(handles)}
+            try:
+                return self._handle_indices[vertex]
+            except KeyError:
+                raise ValueError(f"No vertex has handle: {vertex}") from None
+        return self._get_igraph_vertex(vertex.id).index
+
+    def get_vertices_to(self, vertex: Vertex | VertexHandle) -> list[VertexRef]:
+        if self._dead_edges:
+            return self._refs([source for source, _ in self._live_edges(self._index(vertex), mode="in")])
+        return self._refs(self._g.neighbors(self._index(vertex), mode="in"))
+
+    def get_vertices_from(self, vertex: Vertex | VertexHandle) -> list[VertexRef]:
+        if self._dead_edges:
+            return self._refs([target for target, _ in self._live_edges(self._index(vertex), mode="out")])
+        return self._refs(self._g.neighbors(self._index(vertex), mode="out"))
+
+    def get_vertices(self, vtype: str | None = None) -> list[Vertex]:
+        if self._g.vcount() == 0:
+            return []
+        if vtype is None:
+            vertices = self._g.vs.select(vtype_ne=None) if self._dead_vertices else self._g.vs
+        else:
+            vertices = self._g.vs.select(vtype_eq=vtype)
+        return [self._vertex_from_igraph(v) for v in vertices]
+
+    def count_vertices(self) -> dict[str, int]:
+        if self._g.vcount() == 0:
+            return {}
+        counts = Counter(self._g.vs["vtype"])
+        counts.pop(None, None)
+        return dict(counts)
+
+    def count_edges(self) -> dict[EdgeType, int]:
+        if self._g.ecount() == 0:
+            return {}
+        return {EdgeType(etype): n for etype, n in Counter(self._g.es["etype"]).items() if etype is not None}
+
+    def get_edges_from(self, vertex: Vertex | VertexHandle) -> list[tuple[VertexRef, EdgeType]]:
+        edges = self._live_edges(self._index(vertex), mode="out")
+        targets = self._refs([target for target, _ in edges])
+        return [(target, EdgeType(etype)) for target, (_, etype) in zip(targets, edges)]
+
+    def get_edges_to(self, vertex: Vertex | VertexHandle) -> list[tuple[VertexRef, EdgeType]]:
+        edges = self._live_edges(self._index(vertex), mode="in")
+        sources = self._refs([source for source, _ in edges])
+        return [(source, EdgeType(etype)) for source, (_, etype) in zip(sources, edges)]
+
+    def _live_edges(self, index: int, mode: str) -> list[tuple[int, str]]:
+        """Return the other end and etype of the edges out of (mode="out") or into (mode="in") a vertex.
+
+        Dead edges are skipped.
+        """
+        edges = self._g.es.select(self._g.incident(index, mode=mode))
+        if len(edges) == 0:
+            return []
+        ends = [e.target for e in edges] if mode == "out" else [e.source for e in edges]
+        return [(end, etype) for end, etype in zip(ends, edges["etype"]) if etype is not None]
 
     def _get_igraph_vertex(self, vertex_id: str) -> igraph.Vertex:
-        """Get an igraph vertex given a vertex id."""
+        """Get an igraph vertex given a vertex id.
+
+        Raises ValueError if the vertex does not exist.
+        """
+        if self.tombstones:
+            # igraph's name index also finds dead vertices
+            try:
+                return self._g.vs[self._handle_indices[self._handles[vertex_id]]]
+            except KeyError:
+                raise ValueError(f"Vertex does not exist: {vertex_id}") from None
         return self._g.vs.find(vertex_id)
 
-    def vertex_exists(self, vertex: Vertex) -> bool:
+    def vertex_exists(self, vertex: Vertex | VertexHandle) -> bool:
         """Return True if a vertex wit hthat id already exists."""
         try:
-            self._get_igraph_vertex(vertex.id)
+            self._index(vertex)
             return True
         except ValueError:
             return False
 
-    def add_edge(self, etype: EdgeType, source: Vertex, target: Vertex, **kwargs) -> None:
-        v1 = self._get_igraph_vertex(source.id)
-        v2 = self._get_igraph_vertex(target.id)
-        try:
-            self._get_igraph_edge(source, target)
-        except ValueError:
-            extra_attrs = {attr: [val] for attr, val in kwargs.items()}
-            self._g.add_edges([(v1, v2)], attributes=dict(etype=[etype.value], **extra_attrs))
-        else:
-            raise ValueError(f"There is already an edge between vertices '{v1.index}' and '{v2.index}'")
+    def add_edge(self, etype: EdgeType, source: Vertex | VertexHandle, target: Vertex | VertexHandle, **kwargs) -> None:
+        v1 = self._index(source)
+        v2 = self._index(target)
+        if self._get_igraph_eid(v1, v2) != -1:
+            raise ValueError(f"There is already an edge between vertices '{v1}' and '{v2}'")
+        if self._dead_edges and (eid := self._g.get_eid(v1, v2, error=False)) != -1:
+            # Bring the dead edge back, so that there is never more than one edge between two vertices
+            self._g.es[eid].update_attributes(etype=etype.value, **kwargs)
+            self._dead_edges -= 1
+            return
+        extra_attrs = {attr: [val] for attr, val in kwargs.items()}
+        self._g.add_edges([(v1, v2)], attributes=dict(etype=[etype.value], **extra_attrs))
 
-    def _get_igraph_edge(self, source: Vertex, target: Vertex) -> igraph.Edge:
-        """Return an IGraph edge given edge definition."""
-        v1 = self._get_igraph_vertex(source.id)
-        v2 = self._get_igraph_vertex(target.id)
-        return self._g.es.find(_source=v1.index, _target=v2.index)
+    def add_edges(self, edges: list[tuple[EdgeType, Vertex | VertexHandle, Vertex | VertexHandle]]) -> None:
+        pairs = [(self._index(source), self._index(target)) for _, source, target in edges]
+        eids = self._g.get_eids(pairs, error=False)
+        dead = set()
+        if self._dead_edges:
+            existing = self._g.es.select([eid for eid in eids if eid != -1])
+            dead = {edge.index for edge, etype in zip(existing, existing["etype"]) if etype is None}
+        seen = set()
+        for (_, source, target), pair, eid in zip(edges, pairs, eids):
+            if (eid != -1 and eid not in dead) or pair in seen:
+                raise ValueError(f"There is already an edge from {source} to {target}")
+            seen.add(pair)
+        new = [(etype, pair) for (etype, _, _), pair, eid in zip(edges, pairs, eids) if eid == -1]
+        # Bring dead edges back, so that there is never more than one edge between two vertices
+        for (etype, _, _), eid in zip(edges, eids):
+            if eid in dead:
+                self._g.es[eid]["etype"] = etype.value
+        self._dead_edges -= len(dead)
+        self._g.add_edges([pair for _, pair in new], attributes=dict(etype=[etype.value for etype, _ in new]))
+
+    def _get_igraph_eid(self, v1: int, v2: int) -> int:
+        """Return the id of the live edge between two igraph vertex indices, or -1 if there is no such edge.
+
+        Uses igraph's adjacency lists, so the cost depends on the degree of v1
+        rather than on the number of edges in the graph.
+        """
+        eid = self._g.get_eid(v1, v2, error=False)
+        if eid != -1 and self._dead_edges and self._g.es[eid]["etype"] is None:
+            return -1
+        return eid
+
+    def _get_igraph_edge(self, source: Vertex | VertexHandle, target: Vertex | VertexHandle) -> igraph.Edge:
+        """Return an IGraph edge given edge definition.
+
+        Raises ValueError if there is no edge from source to target.
+        """
+        eid = self._get_igraph_eid(self._index(source), self._index(target))
+        if eid == -1:
+            raise ValueError(f"There is no edge from {source} to {target}.")
+        return self._g.es[eid]
 
     def edge_exists(self, source: Vertex, target: Vertex) -> bool:
         """Return True if there is an edge between source and target."""
@@ -87,41 +311,159 @@ class IGraphMemoryBackend(PermissionGraphBackend):
     def remove_edge(self, source: Vertex, target: Vertex) -> None:
         """Remove an edge from the permission graph."""
         e = self._get_igraph_edge(source, target)
-        if e is not None:
+        if self.tombstones:
+            self._kill_edges([e.index])
+            self._compact_if_needed()
+        else:
             self._g.delete_edges(e.index)
 
-    def shortest_paths(self, source: Vertex, target: Vertex) -> list[list[Vertex]]:
+    def shortest_paths(self, source: Vertex, target: Vertex) -> list[list[VertexRef]]:
         """Return all shortest paths from source to target."""
-        v1 = self._get_igraph_vertex(source.id)
-        v2 = self._get_igraph_vertex(target.id)
-        paths = self._g.get_all_shortest_paths(v1, v2)
-        output = []
-        for path in paths:
-            vertex_path = []
-            for index in path:
-                v = self._g.vs[index]
-                vertex_path.append(self.vertex_factory(v["name"]))
-            output.append(vertex_path)
-        return output
+        return self.shortest_paths_many(source, [target])[0]
+
+    def shortest_paths_many(self, source: Vertex, targets: list[Vertex]) -> list[list[list[VertexRef]]]:
+        """Return all shortest paths from source to each target, using a single search.
+
+        If there are dead edges, they are given a weight greater than the
+        length of any path of live edges, and paths through them are dropped.
+        """
+        target_indices = [self._index(target) for target in targets]
+        paths_by_target = {index: [] for index in target_indices}
+        weights = None
+        if self._dead_edges:
+            dead_weight = self._g.ecount() + 1
+            weights = [dead_weight if etype is None else 1 for etype in self._g.es["etype"]]
+        with warnings.catch_warnings():
+            # The weighted search warns about unreachable targets, which are expected
+            warnings.simplefilter("ignore", RuntimeWarning)
+            paths = self._g.get_all_shortest_paths(self._index(source), to=list(paths_by_target), weights=weights)
+        if weights is not None:
+            paths = [path for path in paths if not any(weights[eid] != 1 for eid in self._path_eids(path))]
+        for path, ref_path in zip(paths, self._ref_paths(paths)):
+            paths_by_target[path[-1]].append(ref_path)
+        return [list(paths_by_target[index]) for index in target_indices]
+
+    def _path_eids(self, path: list[int]) -> list[int]:
+        """Return the ids of the edges along a path of igraph vertex indices."""
+        return self._g.get_eids(list(zip(path, path[1:]))) if len(path) > 1 else []
+
+    def search_between(
+        self, source: Vertex | VertexHandle, target: Vertex | VertexHandle
+    ) -> tuple[int, set[EdgeType]] | None:
+        """Find the length and final edge types of the shortest paths from source to target.
+
+        Searches igraph vertex indices, and expands whichever frontier has
+        fewer edges to follow.
+        """
+        g = self._g
+
+        def predecessors(index: int) -> list[tuple[int, EdgeType]]:
+            sources = g.neighbors(index, mode="in")
+            if not sources:
+                return []
+            edges = g.es.select(g.get_eids([(source, index) for source in sources]))
+            return list(zip(sources, map(EdgeType, edges["etype"])))
+
+        def live_predecessors(index: int) -> list[tuple[int, EdgeType]]:
+            return [(source, EdgeType(etype)) for source, etype in self._live_edges(index, mode="in")]
+
+        def live_successors(index: int) -> list[int]:
+            return [target for target, _ in self._live_edges(index, mode="out")]
+
+        return bidirectional_search(
+            self._index(source),
+            self._index(target),
+            successors=live_successors if self._dead_edges else lambda index: g.neighbors(index, mode="out"),
+            predecessors=live_predecessors if self._dead_edges else predecessors,
+            forward_cost=lambda frontier: sum(g.degree(frontier, mode="out")),
+            backward_cost=lambda frontier: sum(g.degree(frontier, mode="in")),
+        )
+
+    def _refs(self, indices: list[int]) -> list[VertexRef]:
+        """Return VertexRefs for a list of igraph vertex indices."""
+        if not indices:
+            return []
+        vertices = self._g.vs.select(indices)
+        return list(map(VertexRef, vertices["name"], vertices["vtype"]))
+
+    def _ref_paths(self, paths: list[list[int]]) -> list[list[VertexRef]]:
+        """Convert paths of igraph vertex indices to paths of VertexRefs.
+
+        Vertices shared between paths share the same VertexRef.
+        """
+        indices = list({index for path in paths for index in path})
+        refs = dict(zip(indices, self._refs(indices)))
+        return [[refs[index] for index in path] for path in paths]
 
     def get_edge_type(self, source: Vertex, target: Vertex) -> EdgeType:
         """Get the type of edge from source to target."""
         e = self._get_igraph_edge(source, target)
-        if e is None:
-            raise ValueError(f"There is no edge from {source} to {target}.")
         return EdgeType(e["etype"])
 
     def vertex_factory(self, vertex_id) -> Vertex:
         """Return a vertex from a vertex id."""
-        vtype_map = {
-            "actor": Actor,
-            "resource": Resource,
-            "action": Action,
-            "group": Group,
-            "resource_type": ResourceType,
+        return self._vertex_from_igraph(self._get_igraph_vertex(vertex_id))
+
+    def _vertex_from_igraph(self, v: igraph.Vertex) -> Vertex:
+        """Return a vertex from an igraph vertex."""
+        attributes = {
+            k: value for k, value in v.attributes().items() if k not in RESERVED_ATTRIBUTES and value is not None
         }
-        vtype = vertex_id.split(":")[0]
-        v = self._get_igraph_vertex(vertex_id)
-        attributes = v.attributes()
-        attributes = {k: v for k, v in v.attributes().items() if k not in ("vtype", "name") and v is not None}
-        return vtype_map[vtype].from_id(vertex_id, **attributes)
+        return VERTEX_TYPES[v["vtype"]].from_id(v["name"], **attributes)
+
+    def copy(self) -> Self:
+        """Return an independent copy of this backend, with the same vertex handles and tombstones."""
+        backend = type(self)(tombstones=self.tombstones, compaction_threshold=self.compaction_threshold)
+        backend._dead_vertices = self._dead_vertices
+        backend._dead_edges = self._dead_edges
+        backend._g = self._g.copy()
+        backend._handles = dict(self._handles)
+        backend._next_handle = self._next_handle
+        backend._handle_indices = None if self._handle_indices is None else dict(self._handle_indices)
+        return backend
+
+    def save(self, path: str | Path) -> None:
+        """Save the permission graph to a snapshot file, including all vertex attributes.
+
+        Compacts the graph first, if it has any dead vertices or edges.
+        """
+        if self._dead_vertices or self._dead_edges:
+            self.compact()
+        edgelist = self._g.get_edgelist()
+        etypes = self._g.es["etype"] if edgelist else []
+        adjacency = [[(edgelist[eid][1], etypes[eid]) for eid in eids] for eids in self._g.get_inclist(mode="out")]
+        attributes = {
+            name: {i: value for i, value in enumerate(self._g.vs[name]) if value is not None}
+            for name in self._g.vs.attributes()
+            if name not in RESERVED_ATTRIBUTES
+        }
+        snapshot = Snapshot.from_adjacency(
+            vertex_ids=self._g.vs["name"] if self._g.vcount() else [],
+            vtypes=self._g.vs["vtype"] if self._g.vcount() else [],
+            adjacency=adjacency,
+            attributes=attributes,
+        )
+        write_snapshot(path, snapshot)
+
+    @classmethod
+    def load(cls, path: str | Path) -> Self:
+        """Return a new backend containing the permission graph saved in a snapshot file.
+
+        The igraph graph is built directly from the memory mapped arrays,
+        without creating a Vertex per vertex. Vertices are given new handles.
+        """
+        backend = cls()
+        with read_snapshot(path) as snapshot:
+            n_vertices = len(snapshot.vertex_ids)
+            handles = backend._new_handles(snapshot.vertex_ids)
+            vertex_attrs = {"name": snapshot.vertex_ids, "vtype": snapshot.vtypes, "handle": handles}
+            for name, values in snapshot.attributes.items():
+                vertex_attrs[name] = [values.get(i) for i in range(n_vertices)]
+            backend._g = igraph.Graph(
+                n=n_vertices,
+                edges=snapshot.edge_pairs(),
+                directed=True,
+                vertex_attrs=vertex_attrs,
+                edge_attrs={"etype": snapshot.etypes},
+            )
+        return backend
@@ -0,0 +1,465 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Self
+
+from permission_graph.backends.base import PermissionGraphBackend
+from permission_graph.bidirectional import bidirectional_level_search
+from permission_graph.snapshot import (
+    ETYPES,
+    VTYPES,
+    Snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+from permission_graph.structs import (
+    VERTEX_TYPES,
+    EdgeType,
+    Vertex,
+    VertexHandle,
+    VertexRef,
+)
+
+# The most parameters used in one statement, below SQLite's default limit on older versions
+MAX_PARAMETERS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vertices (
+    handle INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    vtype INTEGER NOT NULL,
+    attributes TEXT
+);
+CREATE INDEX IF NOT EXISTS vertices_vtype ON vertices (vtype, handle);
+CREATE TABLE IF NOT EXISTS edges (
+    source INTEGER NOT NULL,
+    target INTEGER NOT NULL,
+    etype INTEGER NOT NULL,
+    PRIMARY KEY (source, target)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_target ON edges (target, source, etype);
+"""
+
+
+class SQLiteBackend(PermissionGraphBackend):
+    """SQLite based PermissionGraphBackend implementation, for graphs that don't fit in memory.
+
+    Vertices are rows of a `vertices` table, and their handle is the row's
+    primary key, so handles are never reused. Edges are stored in a
+    `WITHOUT ROWID` table clustered by source, with a covering index by
+    target, so a vertex's outgoing and incoming edges each sit together on a
+    few pages. Vtypes and etypes are stored as the integer codes used by
+    snapshot files.
+
+    File databases use write-ahead logging, so other connections to the same
+    file can read while this one writes. Statements are written as constant
+    strings, so the `sqlite3` module prepares each one once and reuses it.
+
+    SQLite connections must not be used across `fork()`, so the backend is
+    not fork safe.
+    """
+
+    fork_safe = False
+
+    def __init__(self, database: str | Path = ":memory:") -> None:
+        """Initialize a new SQLiteBackend.
+
+        Args:
+            database: The database file, created if it doesn't exist (default
+                a new in-memory database)
+        """
+        self.database = database
+        self.persistent = database != ":memory:"
+        self._connection = sqlite3.connect(
+            database, isolation_level=None, check_same_thread=False, cached_statements=256
+        )
+        if self.persistent:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in a transaction, rolled back if the block raises."""
+        self._connection.execute("BEGIN")
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def add_vertex(self, vertex: Vertex, **kwargs) -> None:
+        try:
+            self._connection.execute(
+                "INSERT INTO vertices (id, vtype, attributes) VALUES (?, ?, ?)",
+                (vertex.id, VTYPES.index(vertex.vtype), _dump_attributes(kwargs)),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Vertex already exists: {vertex}") from None
+
+    def add_vertices(self, vertices: list[Vertex], **kwargs: list[Any]) -> None:
+        rows = [
+            (
+                vertex.id,
+                VTYPES.index(vertex.vtype),
+                _dump_attributes({k: v[i] for k, v in kwargs.items() if v[i] is not None}),
+            )
+            for i, vertex in enumerate(vertices)
+        ]
+        try:
+            with self._transaction() as connection:
+                connection.executemany("INSERT INTO vertices (id, vtype, attributes) VALUES (?, ?, ?)", rows)
+        except sqlite3.IntegrityError:
+            raise ValueError("A vertex already exists, or appears more than once") from None
+
+    def remove_vertex(self, vertex: Vertex | VertexHandle) -> None:
+        handle = self._handle(vertex)
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM edges WHERE source = ?", (handle,))
+            connection.execute("DELETE FROM edges WHERE target = ?", (handle,))
+            connection.execute("DELETE FROM vertices WHERE handle = ?", (handle,))
+
+    def remove_vertices(self, vertices: list[Vertex | VertexHandle]) -> None:
+        handles = [(self._handle(vertex),) for vertex in vertices]
+        if len(set(handles)) != len(handles):
+            raise ValueError("A vertex appears more than once")
+        with self._transaction() as connection:
+            connection.executemany("DELETE FROM edges WHERE source = ?", handles)
+            connection.executemany("DELETE FROM edges WHERE target = ?", handles)
+            connection.executemany("DELETE FROM vertices WHERE handle = ?", handles)
+
+    def update_vertex_attributes(self, vertex: Vertex | VertexHandle, **kwargs: Any) -> None:
+        handle = self._handle(vertex)
+        with self._transaction() as connection:
+            (attributes,) = connection.execute("SELECT attributes FROM vertices WHERE handle = ?", (handle,)).fetchone()
+            attributes = {**_load_attributes(attributes), **kwargs}
+            connection.execute(
+                "UPDATE vertices SET attributes = ? WHERE handle = ?",
+                (_dump_attributes({k: v for k, v in attributes.items() if v is not None}), handle),
+            )
+
+    def get_handle(self, vertex: Vertex) -> VertexHandle:
+        row = self._connection.execute("SELECT handle FROM vertices WHERE id = ?", (vertex.id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Vertex does not exist: {vertex}")
+        return VertexHandle(row[0])
+
+    def get_vertex_ref(self, handle: VertexHandle) -> VertexRef:
+        row = self._connection.execute("SELECT id, vtype FROM vertices WHERE handle = ?", (handle,)).fetchone()
+        if row is None:
+            raise ValueError(f"No vertex has handle: {handle}")
+        return VertexRef(row[0], VTYPES[row[1]])
+
+    def _handle(self, vertex: Vertex | VertexRef | VertexHandle) -> int:
+        """Return the handle of a vertex, given the vertex or its handle.
+
+        Raises ValueError if the vertex does not exist.
+        """
+        if isinstance(vertex, int):
+            if self._connection.execute("SELECT 1 FROM vertices WHERE handle = ?", (vertex,)).fetchone() is None:
+                raise ValueError(f"No vertex has handle: {vertex}")
+            return vertex
+        return self.get_handle(vertex)
+
+    def get_vertices_to(self, vertex: Vertex | VertexHandle) -> list[VertexRef]:
+        rows = self._connection.execute(
+            "SELECT v.id, v.vtype FROM edges e JOIN vertices v ON v.handle = e.source"
+            " WHERE e.target = ? ORDER BY e.source",
+            (self._handle(vertex),),
+        )
+        return [VertexRef(vertex_id, VTYPES[vtype]) for vertex_id, vtype in rows]
+
+    def get_vertices_from(self, vertex: Vertex | VertexHandle) -> list[VertexRef]:
+        rows = self._connection.execute(
+            "SELECT v.id, v.vtype FROM edges e JOIN vertices v ON v.handle = e.target"
+            " WHERE e.source = ? ORDER BY e.target",
+            (self._handle(vertex),),
+        )
+        return [VertexRef(vertex_id, VTYPES[vtype]) for vertex_id, vtype in rows]
+
+    def get_vertices(self, vtype: str | None = None) -> list[Vertex]:
+        if vtype is None:
+            rows = self._connection.execute("SELECT id, vtype, attributes FROM vertices ORDER BY handle")
+        elif vtype in VTYPES:
+            rows = self._connection.execute(
+                "SELECT id, vtype, attributes FROM vertices WHERE vtype = ? ORDER BY handle", (VTYPES.index(vtype),)
+            )
+        else:
+            return []
+        return [_vertex_from_row(*row) for row in rows]
+
+    def count_vertices(self) -> dict[str, int]:
+        rows = self._connection.execute("SELECT vtype, COUNT(*) FROM vertices GROUP BY vtype")
+        return {VTYPES[vtype]: n for vtype, n in rows}
+
+    def count_edges(self) -> dict[EdgeType, int]:
+        rows = self._connection.execute("SELECT etype, COUNT(*) FROM edges GROUP BY etype")
+        return {EdgeType(ETYPES[etype]): n for etype, n in rows}
+
+    def get_edges_from(self, vertex: Vertex | VertexHandle) -> list[tuple[VertexRef, EdgeType]]:
+        rows = self._connection.execute(
+            "SELECT v.id, v.vtype, e.etype FROM edges e JOIN vertices v ON v.handle = e.target"
+            " WHERE e.source = ? ORDER BY e.target",
+            (self._handle(vertex),),
+        )
+        return [(VertexRef(vertex_id, VTYPES[vtype]), EdgeType(ETYPES[etype])) for vertex_id, vtype, etype in rows]
+
+    def get_edges_to(self, vertex: Vertex | VertexHandle) -> list[tuple[VertexRef, EdgeType]]:
+        rows = self._connection.execute(
+            "SELECT v.id, v.vtype, e.etype FROM edges e JOIN vertices v ON v.handle = e.source"
+            " WHERE e.target = ? ORDER BY e.source",
+            (self._handle(vertex),),
+        )
+        return [(VertexRef(vertex_id, VTYPES[vtype]), EdgeType(ETYPES[etype])) for vertex_id, vtype, etype in rows]
+
+    def vertex_exists(self, vertex: Vertex | VertexHandle) -> bool:
+        """Return True if a vertex with that id already exists."""
+        try:
+            self._handle(vertex)
+            return True
+        except ValueError:
+            return False
+
+    def add_edge(self, etype: EdgeType, source: Vertex | VertexHandle, target: Vertex | VertexHandle, **kwargs) -> None:
+        """Add an edge to the permission graph.
+
+        Edges have no attributes besides their type, so kwargs are ignored.
+        """
+        v1 = self._handle(source)
+        v2 = self._handle(target)
+        try:
+            self._connection.execute(
+                "INSERT INTO edges (source, target, etype) VALUES (?, ?, ?)", (v1, v2, ETYPES.index(etype.value))
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"There is already an edge between vertices '{source}' and '{target}'") from None
+
+    def add_edges(self, edges: list[tuple[EdgeType, Vertex | VertexHandle, Vertex | VertexHandle]]) -> None:
+        handles = {}
+
+        def handle(vertex: Vertex | VertexHandle) -> int:
+            key = vertex if isinstance(vertex, int) else vertex.id
+            if key not in handles:
+                handles[key] = self._handle(vertex)
+            return handles[key]
+
+        rows = [(handle(source), handle(target), ETYPES.index(etype.value)) for etype, source, target in edges]
+        try:
+            with self._transaction() as connection:
+                connection.executemany("INSERT INTO edges (source, target, etype) VALUES (?, ?, ?)", rows)
+        except sqlite3.IntegrityError:
+            raise ValueError("An edge already exists, or appears more than once") from None
+
+    def _get_etype(self, source: Vertex | VertexHandle, target: Vertex | VertexHandle) -> int:
+        """Return the etype code of the edge from source to target.
+
+        Raises ValueError if there is no edge from source to target.
+        """
+        row = self._connection.execute(
+            "SELECT etype FROM edges WHERE source = ? AND target = ?", (self._handle(source), self._handle(target))
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"There is no edge from {source} to {target}.")
+        return row[0]
+
+    def edge_exists(self, source: Vertex, target: Vertex) -> bool:
+        """Return True if there is an edge between source and target."""
+        try:
+            self._get_etype(source, target)
+            return True
+        except ValueError:
+            return False
+
+    def remove_edge(self, source: Vertex, target: Vertex) -> None:
+        """Remove an edge from the permission graph."""
+        cursor = self._connection.execute(
+            "DELETE FROM edges WHERE source = ? AND target = ?", (self._handle(source), self._handle(target))
+        )
+        if cursor.rowcount == 0:
+            raise ValueError(f"There is no edge from {source} to {target}.")
+
+    def shortest_paths(self, source: Vertex, target: Vertex) -> list[list[VertexRef]]:
+        """Return all shortest paths from source to target."""
+        return self.shortest_paths_many(source, [target])[0]
+
+    def shortest_paths_many(self, source: Vertex, targets: list[Vertex]) -> list[list[list[VertexRef]]]:
+        """Return all shortest paths from source to each target, using a single search.
+
+        The search expands a whole level at a time, fetching the edges of the
+        frontier in batches, and stops at the level of the furthest target.
+        """
+        source_handle = self._handle(source)
+        target_handles = [self._handle(target) for target in targets]
+        # Maps the handles reached to the handles of their parents on shortest paths
+        parents: dict[int, list[int]] = {source_handle: []}
+        remaining = set(target_handles) - {source_handle}
+        frontier = [source_handle]
+        while frontier and remaining:
+            level: dict[int, list[int]] = {}
+            for chunk in _chunks(frontier):
+                rows = self._connection.execute(
+                    f"SELECT source, target FROM edges WHERE source IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                for parent, child in rows:
+                    if child not in parents:
+                        level.setdefault(child, []).append(parent)
+            parents.update(level)
+            remaining -= level.keys()
+            frontier = list(level)
+
+        results = []
+        for target_handle in target_handles:
+            paths = []
+            # Enumerate paths backwards from the target, with an explicit stack
+            stack = [[target_handle]] if target_handle in parents else []
+            while stack:
+                path = stack.pop()
+                if path[-1] == source_handle:
+                    paths.append(path[::-1])
+                else:
+                    stack.extend(path + [parent] for parent in reversed(parents[path[-1]]))
+            results.append(paths)
+        refs = self._refs(list({handle for paths in results for path in paths for handle in path}))
+        return [[[refs[handle] for handle in path] for path in paths] for paths in results]
+
+    def search_between(
+        self, source: Vertex | VertexHandle, target: Vertex | VertexHandle
+    ) -> tuple[int, set[EdgeType]] | None:
+        """Find the length and final edge types of the shortest paths from source to target.
+
+        Searches vertex handles a level at a time, fetching the edges of each
+        frontier in batches from the edges table or its target index, without
+        reading the vertices table.
+        """
+        connection = self._connection
+
+        def successors(frontier: list[int]) -> Iterator[int]:
+            for chunk in _chunks(frontier):
+                rows = connection.execute(
+                    f"SELECT target FROM edges WHERE source IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                yield from (target for (target,) in rows)
+
+        def predecessors(frontier: list[int]) -> Iterator[tuple[int, int, EdgeType]]:
+            for chunk in _chunks(frontier):
+                rows = connection.execute(
+                    f"SELECT target, source, etype FROM edges WHERE target IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                yield from ((target, source, EdgeType(ETYPES[etype])) for target, source, etype in rows)
+
+        return bidirectional_level_search(self._handle(source), self._handle(target), successors, predecessors)
+
+    def _refs(self, handles: list[int]) -> dict[int, VertexRef]:
+        """Return VertexRefs for a list of handles, keyed by handle."""
+        refs = {}
+        for chunk in _chunks(handles):
+            rows = self._connection.execute(
+                f"SELECT handle, id, vtype FROM vertices WHERE handle IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            refs.update((handle, VertexRef(vertex_id, VTYPES[vtype])) for handle, vertex_id, vtype in rows)
+        return refs
+
+    def get_edge_type(self, source: Vertex, target: Vertex) -> EdgeType:
+        """Get the type of edge from source to target."""
+        return EdgeType(ETYPES[self._get_etype(source, target)])
+
+    def vertex_factory(self, vertex_id) -> Vertex:
+        """Return a vertex from a vertex id."""
+        row = self._connection.execute(
+            "SELECT id, vtype, attributes FROM vertices WHERE id = ?", (vertex_id,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Vertex does not exist: {vertex_id}")
+        return _vertex_from_row(*row)
+
+    def copy(self) -> Self:
+        """Return an independent copy of this backend in a new in-memory database, with the same vertex handles.
+
+        The copy is in memory even if this backend is in a file, so changes
+        made to the copy are not saved.
+        """
+        backend = type(self)()
+        self._connection.backup(backend._connection)
+        return backend
+
+    def save(self, path: str | Path) -> None:
+        """Save the permission graph to a snapshot file, including all vertex attributes."""
+        handles, vertex_ids, vtypes, attributes = [], [], [], {}
+        for i, (handle, vertex_id, vtype, attrs) in enumerate(
+            self._connection.execute("SELECT handle, id, vtype, attributes FROM vertices ORDER BY handle")
+        ):
+            handles.append(handle)
+            vertex_ids.append(vertex_id)
+            vtypes.append(VTYPES[vtype])
+            for name, value in _load_attributes(attrs).items():
+                attributes.setdefault(name, {})[i] = value
+        indices = {handle: i for i, handle in enumerate(handles)}
+        adjacency = [[] for _ in handles]
+        for source, target, etype in self._connection.execute(
+            "SELECT source, target, etype FROM edges ORDER BY source, target"
+        ):
+            adjacency[indices[source]].append((indices[target], ETYPES[etype]))
+        snapshot = Snapshot.from_adjacency(
+            vertex_ids=vertex_ids, vtypes=vtypes, adjacency=adjacency, attributes=attributes
+        )
+        write_snapshot(path, snapshot)
+
+    @classmethod
+    def load(cls, path: str | Path, database: str | Path = ":memory:") -> Self:
+        """Return a new backend containing the permission graph saved in a snapshot file.
+
+        Rows are inserted straight from the memory mapped arrays, without
+        creating a Vertex per vertex. Vertices are given new handles.
+
+        Args:
+            path: The snapshot file, created by `save`
+            database: The database file to load into, which must not contain
+                a graph (default a new in-memory database)
+        """
+        backend = cls(database)
+        if backend._connection.execute("SELECT 1 FROM vertices LIMIT 1").fetchone() is not None:
+            raise ValueError(f"Database already contains a graph: {database}")
+        with read_snapshot(path) as snapshot, backend._transaction() as connection:
+            vertices = (
+                (
+                    i + 1,
+                    vertex_id,
+                    VTYPES.index(vtype),
+                    _dump_attributes({name: values[i] for name, values in snapshot.attributes.items() if i in values}),
+                )
+                for i, (vertex_id, vtype) in enumerate(zip(snapshot.vertex_ids, snapshot.vtypes))
+            )
+            connection.executemany("INSERT INTO vertices (handle, id, vtype, attributes) VALUES (?, ?, ?, ?)", vertices)
+            edges = (
+                (source + 1, target + 1, ETYPES.index(etype))
+                for (source, target), etype in zip(snapshot.edge_pairs(), snapshot.etypes)
+            )
+            connection.executemany("INSERT INTO edges (source, target, etype) VALUES (?, ?, ?)", edges)
+        return backend
+
+
+def _chunks(handles: list[int]) -> Iterator[list[int]]:
+    """Split a list of handles into chunks small enough to pass as statement parameters."""
+    for i in range(0, len(handles), MAX_PARAMETERS):
+        yield handles[i : i + MAX_PARAMETERS]
+
+
+def _dump_attributes(attributes: dict[str, Any]) -> str | None:
+    """Encode vertex attributes as JSON, or None if there are none."""
+    return json.dumps(attributes) if attributes else None
+
+
+def _load_attributes(attributes: str | None) -> dict[str, Any]:
+    """Decode vertex attributes encoded by `_dump_attributes`."""
+    return json.loads(attributes) if attributes else {}
+
+
+def _vertex_from_row(vertex_id: str, vtype: int, attributes: str | None) -> Vertex:
+    """Return a vertex from a row of the vertices table."""
+    return VERTEX_TYPES[VTYPES[vtype]].from_id(vertex_id, **_load_attributes(attributes))
@@ -0,0 +1,133 @@
+"""Bidirectional breadth first search for single authorization checks.
+
+A check is decided by the types of the last edges of the shortest paths from
+an actor to an action. The search runs forwards from the actor and backwards
+from the action, and the backward search records, for each vertex it
+reaches, the types of the last edge of the shortest paths from that vertex to
+the action. Once a level of either search reaches a vertex the other has
+seen, every shortest path passes through a vertex that both searches have
+reached, so the final edge types are the union of those recorded for the
+reached vertices that lie on a shortest path.
+
+The searches work on any hashable vertex keys, so that backends can search
+their own internal representation of the graph.
+"""
+import math
+from typing import Callable, Hashable, Iterable, TypeVar
+
+from permission_graph.structs import EdgeType
+
+K = TypeVar("K", bound=Hashable)
+
+
+def bidirectional_search(
+    source: K,
+    target: K,
+    successors: Callable[[K], Iterable[K]],
+    predecessors: Callable[[K], Iterable[tuple[K, EdgeType]]],
+    forward_cost: Callable[[list[K]], int] = len,
+    backward_cost: Callable[[list[K]], int] = len,
+) -> tuple[int, set[EdgeType]] | None:
+    """Find the length and final edge types of the shortest paths from source to target.
+
+    Each step expands a whole level of whichever search has the cheaper
+    frontier, so a check for an actor in large groups against a rarely
+    granted action mostly walks backwards.
+
+    Args:
+        source: The key of the vertex to search from
+        target: The key of the vertex to search for
+        successors: Returns the keys of the vertices a vertex targets
+        predecessors: Returns the keys of the vertices that target a vertex,
+            along with the type of each edge
+        forward_cost: Estimates the cost of expanding the forward frontier
+            (default the number of vertices in it)
+        backward_cost: Estimates the cost of expanding the backward frontier
+            (default the number of vertices in it)
+
+    Returns:
+        A (length, final edge types) tuple, or None if there is no path from
+        source to target.
+    """
+    return bidirectional_level_search(
+        source,
+        target,
+        successors=lambda frontier: (successor for vertex in frontier for successor in successors(vertex)),
+        predecessors=lambda frontier: (
+            (vertex, predecessor, etype) for vertex in frontier for predecessor, etype in predecessors(vertex)
+        ),
+        forward_cost=forward_cost,
+        backward_cost=backward_cost,
+    )
+
+
+def bidirectional_level_search(
+    source: K,
+    target: K,
+    successors: Callable[[list[K]], Iterable[K]],
+    predecessors: Callable[[list[K]], Iterable[tuple[K, K, EdgeType]]],
+    forward_cost: Callable[[list[K]], int] = len,
+    backward_cost: Callable[[list[K]], int] = len,
+) -> tuple[int, set[EdgeType]] | None:
+    """Find the length and final edge types of the shortest paths from source to target, a level at a time.
+
+    The same search as `bidirectional_search`, for backends that fetch the
+    edges of a whole frontier at once, e.g. with one query per batch of
+    vertices.
+
+    Args:
+        source: The key of the vertex to search from
+        target: The key of the vertex to search for
+        successors: Returns the keys of the vertices that the vertices of a
+            frontier target
+        predecessors: Returns a (vertex, predecessor, edge type) tuple for
+            each edge that targets a vertex of a frontier
+        forward_cost: Estimates the cost of expanding the forward frontier
+            (default the number of vertices in it)
+        backward_cost: Estimates the cost of expanding the backward frontier
+            (default the number of vertices in it)
+
+    Returns:
+        A (length, final edge types) tuple, or None if there is no path from
+        source to target.
+    """
+    forward = {source: 0}
+    # Maps keys to their distance to target, and the final edge types of the shortest paths to it
+    backward: dict[K, tuple[int, set[EdgeType]]] = {target: (0, set())}
+    forward_frontier = [source]
+    backward_frontier = [target]
+    forward_depth = backward_depth = 0
+    depth = math.inf
+    while depth == math.inf:
+        if not forward_frontier or not backward_frontier:
+            return None
+        # The first backward step is the one that finds the final edges
+        if backward_depth == 0 or backward_cost(backward_frontier) <= forward_cost(forward_frontier):
+            backward_depth += 1
+            next_frontier = []
+            for vertex, predecessor, etype in predecessors(backward_frontier):
+                types = {etype} if backward_depth == 1 else backward[vertex][1]
+                if (reached := backward.get(predecessor)) is None:
+                    backward[predecessor] = (backward_depth, set(types))
+                    next_frontier.append(predecessor)
+                    if predecessor in forward:
+                        depth = min(depth, forward[predecessor] + backward_depth)
+                elif reached[0] == backward_depth:
+                    reached[1].update(types)
+            backward_frontier = next_frontier
+        else:
+            forward_depth += 1
+            next_frontier = []
+            for successor in successors(forward_frontier):
+                if successor not in forward:
+                    forward[successor] = forward_depth
+                    next_frontier.append(successor)
+                    if successor in backward:
+                        depth = min(depth, forward_depth + backward[successor][0])
+            forward_frontier = next_frontier
+
+    final_edge_types = set()
+    for vertex, (distance, types) in backward.items():
+        if vertex in forward and forward[vertex] + distance == depth:
+            final_edge_types |= types
+    return depth, final_edge_types
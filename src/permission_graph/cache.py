@@ -0,0 +1,215 @@
+"""A cache of authorization decisions with dependency aware invalidation.
+
+A decision for `(actor, action)` depends only on the edges leaving vertices
+that are closer to the actor than the action is: a new or removed edge out of
+any other vertex cannot create, remove or tie a shortest path to the action.
+For each cached actor the cache keeps the distances from the actor to the
+vertices around it, and uses them to evict only the decisions a mutation can
+affect.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, NamedTuple
+
+
+class CacheInfo(NamedTuple):
+    """Statistics about a DecisionCache.
+
+    Attributes:
+        hits: Number of lookups answered by the cache
+        misses: Number of lookups not answered by the cache
+        evictions: Number of decisions dropped because the cache was full or
+            the decision expired
+        invalidations: Number of decisions dropped because of a change to
+            the graph
+        currsize: Number of decisions in the cache
+        maxsize: Maximum number of decisions in the cache
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    currsize: int
+    maxsize: int
+
+
+@dataclass
+class _ActorState:
+    """The cached decisions of one actor.
+
+    Attributes:
+        distances: Maps vertex ids to their distance from the actor, for every
+            vertex within `radius` of the actor.
+        radius: Distance to which `distances` is complete (`math.inf` if it
+            contains every vertex reachable from the actor).
+        depths: Maps the ids of the actions with a cached decision to their
+            distance from the actor (`math.inf` if unreachable).
+    """
+
+    distances: dict[str, float]
+    radius: float
+    depths: dict[str, float] = field(default_factory=dict)
+
+
+class DecisionCache:
+    """A bounded cache of authorization decisions.
+
+    Decisions are evicted least recently used first once the cache holds
+    `maxsize` decisions, and expire `ttl` seconds after they were cached.
+    """
+
+    def __init__(self, maxsize: int = 100_000, ttl: float | None = None, timer: Callable[[], float] = time.monotonic):
+        """Initialize a new DecisionCache.
+
+        Args:
+            maxsize: The maximum number of decisions to cache
+            ttl: Number of seconds after which a decision expires (default never)
+            timer: Function returning the current time in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._decisions: OrderedDict[tuple[str, str], tuple[bool, float]] = OrderedDict()
+        self._actors: dict[str, _ActorState] = {}
+        # Maps vertex ids to the ids of actors with that vertex in their distances
+        self._dependents: dict[str, set[str]] = {}
+        # Maps action ids to the ids of actors with a cached decision for that action
+        self._actors_by_action: dict[str, set[str]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, actor_id: str, action_id: str) -> bool | None:
+        """Return the cached decision for actor and action, or None if there isn't one."""
+        key = (actor_id, action_id)
+        try:
+            decision, expires_at = self._decisions[key]
+        except KeyError:
+            self._misses += 1
+            return None
+        if expires_at <= self._timer():
+            self._remove(key)
+            self._evictions += 1
+            self._misses += 1
+            return None
+        self._decisions.move_to_end(key)
+        self._hits += 1
+        return decision
+
+    def put(
+        self,
+        actor_id: str,
+        decisions: dict[str, bool],
+        depths: dict[str, float],
+        distances: dict[str, float],
+        radius: float,
+    ) -> None:
+        """Cache decisions for an actor.
+
+        Args:
+            actor_id: The id of the actor
+            decisions: Maps action ids to the actor's decision for that action
+            depths: Maps each action id in decisions to its distance from
+                the actor (`math.inf` if unreachable)
+            distances: Maps vertex ids to their distance from the actor, for
+                every vertex within radius of the actor, including the actor.
+            radius: Distance to which distances is complete (`math.inf` if it
+                contains every vertex reachable from the actor). Must be at
+                least the depth of every action in decisions.
+        """
+        state = self._actors.get(actor_id)
+        if state is None:
+            state = self._actors[actor_id] = _ActorState(distances={}, radius=-1)
+        if radius > state.radius:
+            self._set_distances(actor_id, state, distances, radius)
+        expires_at = math.inf if self.ttl is None else self._timer() + self.ttl
+        for action_id, decision in decisions.items():
+            key = (actor_id, action_id)
+            self._decisions[key] = (decision, expires_at)
+            self._decisions.move_to_end(key)
+            state.depths[action_id] = depths[action_id]
+            self._actors_by_action.setdefault(action_id, set()).add(actor_id)
+        while len(self._decisions) > self.maxsize:
+            self._remove(next(iter(self._decisions)))
+            self._evictions += 1
+
+    def invalidate_edge(self, source_id: str) -> None:
+        """Evict the decisions that a new or removed edge out of a vertex may change."""
+        for actor_id in list(self._dependents.get(source_id, ())):
+            state = self._actors[actor_id]
+            self._truncate(actor_id, state, state.distances[source_id])
+
+    def invalidate_vertex(self, vertex_id: str) -> None:
+        """Evict the decisions that removing a vertex may change.
+
+        Decisions for actions that the actor can't reach stay cached, as
+        they remain False whatever happens to the vertex, unless the vertex is
+        the action itself.
+        """
+        if vertex_id in self._actors:
+            self._truncate(vertex_id, self._actors[vertex_id], -1)
+        for actor_id in list(self._actors_by_action.get(vertex_id, ())):
+            self._remove((actor_id, vertex_id))
+            self._invalidations += 1
+        for actor_id in list(self._dependents.get(vertex_id, ())):
+            # Edges into the vertex start at least one step closer to the actor
+            state = self._actors[actor_id]
+            self._truncate(actor_id, state, state.distances[vertex_id] - 1)
+
+    def clear(self) -> None:
+        """Evict every decision."""
+        self._decisions.clear()
+        self._actors.clear()
+        self._dependents.clear()
+        self._actors_by_action.clear()
+
+    def cache_info(self) -> CacheInfo:
+        """Return statistics about the cache."""
+        return CacheInfo(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            invalidations=self._invalidations,
+            currsize=len(self._decisions),
+            maxsize=self.maxsize,
+        )
+
+    def _truncate(self, actor_id: str, state: _ActorState, radius: float) -> None:
+        """Drop an actor's decisions and distances beyond radius."""
+        for action_id, depth in list(state.depths.items()):
+            if depth > radius:
+                self._remove((actor_id, action_id))
+                self._invalidations += 1
+        if actor_id in self._actors:
+            distances = {vertex_id: d for vertex_id, d in state.distances.items() if d <= radius}
+            self._set_distances(actor_id, state, distances, radius)
+
+    def _set_distances(self, actor_id: str, state: _ActorState, distances: dict[str, float], radius: float) -> None:
+        """Replace an actor's distances, keeping the dependents index up to date."""
+        for vertex_id in state.distances.keys() - distances.keys():
+            dependents = self._dependents[vertex_id]
+            dependents.discard(actor_id)
+            if not dependents:
+                del self._dependents[vertex_id]
+        for vertex_id in distances.keys() - state.distances.keys():
+            self._dependents.setdefault(vertex_id, set()).add(actor_id)
+        state.distances = distances
+        state.radius = radius
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        """Remove a decision, and its actor's state if it has no decisions left."""
+        actor_id, action_id = key
+        del self._decisions[key]
+        state = self._actors[actor_id]
+        del state.depths[action_id]
+        actor_ids = self._actors_by_action[action_id]
+        actor_ids.discard(actor_id)
+        if not actor_ids:
+            del self._actors_by_action[action_id]
+        if not state.depths:
+            self._set_distances(actor_id, state, {}, -1)
+            del self._actors[actor_id]
@@ -0,0 +1,200 @@
+"""An ordered log of the changes made to a permission graph, for replication.
+
+A `PermissionGraph` created with a `ChangeLog` records every change made
+through it as a `ChangeEntry`: the name of the method called, and its
+arguments. Entries are numbered with consecutive versions, starting at 1, and
+passed to the log's sink as they are recorded. A replica replays entries with
+`PermissionGraph.apply_changes` to stay in step with the primary, without
+reloading the whole graph.
+
+Entries serialize to one line of JSON each. `FileSink` appends them to a file,
+and `read_changes` reads them back, starting after a given version.
+"""
+import json
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Iterator, NamedTuple, Self
+
+from permission_graph.structs import VERTEX_TYPES, Vertex, VertexRef
+
+# PermissionGraph methods recorded in a change log
+RECORDED = frozenset(
+    [
+        "add_actor",
+        "remove_actor",
+        "add_group",
+        "remove_group",
+        "add_resource_type",
+        "remove_resource_type",
+        "add_resource",
+        "remove_resource",
+        "allow",
+        "deny",
+        "revoke",
+        "add_actor_to_group",
+        "remove_actor_from_group",
+        "update_resource_type_actions",
+        "bulk_load",
+    ]
+)
+
+
+class ChangeEntry(NamedTuple):
+    """A change made to a permission graph.
+
+    Attributes:
+        version: The number of changes recorded up to and including this one
+        method: The name of the `PermissionGraph` method called
+        args: The positional arguments it was called with
+    """
+
+    version: int
+    method: str
+    args: tuple
+
+    def to_json(self) -> str:
+        """Return the entry as one line of JSON."""
+        return json.dumps({"version": self.version, "method": self.method, "args": _encode(self.args)})
+
+    @classmethod
+    def from_json(cls, line: str) -> Self:
+        """Return an entry from a line written by `to_json`."""
+        data = json.loads(line)
+        return cls(version=data["version"], method=data["method"], args=tuple(_decode(data["args"])))
+
+
+class ChangeLog:
+    """Record the changes made to a permission graph.
+
+    The most recent `maxlen` entries are kept in memory, and every entry is
+    passed to `sink` as it is recorded. Recording is thread safe: the sink
+    receives entries in version order.
+    """
+
+    def __init__(
+        self, sink: Callable[[ChangeEntry], None] | None = None, maxlen: int | None = 10_000, version: int = 0
+    ) -> None:
+        """Initialize a new ChangeLog.
+
+        Args:
+            sink: If given, called with each entry as it is recorded, e.g. a
+                `FileSink`
+            maxlen: The number of entries to keep in memory (default 10,000,
+                None for all of them)
+            version: The version of the last change already made to the
+                graph, e.g. when continuing an existing log
+        """
+        self.sink = sink
+        self._entries: deque[ChangeEntry] = deque(maxlen=maxlen)
+        self._version = version
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """The version of the last entry recorded."""
+        return self._version
+
+    def record(self, method: str, args: tuple) -> ChangeEntry:
+        """Record a change as the next version.
+
+        Raises ValueError if method is not one of the recorded methods.
+        """
+        if method not in RECORDED:
+            raise ValueError(f"Can't record {method}")
+        with self._lock:
+            return self._append(ChangeEntry(version=self._version + 1, method=method, args=tuple(args)))
+
+    def append(self, entry: ChangeEntry) -> None:
+        """Record an entry from another log, keeping its version.
+
+        Raises ValueError unless the entry is the next version of this log.
+        """
+        with self._lock:
+            if entry.version != self._version + 1:
+                raise ValueError(f"Expected version {self._version + 1}, got {entry.version}")
+            self._append(entry)
+
+    def entries(self, after: int = 0) -> list[ChangeEntry]:
+        """Return the entries kept in memory with versions after `after`.
+
+        Raises ValueError if entries after `after` are no longer in memory.
+        """
+        with self._lock:
+            first = self._version - len(self._entries) + 1
+            if after + 1 < first:
+                raise ValueError(f"Entries before version {first} are no longer in memory")
+            return list(self._entries)[after + 1 - first :]
+
+    def _append(self, entry: ChangeEntry) -> ChangeEntry:
+        """Keep an entry and pass it to the sink. The lock must be held."""
+        self._entries.append(entry)
+        self._version = entry.version
+        if self.sink is not None:
+            self.sink(entry)
+        return entry
+
+
+class FileSink:
+    """A ChangeLog sink that appends each entry to a file, one line of JSON each.
+
+    Each entry is flushed as it is written, so a replica reading the file with
+    `read_changes` sees it at once. Use as a context manager, or call `close`,
+    to close the file.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize a new FileSink, opening path for appending."""
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, entry: ChangeEntry) -> None:
+        self._file.write(entry.to_json() + "\n")
+        self._file.flush()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the file."""
+        self._file.close()
+
+
+def read_changes(path: str | Path, after: int = 0) -> Iterator[ChangeEntry]:
+    """Yield the entries written to a file by a `FileSink`, with versions after `after`.
+
+    A line not yet completely written is not yielded, so the file can be
+    read while it is being written. Read it again from the last version
+    yielded to pick up new entries.
+    """
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                return
+            entry = ChangeEntry.from_json(line)
+            if entry.version > after:
+                yield entry
+
+
+def _encode(value: Any) -> Any:
+    """Return value with vertices replaced by JSON objects."""
+    if isinstance(value, Vertex):
+        return {"vertex": value.model_dump()}
+    if isinstance(value, VertexRef):
+        return {"ref": value.id}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    """Return value with the JSON objects written by `_encode` replaced by vertices."""
+    if isinstance(value, dict):
+        if "vertex" in value:
+            return VERTEX_TYPES[value["vertex"]["vtype"]](**value["vertex"])
+        return VertexRef(id=value["ref"], vtype=value["ref"].split(":", 1)[0])
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
@@ -0,0 +1,244 @@
+"""An index of the groups that each group is transitively a member of.
+
+Groups can be members of other groups, so an actor in a group is also in
+every group above it. A `GroupClosure` keeps, for every group, the distance
+to each group above and below it, and updates them as memberships between
+groups are added and removed. Group memberships must not form a cycle.
+
+Every path from an actor to an action is a chain of MEMBER_OF edges up
+through groups, followed by ALLOW and DENY edges between actions. With the
+distances from an actor to its groups known, a check only has to search
+backwards from the action through other actions until it reaches the actor
+or one of its groups, and never walks the hierarchy. The decisions are the
+same as those made from the shortest paths in the whole graph.
+"""
+import math
+from typing import Iterator, Self
+
+from permission_graph.backends.base import PermissionGraphBackend
+from permission_graph.search import ReachedVertex
+from permission_graph.structs import EdgeType, Vertex, VertexRef
+
+
+class GroupClosure:
+    """The transitive closure of the memberships of groups in other groups.
+
+    Attributes:
+        parents: Maps group ids to the ids of the groups they are directly members of
+        children: Maps group ids to the ids of the groups directly members of them
+        ancestors: Maps group ids to the groups they are transitively members
+            of, with the number of MEMBER_OF edges on the shortest path to each
+        descendants: Maps group ids to the groups transitively members of
+            them, with the number of MEMBER_OF edges on the shortest path from each
+    """
+
+    def __init__(self) -> None:
+        self.parents: dict[str, set[str]] = {}
+        self.children: dict[str, set[str]] = {}
+        self.ancestors: dict[str, dict[str, int]] = {}
+        self.descendants: dict[str, dict[str, int]] = {}
+
+    @classmethod
+    def from_backend(cls, backend: PermissionGraphBackend) -> Self:
+        """Build the closure of the group memberships in a backend.
+
+        Raises ValueError if the memberships form a cycle.
+        """
+        closure = cls()
+        for group in backend.get_vertices("group"):
+            for target, etype in backend.get_edges_from(group):
+                if etype == EdgeType.MEMBER_OF and target.vtype == "group":
+                    closure.add_edge(group.id, target.id)
+        return closure
+
+    def copy(self) -> Self:
+        """Return an independent copy of the closure."""
+        closure = type(self)()
+        closure.parents = {group: set(parents) for group, parents in self.parents.items()}
+        closure.children = {group: set(children) for group, children in self.children.items()}
+        closure.ancestors = {group: dict(ancestors) for group, ancestors in self.ancestors.items()}
+        closure.descendants = {group: dict(descendants) for group, descendants in self.descendants.items()}
+        return closure
+
+    def add_edge(self, child: str, parent: str) -> None:
+        """Record that the group child is a member of the group parent.
+
+        Every group at or below child gets every group at or above parent as
+        an ancestor, at the distance through the new edge if it is shorter.
+
+        Raises ValueError if parent is child or is below it.
+        """
+        if child == parent or child in self.ancestors.get(parent, {}):
+            raise ValueError(f"Group {child} can't be a member of {parent}, which is a member of it")
+        self.parents.setdefault(child, set()).add(parent)
+        self.children.setdefault(parent, set()).add(child)
+        above = [(parent, 0), *self.ancestors.get(parent, {}).items()]
+        for group, below in [(child, 0), *self.descendants.get(child, {}).items()]:
+            ancestors = self.ancestors.setdefault(group, {})
+            for ancestor, distance in above:
+                distance += below + 1
+                if distance < ancestors.get(ancestor, math.inf):
+                    ancestors[ancestor] = distance
+                    self.descendants.setdefault(ancestor, {})[group] = distance
+
+    def remove_edge(self, child: str, parent: str) -> None:
+        """Record that the group child is no longer a member of the group parent.
+
+        The ancestors of child and of every group below it are rebuilt from
+        the ancestors of their parents.
+        """
+        self.parents.get(child, set()).discard(parent)
+        self.children.get(parent, set()).discard(child)
+        self._rebuild([child, *self.descendants.get(child, {})])
+
+    def remove_group(self, group: str) -> None:
+        """Remove a group and its memberships from the closure."""
+        below = list(self.descendants.get(group, {}))
+        for child in self.children.pop(group, set()):
+            self.parents[child].discard(group)
+        for parent in self.parents.pop(group, set()):
+            self.children[parent].discard(group)
+        for ancestor in self.ancestors.pop(group, {}):
+            self.descendants[ancestor].pop(group, None)
+        self.descendants.pop(group, None)
+        self._rebuild(below)
+
+    def _rebuild(self, groups: list[str]) -> None:
+        """Rebuild the ancestors of groups, given correct ancestors for every parent not among them."""
+        pending = set(groups)
+        # Parents are rebuilt before their children
+        order = []
+        for group in groups:
+            stack = [(group, False)]
+            while stack:
+                group, expanded = stack.pop()
+                if expanded:
+                    order.append(group)
+                elif group in pending:
+                    pending.discard(group)
+                    stack.append((group, True))
+                    stack.extend((parent, False) for parent in self.parents.get(group, ()))
+        for group in order:
+            for ancestor in self.ancestors.pop(group, {}):
+                self.descendants.get(ancestor, {}).pop(group, None)
+            ancestors = {}
+            for parent in self.parents.get(group, ()):
+                for ancestor, distance in [(parent, 0), *self.ancestors.get(parent, {}).items()]:
+                    if distance + 1 < ancestors.get(ancestor, math.inf):
+                        ancestors[ancestor] = distance + 1
+            self.ancestors[group] = ancestors
+            for ancestor, distance in ancestors.items():
+                self.descendants.setdefault(ancestor, {})[group] = distance
+
+    def distances_from(self, backend: PermissionGraphBackend, source: Vertex | VertexRef) -> dict[str, int]:
+        """Return the distance from source to itself and to every group it is transitively a member of.
+
+        Only the edges out of source are read from the backend.
+        """
+        distances = {source.id: 0}
+        for target, etype in backend.get_edges_from(source):
+            if etype != EdgeType.MEMBER_OF or target.vtype != "group":
+                continue
+            for group, distance in [(target.id, 0), *self.ancestors.get(target.id, {}).items()]:
+                if distance + 1 < distances.get(group, math.inf):
+                    distances[group] = distance + 1
+        return distances
+
+    def search_between(
+        self, backend: PermissionGraphBackend, distances: dict[str, int], target: Vertex | VertexRef
+    ) -> tuple[int, set[EdgeType]] | None:
+        """Find the length and final edge types of the shortest paths from a source to target.
+
+        Searches backwards from target through actions only, a level at a
+        time, until no closer path to the source can be found.
+
+        Args:
+            backend: The backend to search
+            distances: The distances from the source to itself and its
+                groups, as returned by `distances_from`
+            target: The action to search for
+
+        Returns:
+            A (length, final edge types) tuple, or None if there is no path
+            from the source to target.
+        """
+        best = math.inf
+        final_edge_types = set()
+        seen = {target.id}
+        frontier = [(target, set())]
+        depth = 0
+        while frontier and depth < best:
+            depth += 1
+            level: dict[str, tuple[Vertex | VertexRef, set[EdgeType]]] = {}
+            for vertex, types in frontier:
+                for source, etype in backend.get_edges_to(vertex):
+                    if (reached := level.get(source.id)) is not None:
+                        reached[1].update({etype} if depth == 1 else types)
+                    elif source.id not in seen:
+                        seen.add(source.id)
+                        level[source.id] = (source, {etype} if depth == 1 else set(types))
+            frontier = []
+            for vertex_id, (vertex, types) in level.items():
+                if (distance := distances.get(vertex_id)) is not None:
+                    if distance + depth < best:
+                        best, final_edge_types = distance + depth, set(types)
+                    elif distance + depth == best:
+                        final_edge_types |= types
+                if vertex.vtype == "action":
+                    frontier.append((vertex, types))
+        return None if best == math.inf else (best, final_edge_types)
+
+    def search_to(self, backend: PermissionGraphBackend, target: Vertex | VertexRef) -> Iterator[ReachedVertex]:
+        """Search backwards from target to every vertex that can reach it.
+
+        Yields the same vertices, depths and final edge types as
+        `permission_graph.search.search_to`, a level at a time. The distance
+        of each group is found from the groups granted the action and their
+        descendants, so only the direct members of groups are read from the
+        backend.
+        """
+        # Every action, actor and group with a path to target through actions
+        granted: dict[str, ReachedVertex] = {}
+        frontier = [ReachedVertex(vertex=target, depth=0, final_edge_types=set())]
+        while frontier:
+            level: dict[str, ReachedVertex] = {}
+            for reached in frontier:
+                depth = reached.depth + 1
+                for source, etype in backend.get_edges_to(reached.vertex):
+                    types = {etype} if depth == 1 else reached.final_edge_types
+                    if (r := level.get(source.id)) is not None:
+                        r.final_edge_types |= types
+                    elif source.id not in granted and source.id != target.id:
+                        level[source.id] = ReachedVertex(vertex=source, depth=depth, final_edge_types=set(types))
+            granted.update(level)
+            frontier = [reached for reached in level.values() if reached.vertex.vtype == "action"]
+
+        levels: dict[int, dict[str, ReachedVertex]] = {}
+
+        def reach(vertex: Vertex | VertexRef, depth: int, types: set[EdgeType]) -> None:
+            level = levels.setdefault(depth, {})
+            if (r := level.get(vertex.id)) is not None:
+                r.final_edge_types |= types
+            else:
+                level[vertex.id] = ReachedVertex(vertex=vertex, depth=depth, final_edge_types=set(types))
+
+        for reached in granted.values():
+            if reached.vertex.vtype != "group":
+                reach(reached.vertex, reached.depth, reached.final_edge_types)
+                continue
+            for group, distance in [(reached.vertex.id, 0), *self.descendants.get(reached.vertex.id, {}).items()]:
+                vertex = reached.vertex if distance == 0 else VertexRef(id=group, vtype="group")
+                reach(vertex, reached.depth + distance, reached.final_edge_types)
+
+        yielded = set()
+        while levels:
+            depth = min(levels)
+            level = [reached for reached in levels.pop(depth).values() if reached.vertex.id not in yielded]
+            yielded.update(reached.vertex.id for reached in level)
+            for reached in level:
+                if reached.vertex.vtype != "group":
+                    continue
+                for source, etype in backend.get_edges_to(reached.vertex):
+                    if source.vtype == "actor" and source.id not in yielded:
+                        reach(source, depth + 1, reached.final_edge_types)
+            yield from level
@@ -0,0 +1,51 @@
+"""A read-only permission graph with precomputed authorization decisions."""
+from typing import Iterable
+
+from permission_graph.structs import Action, Actor
+
+
+class CompiledPermissionGraph:
+    """A snapshot of the authorization decisions of a `PermissionGraph`.
+
+    Each actor's decisions are stored as a bitset (a bytearray) over the
+    actions of the graph, so authorizing a check is a pair of dict lookups
+    and a test of one byte, however many actions there are. The snapshot does not change when the source graph does;
+    call `PermissionGraph.compile` again to pick up changes.
+
+    Create instances with `PermissionGraph.compile`.
+    """
+
+    def __init__(self, action_index: dict[str, int], allowed: dict[str, bytearray]) -> None:
+        """Initialize a new CompiledPermissionGraph.
+
+        Args:
+            action_index: Maps the id of every action to its bit in the bitsets
+            allowed: Maps actor ids to a bitset of the actions they are
+                authorized to perform, with the bit of action i at bit i % 8
+                of byte i // 8
+        """
+        self._action_index = action_index
+        self._allowed = allowed
+
+    def action_is_authorized(self, actor: Actor, action: Action) -> bool:
+        """Authorize actor to perform action on resource.
+
+        Raises ValueError if the actor or the action was not compiled.
+        """
+        try:
+            allowed = self._allowed[actor.id]
+        except KeyError:
+            raise ValueError(f"Actor was not compiled: {actor}") from None
+        try:
+            bit = self._action_index[action.id]
+        except KeyError:
+            raise ValueError(f"Action was not compiled: {action}") from None
+        return bool(allowed[bit >> 3] >> (bit & 7) & 1)
+
+    def authorize_many(self, checks: Iterable[tuple[Actor, Action]]) -> list[bool]:
+        """Authorize many (actor, action) pairs at once.
+
+        Returns:
+            A list of decisions, in the same order as `checks`.
+        """
+        return [self.action_is_authorized(actor, action) for actor, action in checks]
@@ -0,0 +1,184 @@
+"""Thread safe access to a permission graph with copy-on-write versions."""
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from permission_graph.changelog import ChangeLog
+from permission_graph.permission_graph import PermissionGraph
+from permission_graph.structs import (
+    Action,
+    Actor,
+    Group,
+    Resource,
+    ResourceType,
+    Vertex,
+    VertexHandle,
+)
+
+
+class ConcurrentPermissionGraph:
+    """A permission graph that many threads can read while another writes.
+
+    Readers use the current version of the graph without taking any lock, so
+    authorization checks never wait for writes. A writer copies the current
+    version, applies its changes to the copy, and then replaces the current
+    version with it. Each read sees a single version, and a version is never
+    changed once it is current.
+
+    Every write copies the whole graph, so apply related changes together in
+    one `write` block rather than through the single change methods.
+
+    Decision caches are not supported, as they are not thread safe. Nor are
+    persistent backends, such as a `SQLiteBackend` in a file, as the copies
+    that writes change are not persistent.
+    """
+
+    def __init__(self, graph: PermissionGraph | None = None) -> None:
+        """Initialize a new ConcurrentPermissionGraph.
+
+        Args:
+            graph: The initial version of the graph (default an empty
+                `PermissionGraph`). It must not be changed after this.
+
+        Raises ValueError if the graph has a decision cache or a persistent backend.
+        """
+        if graph is None:
+            graph = PermissionGraph()
+        if graph.cache is not None:
+            raise ValueError("ConcurrentPermissionGraph does not support a DecisionCache")
+        if graph.backend.persistent:
+            raise ValueError("ConcurrentPermissionGraph does not support persistent backends, as writes change copies")
+        self._graph = graph
+        self._version = 0
+        self._write_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """The number of writes made to the graph."""
+        return self._version
+
+    def snapshot(self) -> PermissionGraph:
+        """Return the current version of the graph.
+
+        Use this to make several reads against the same version. The returned
+        graph must not be changed.
+        """
+        return self._graph
+
+    @contextmanager
+    def write(self) -> Iterator[PermissionGraph]:
+        """Change the graph.
+
+        Yields a copy of the current version to change. When the block exits
+        the copy becomes the current version, unless the block raised, in
+        which case the changes are discarded. Writers wait for each other, but
+        never for readers.
+
+        If the graph has a change log, the changes are added to it when the
+        block exits, so changes that are discarded are never recorded.
+        """
+        with self._write_lock:
+            graph = self._graph.copy()
+            changelog = graph.changelog
+            if changelog is not None:
+                graph.changelog = ChangeLog(maxlen=None, version=changelog.version)
+            yield graph
+            if changelog is not None:
+                for entry in graph.changelog.entries(after=changelog.version):
+                    changelog.append(entry)
+                graph.changelog = changelog
+            self._graph = graph
+            self._version += 1
+
+    def add_actor(self, actor: Actor) -> None:
+        """Add a actor to the permission graph."""
+        with self.write() as graph:
+            graph.add_actor(actor)
+
+    def remove_actor(self, actor: Actor) -> None:
+        """Remove a actor from the permission graph."""
+        with self.write() as graph:
+            graph.remove_actor(actor)
+
+    def add_group(self, group: Group) -> None:
+        """Add a group to the permission graph."""
+        with self.write() as graph:
+            graph.add_group(group)
+
+    def remove_group(self, group: Group) -> None:
+        """Remove a group from the permission graph."""
+        with self.write() as graph:
+            graph.remove_group(group)
+
+    def add_resource_type(self, resource_type: ResourceType) -> None:
+        """Register a resource type to the permission graph."""
+        with self.write() as graph:
+            graph.add_resource_type(resource_type)
+
+    def remove_resource_type(self, resource_type: ResourceType) -> None:
+        """Remove a resource type from the permission graph."""
+        with self.write() as graph:
+            graph.remove_resource_type(resource_type)
+
+    def add_resource(self, resource: Resource) -> None:
+        """Add a resource to the permission graph."""
+        with self.write() as graph:
+            graph.add_resource(resource)
+
+    def remove_resource(self, resource: Resource) -> None:
+        """Remove a resource from the permission graph."""
+        with self.write() as graph:
+            graph.remove_resource(resource)
+
+    def allow(self, actor: Actor | Group | Action, action: Action) -> None:
+        """Grant actor or group permission to take action on resource or group."""
+        with self.write() as graph:
+            graph.allow(actor, action)
+
+    def deny(self, actor: Actor | Group | Action, action: Action) -> None:
+        """Deny actor or group permission to take action on resource or group."""
+        with self.write() as graph:
+            graph.deny(actor, action)
+
+    def revoke(self, actor: Actor | Group | Action, action: Action) -> None:
+        """Revoke a permission (either allow or deny)."""
+        with self.write() as graph:
+            graph.revoke(actor, action)
+
+    def add_actor_to_group(self, actor: Actor | Group, group: Group) -> None:
+        """Add a actor, or another group, to a group."""
+        with self.write() as graph:
+            graph.add_actor_to_group(actor, group)
+
+    def remove_actor_from_group(self, actor: Actor | Group, group: Group) -> None:
+        """Remove a actor, or another group, from a group."""
+        with self.write() as graph:
+            graph.remove_actor_from_group(actor, group)
+
+    def action_is_authorized(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool:
+        """Authorize actor to perform action on resource, using the current version."""
+        return self._graph.action_is_authorized(actor, action)
+
+    def authorize_many(self, checks: Iterable[tuple[Actor | VertexHandle, Action | VertexHandle]]) -> list[bool]:
+        """Authorize many (actor, action) pairs at once, all against the same version."""
+        return self._graph.authorize_many(checks)
+
+    def actors_authorized_for(self, action: Action) -> Iterator[Actor]:
+        """Yield every actor authorized to perform an action in the current version."""
+        return self._graph.actors_authorized_for(action)
+
+    def authorized_actions(
+        self,
+        actor: Actor,
+        resource_type: ResourceType | None = None,
+        resource: Resource | None = None,
+        page_size: int = 1000,
+    ) -> Iterator[list[Action]]:
+        """Yield pages of the actions an actor is authorized to perform in the current version."""
+        return self._graph.authorized_actions(
+            actor, resource_type=resource_type, resource=resource, page_size=page_size
+        )
+
+    def vertex_exists(self, vertex: Vertex) -> bool:
+        """Return True if the vertex exists in the current version."""
+        return self._graph.backend.vertex_exists(vertex)
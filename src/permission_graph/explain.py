@@ -0,0 +1,93 @@
+"""Explanations of authorization decisions, and sampling them from live checks.
+
+`PermissionGraph.explain` returns a `Decision`: the shortest paths from the
+actor to the action, up to a limit, the effect of the last edge of each, and
+whether the tie breaker policy had to choose between them. A
+`DecisionSampler` passed to `PermissionGraph` explains a random fraction of
+the checks made with `action_is_authorized` and `authorize_many`, and keeps
+the most recent explanations in a bounded buffer. Checks that aren't
+sampled, and every check made without a sampler, are decided as usual.
+"""
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+from permission_graph.structs import Effect, TieBreakerPolicy, Vertex
+
+
+@dataclass(frozen=True)
+class Decision:
+    """An authorization decision, and why it was made.
+
+    Attributes:
+        actor: The actor checked
+        action: The action checked
+        allowed: Whether the actor is authorized to perform the action
+        paths: The shortest paths from actor to action, each a list of
+            vertices starting with the actor. Empty if there is no path.
+        effects: The effect of the last edge of each path in `paths`
+        tie_breaker_policy: The tie breaker policy of the graph
+        tie_breaker_applied: True if the shortest paths have different
+            effects, so the decision was made by `tie_breaker_policy`
+        depth: The number of edges in each shortest path, or None if there
+            is no path
+        truncated: True if there are more shortest paths than were kept in
+            `paths`. The decision is still made from all of them.
+    """
+
+    actor: Vertex
+    action: Vertex
+    allowed: bool
+    paths: list[list[Vertex]]
+    effects: list[Effect]
+    tie_breaker_policy: TieBreakerPolicy
+    tie_breaker_applied: bool
+    depth: int | None
+    truncated: bool = False
+
+
+class DecisionSampler:
+    """Explain a random fraction of authorization checks, keeping the most recent explanations.
+
+    A sampled check is decided by `PermissionGraph.explain` instead of the
+    usual search, so it costs the same as an explanation, not a check plus
+    an explanation.
+    """
+
+    def __init__(self, rate: float, maxlen: int = 1000, rng: Callable[[], float] = random.random) -> None:
+        """Initialize a new DecisionSampler.
+
+        Args:
+            rate: The fraction of checks to explain, from 0 to 1
+            maxlen: The number of decisions to keep. Older decisions are dropped.
+            rng: Function returning a random float in [0, 1)
+
+        Raises ValueError if rate is not between 0 and 1.
+        """
+        if not 0 <= rate <= 1:
+            raise ValueError(f"rate must be between 0 and 1, got {rate}")
+        self.rate = rate
+        self._rng = rng
+        self._decisions: deque[Decision] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        """Return True if the next check should be explained."""
+        return self._rng() < self.rate
+
+    def record(self, decision: Decision) -> None:
+        """Keep a decision, dropping the oldest one if the buffer is full."""
+        with self._lock:
+            self._decisions.append(decision)
+
+    def decisions(self) -> list[Decision]:
+        """Return the decisions kept, oldest first."""
+        with self._lock:
+            return list(self._decisions)
+
+    def clear(self) -> None:
+        """Drop every decision kept."""
+        with self._lock:
+            self._decisions.clear()
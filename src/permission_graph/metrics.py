@@ -0,0 +1,323 @@
+"""Metrics about the operations of a permission graph, exported in the Prometheus text format.
+
+A `PermissionGraph` created with a `MetricsRegistry` wraps its backend in an
+`InstrumentedBackend`, which times every call to a `PermissionGraphBackend`
+method, and records the length and number of the shortest paths that its
+searches find. `action_is_authorized` records the time and result of each
+check. Graphs created without a registry are not instrumented at all.
+
+The registry's `observe_*` methods are called for every measurement:
+override them in a subclass to send measurements elsewhere.
+`MetricsRegistry.to_prometheus` renders every metric, along with the number
+of vertices and edges in the graph and, for backends with tombstones, the
+fraction of them that are dead, in the Prometheus text exposition format.
+"""
+import bisect
+import functools
+import inspect
+import os
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Callable
+
+from permission_graph.backends.base import PermissionGraphBackend
+from permission_graph.structs import VERTEX_TYPES, EdgeType
+
+# Bucket upper bounds, in seconds, of the latency histograms
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1.0)
+# Bucket upper bounds of the path length histogram, in edges
+PATH_LENGTH_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+# Bucket upper bounds of the histogram of the number of tied shortest paths
+PATH_COUNT_BUCKETS = (1, 2, 3, 4, 8, 16, 32, 64)
+
+# The PermissionGraphBackend methods that an InstrumentedBackend times
+BACKEND_METHODS = frozenset(
+    name
+    for name, value in vars(PermissionGraphBackend).items()
+    if inspect.isfunction(value) and not name.startswith("_")
+)
+
+
+class Histogram:
+    """Counts of observed values in buckets, with their sum, like a Prometheus histogram.
+
+    Attributes:
+        buckets: The upper bounds of the buckets, in increasing order
+        counts: The number of values observed in each bucket, with one more
+            for values above the last bound. Unlike Prometheus buckets, the
+            counts are not cumulative.
+        sum: The sum of the values observed
+        count: The number of values observed
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Record metrics about the operations of a permission graph.
+
+    Attributes:
+        backend_seconds: Maps the names of backend methods to histograms of
+            the time taken by each call to them
+        check_seconds: Histogram of the time taken by `action_is_authorized`
+        checks: Maps True and False to the number of checks allowed and denied
+        path_length: Histogram of the length of the shortest paths found by
+            `search_between`, `shortest_paths` and `shortest_paths_many`
+        path_count: Histogram of the number of shortest paths found by
+            `shortest_paths` and `shortest_paths_many`, where there is one
+        tie_breaks: The number of `search_between` calls whose shortest paths
+            end in both ALLOW and DENY edges, so that the decision is made by
+            the tie breaker policy
+    """
+
+    def __init__(self, latency_buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize a new MetricsRegistry.
+
+        Args:
+            latency_buckets: The upper bounds, in seconds, of the buckets of
+                the latency histograms
+        """
+        self.latency_buckets = latency_buckets
+        self.backend_seconds: dict[str, Histogram] = {}
+        self.check_seconds = Histogram(latency_buckets)
+        self.checks = {True: 0, False: 0}
+        self.path_length = Histogram(PATH_LENGTH_BUCKETS)
+        self.path_count = Histogram(PATH_COUNT_BUCKETS)
+        self.tie_breaks = 0
+        self._backend: Callable[[], PermissionGraphBackend | None] = lambda: None
+        self._lock = threading.Lock()
+
+    def watch(self, backend: PermissionGraphBackend) -> None:
+        """Report the vertex and edge counts of a backend, instead of any watched before.
+
+        Only a weak reference to the backend is kept.
+        """
+        self._backend = weakref.ref(backend)
+
+    def observe_call(self, method: str, seconds: float) -> None:
+        """Record the time taken by a call to a backend method."""
+        with self._lock:
+            if (histogram := self.backend_seconds.get(method)) is None:
+                histogram = self.backend_seconds[method] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+
+    def observe_check(self, seconds: float, allowed: bool) -> None:
+        """Record the time taken and result of a call to `action_is_authorized`."""
+        with self._lock:
+            self.check_seconds.observe(seconds)
+            self.checks[allowed] += 1
+
+    def observe_paths(self, length: int, count: int | None = None, tie_break: bool = False) -> None:
+        """Record the shortest paths found between two vertices.
+
+        Args:
+            length: The number of edges in each shortest path
+            count: The number of shortest paths, if known
+            tie_break: True if the paths end in both ALLOW and DENY edges
+        """
+        with self._lock:
+            self.path_length.observe(length)
+            if count is not None:
+                self.path_count.observe(count)
+            self.tie_breaks += tie_break
+
+    def to_prometheus(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines += _histogram(
+                "permission_graph_backend_call_seconds",
+                "Time taken by calls to PermissionGraphBackend methods.",
+                {(("method", method),): histogram for method, histogram in sorted(self.backend_seconds.items())},
+            )
+            lines += _histogram(
+                "permission_graph_check_seconds", "Time taken by action_is_authorized.", {(): self.check_seconds}
+            )
+            lines += _metric(
+                "permission_graph_checks_total",
+                "counter",
+                "Authorization checks made with action_is_authorized, by decision.",
+                {(("decision", "allow"),): self.checks[True], (("decision", "deny"),): self.checks[False]},
+            )
+            lines += _histogram(
+                "permission_graph_path_length",
+                "Length of the shortest paths found by searches.",
+                {(): self.path_length},
+            )
+            lines += _histogram(
+                "permission_graph_shortest_paths",
+                "Number of tied shortest paths found by searches.",
+                {(): self.path_count},
+            )
+            lines += _metric(
+                "permission_graph_tie_breaks_total",
+                "counter",
+                "Searches whose shortest paths end in both ALLOW and DENY edges.",
+                {(): self.tie_breaks},
+            )
+        if (backend := self._backend()) is not None:
+            vertices = backend.count_vertices()
+            edges = backend.count_edges()
+            lines += _metric(
+                "permission_graph_vertices",
+                "gauge",
+                "Vertices in the graph, by vtype.",
+                {(("vtype", vtype),): vertices.get(vtype, 0) for vtype in VERTEX_TYPES},
+            )
+            lines += _metric(
+                "permission_graph_edges",
+                "gauge",
+                "Edges in the graph, by etype.",
+                {(("etype", etype.value),): edges.get(etype, 0) for etype in EdgeType},
+            )
+            if (tombstone_ratio := getattr(backend, "tombstone_ratio", None)) is not None:
+                lines += _metric(
+                    "permission_graph_tombstone_ratio",
+                    "gauge",
+                    "Fraction of the vertices and edges in the backend that are dead, awaiting compaction.",
+                    {(): tombstone_ratio},
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """Write every metric to a file in the Prometheus text exposition format.
+
+        The file is replaced atomically, so it can be read by the node
+        exporter's textfile collector while it is being written.
+        """
+        path = Path(path)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(self.to_prometheus())
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+class InstrumentedBackend:
+    """A backend that records the time taken by each call to another backend in a MetricsRegistry.
+
+    Every attribute of the wrapped backend is available on the
+    InstrumentedBackend; `PermissionGraphBackend` methods are timed.
+    """
+
+    def __init__(self, backend: PermissionGraphBackend, metrics: MetricsRegistry) -> None:
+        self.wrapped = backend
+        self.metrics = metrics
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "wrapped":
+            # Not yet set, e.g. in a shallow copy being built
+            raise AttributeError(name)
+        attr = getattr(self.wrapped, name)
+        if name not in BACKEND_METHODS:
+            return attr
+        timed = _timed(name, attr, self.metrics)
+        # Later lookups find the wrapper without calling __getattr__
+        setattr(self, name, timed)
+        return timed
+
+
+def _timed(name: str, method: Callable, metrics: MetricsRegistry) -> Callable:
+    """Return a wrapper of a backend method that records the time taken by each call."""
+    observe = _PATH_OBSERVERS.get(name)
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def timed_async(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                result = await method(*args, **kwargs)
+            finally:
+                metrics.observe_call(name, time.perf_counter() - start)
+            if observe is not None:
+                observe(metrics, result)
+            return result
+
+        return timed_async
+
+    @functools.wraps(method)
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            metrics.observe_call(name, time.perf_counter() - start)
+        if observe is not None:
+            observe(metrics, result)
+        return result
+
+    return timed
+
+
+def _observe_search(metrics: MetricsRegistry, result: tuple[int, set[EdgeType]] | None) -> None:
+    """Record the result of `search_between`."""
+    if result is not None:
+        length, final_edge_types = result
+        metrics.observe_paths(length, tie_break=len(final_edge_types) > 1)
+
+
+def _observe_shortest_paths(metrics: MetricsRegistry, paths: list[list[Any]]) -> None:
+    """Record the result of `shortest_paths`."""
+    if paths:
+        metrics.observe_paths(len(paths[0]) - 1, count=len(paths))
+
+
+def _observe_shortest_paths_many(metrics: MetricsRegistry, results: list[list[list[Any]]]) -> None:
+    """Record the result of `shortest_paths_many`."""
+    for paths in results:
+        _observe_shortest_paths(metrics, paths)
+
+
+_PATH_OBSERVERS = {
+    "search_between": _observe_search,
+    "search_between_async": _observe_search,
+    "shortest_paths": _observe_shortest_paths,
+    "shortest_paths_many": _observe_shortest_paths_many,
+}
+
+
+def _labels(labels: tuple[tuple[str, str], ...]) -> str:
+    """Format labels as a Prometheus label set."""
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _metric(name: str, kind: str, help: str, samples: dict[tuple[tuple[str, str], ...], float]) -> list[str]:
+    """Return the lines of a counter or gauge with a sample per label set."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {value}" for labels, value in samples.items())
+    return lines
+
+
+def _histogram(name: str, help: str, histograms: dict[tuple[tuple[str, str], ...], Histogram]) -> list[str]:
+    """Return the lines of a histogram with a histogram per label set."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for labels, histogram in histograms.items():
+        cumulative = 0
+        for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+            cumulative += count
+            le = bound if isinstance(bound, str) else repr(float(bound))
+            lines.append(f"{name}_bucket{_labels((*labels, ('le', le)))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
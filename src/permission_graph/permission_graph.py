@@ -1,101 +1,557 @@
-from typing import Type
+import itertools
+import math
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Self, Type
 
 from permission_graph.backends.base import PermissionGraphBackend
 from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.cache import DecisionCache
+from permission_graph.changelog import RECORDED, ChangeEntry, ChangeLog
+from permission_graph.closure import GroupClosure
+from permission_graph.compiled import CompiledPermissionGraph
+from permission_graph.explain import Decision, DecisionSampler
+from permission_graph.metrics import InstrumentedBackend, MetricsRegistry
+from permission_graph.search import ACTION_PATH_VTYPES, decide, search_from, search_to
 from permission_graph.structs import (
+    VERTEX_TYPES,
     Action,
     Actor,
     EdgeType,
+    Effect,
     Group,
     PermissionPolicy,
     Resource,
     ResourceType,
     TieBreakerPolicy,
     Vertex,
+    VertexHandle,
+    VertexRef,
 )
 
+# Maps the methods whose changes apply_changes combines into one bulk_load call to the arguments they fill
+_BULK_LOADABLE = {
+    "add_actor": ("actors",),
+    "add_group": ("groups",),
+    "add_resource_type": ("resource_types",),
+    "add_resource": ("resources",),
+    "add_actor_to_group": ("memberships",),
+    "allow": ("allows",),
+    "deny": ("denies",),
+    "bulk_load": ("actors", "groups", "resource_types", "resources", "memberships", "allows", "denies"),
+}
+
 
 class PermissionGraph:
     def __init__(
-        self, backend: PermissionGraphBackend = None, tie_breaker_policy: TieBreakerPolicy = TieBreakerPolicy.ANY_ALLOW
+        self,
+        backend: PermissionGraphBackend = None,
+        tie_breaker_policy: TieBreakerPolicy = TieBreakerPolicy.ANY_ALLOW,
+        cache: DecisionCache | None = None,
+        lazy_actions: bool = False,
+        changelog: ChangeLog | None = None,
+        sampler: DecisionSampler | None = None,
+        metrics: MetricsRegistry | None = None,
+        group_closure: bool = False,
     ) -> None:
-        """Initialize a new PermissionGraph."""
+        """Initialize a new PermissionGraph.
+
+        Args:
+            backend: The backend storing the graph (default `IGraphMemoryBackend`)
+            tie_breaker_policy: The policy used when shortest paths disagree
+            cache: If given, authorization decisions are cached here. Changes
+                made through this PermissionGraph evict the decisions they
+                affect; changes made directly to the backend do not.
+            lazy_actions: If True, the Action vertices of a resource are only
+                added to the backend once they have an ALLOW or DENY edge, and
+                are removed again when their last one is. The other actions of
+                a resource still exist, but can't be reached by any actor, so
+                no actor is authorized to perform them. `compile` only covers
+                actions with edges.
+            changelog: If given, every change made through this
+                PermissionGraph is recorded here once it succeeds. See
+                `permission_graph.changelog`.
+            sampler: If given, a fraction of the checks made with
+                `action_is_authorized` and `authorize_many` are decided with
+                `explain`, and their decisions recorded here. See
+                `permission_graph.explain`.
+            metrics: If given, the backend is wrapped in an
+                `InstrumentedBackend` recording its calls here, along with
+                the time and result of each `action_is_authorized` check.
+                See `permission_graph.metrics`.
+            group_closure: If True, a `GroupClosure` of the memberships of
+                groups in groups is built from the backend and kept up to
+                date by changes made through this PermissionGraph; changes
+                made directly to the backend are not seen. Checks made
+                without a decision cache, and `actors_authorized_for`, use it
+                instead of walking the group hierarchy. See
+                `permission_graph.closure`.
+        """
         if backend is None:
             backend = IGraphMemoryBackend()
+        if metrics is not None:
+            if not isinstance(backend, InstrumentedBackend):
+                backend = InstrumentedBackend(backend, metrics)
+            metrics.watch(backend.wrapped)
         self.backend = backend
+        self.metrics = metrics
         self.tie_breaker_policy = tie_breaker_policy
+        self.cache = cache
+        self.lazy_actions = lazy_actions
+        self.changelog = changelog
+        self.sampler = sampler
+        self.group_closure = GroupClosure.from_backend(backend) if group_closure else None
         self._resource_type_map = {}
 
     def add_actor(self, actor: Actor | str) -> None:
         """Add a actor to the permission graph."""
         self.backend.add_vertex(actor)
+        self._record("add_actor", actor)
 
     def remove_actor(self, actor: Actor) -> None:
         """Remove a actor from the permission graph."""
+        targets = self.backend.get_vertices_from(actor) if self.lazy_actions else []
         self.backend.remove_vertex(actor)
+        self._invalidate_vertex(actor)
+        self._release_actions(targets)
+        self._record("remove_actor", actor)
 
     def add_resource_type(self, resource_type: ResourceType):
         """Register a resource type to the permission graph."""
         self.backend.add_vertex(resource_type, actions=resource_type.actions)
+        self._record("add_resource_type", resource_type)
 
-    def remove_resource_type(self, resource_type: ResourceType):
-        """Remove a resource type from the permission graph."""
-        for resource in self.backend.get_vertices_to(resource_type):
-            self.remove_resource(resource)
+    def remove_resource_type(
+        self,
+        resource_type: ResourceType,
+        batch_size: int = 100_000,
+        progress: Callable[[int, int], None] | None = None,
+    ):
+        """Remove a resource type, and all of its resources, from the permission graph.
+
+        Resources are removed in batches, along with their actions, each with
+        one call to the backend.
+
+        Args:
+            resource_type: The resource type to remove
+            batch_size: The number of resources to remove at once
+            progress: If given, called after each batch with the number of
+                resources removed so far and the total number of resources
+        """
+        resources = self.backend.get_vertices_to(resource_type)
+        for start in range(0, len(resources), batch_size):
+            batch = resources[start : start + batch_size]
+            self._remove_actions(
+                [action for resource in batch for action in self.backend.get_vertices_to(resource)], also=batch
+            )
+            if progress is not None:
+                progress(start + len(batch), len(resources))
         self.backend.remove_vertex(resource_type)
+        self._invalidate_vertex(resource_type)
+        self._record("remove_resource_type", resource_type)
 
     def add_resource(self, resource: Resource) -> None:
         """Add a resource to the permission graph."""
         resource_type = self.backend.vertex_factory(f"resource_type:{resource.resource_type}")
         self.backend.add_vertex(resource)
         self.backend.add_edge(EdgeType.MEMBER_OF, resource, resource_type)
-        for action_name in resource_type.actions:
-            action = Action(name=action_name, resource_type=resource.resource_type, resource=resource.name)
-            self.backend.add_vertex(action)
-            self.backend.add_edge(EdgeType.MEMBER_OF, action, resource)
+        if not self.lazy_actions:
+            for action_name in resource_type.actions:
+                action = Action(name=action_name, resource_type=resource.resource_type, resource=resource.name)
+                self.backend.add_vertex(action)
+                self.backend.add_edge(EdgeType.MEMBER_OF, action, resource)
+        self._record("add_resource", resource)
 
     def remove_resource(self, resource: Resource) -> None:
         """Remove a resource from the permission graph."""
-        actions = self.backend.get_vertices_to(resource)
-        for action in actions:
-            self.backend.remove_vertex(action)
-        self.backend.remove_vertex(resource)
+        self._remove_actions(self.backend.get_vertices_to(resource), also=[resource])
+        self._record("remove_resource", resource)
+
+    def _remove_actions(self, actions: list[Action | VertexRef], also: list[Vertex | VertexRef] = ()) -> None:
+        """Remove actions with one call to the backend, along with the actions left with no permission edges.
+
+        Args:
+            actions: The actions to remove
+            also: Other vertices to remove in the same call
+        """
+        neighbors = []
+        if self.lazy_actions:
+            removed = {action.id for action in actions}
+            for action in actions:
+                neighbors.extend(self.backend.get_vertices_to(action))
+                neighbors.extend(self.backend.get_vertices_from(action))
+            neighbors = [vertex for vertex in neighbors if vertex.id not in removed]
+        self.backend.remove_vertices([*actions, *also])
+        for vertex in [*actions, *also]:
+            self._invalidate_vertex(vertex)
+        self._release_actions(neighbors)
 
     def add_group(self, group: Group):
         """Add a group to the permission graph."""
         self.backend.add_vertex(group)
+        self._record("add_group", group)
 
     def remove_group(self, group: Group):
         """Remove a group from the permission graph."""
+        targets = self.backend.get_vertices_from(group) if self.lazy_actions else []
         self.backend.remove_vertex(group)
+        self._invalidate_vertex(group)
+        if self.group_closure is not None:
+            self.group_closure.remove_group(group.id)
+        self._release_actions(targets)
+        self._record("remove_group", group)
 
     def allow(self, actor: Actor | Group | Action, action: Action):
         """Grant actor or group permission to take action on resource or group."""
-        self.backend.add_edge(EdgeType.ALLOW, source=actor, target=action)
+        self._add_permission_edge(EdgeType.ALLOW, actor, action)
+        self._record("allow", actor, action)
 
     def deny(self, actor: Actor | Group | Action, action: Action):
         """Deny actor or group permission to take action on resource or group."""
-        self.backend.add_edge(EdgeType.DENY, source=actor, target=action)
+        self._add_permission_edge(EdgeType.DENY, actor, action)
+        self._record("deny", actor, action)
+
+    def _add_permission_edge(self, etype: EdgeType, actor: Actor | Group | Action, action: Action) -> None:
+        """Add an ALLOW or DENY edge, first adding any lazy actions it connects."""
+        added = [vertex for vertex in (actor, action) if self._add_lazy_action(vertex)]
+        try:
+            self.backend.add_edge(etype, source=actor, target=action)
+        except ValueError:
+            self._release_actions(added)
+            raise
+        self._invalidate_edge(actor)
 
     def revoke(self, actor: Actor | Group | Action, action: Action):
         """Revoke a permission (either allow or deny)."""
         self.backend.remove_edge(actor, action)
+        self._invalidate_edge(actor)
+        self._release_actions([actor, action])
+        self._record("revoke", actor, action)
+
+    def add_actor_to_group(self, actor: Actor | Group, group: Group):
+        """Add a actor, or another group, to a group.
 
-    def add_actor_to_group(self, actor: Actor, group: Group):
-        """Add a actor to a group."""
+        The members of a group are also members of every group it is in.
+        Raises ValueError if adding a group would make it a member of itself.
+        """
+        self._check_nesting([(actor, group)])
         self.backend.add_edge(EdgeType.MEMBER_OF, source=actor, target=group)
+        self._invalidate_edge(actor)
+        if self.group_closure is not None and actor.vtype == "group":
+            self.group_closure.add_edge(actor.id, group.id)
+        self._record("add_actor_to_group", actor, group)
 
-    def remove_actor_from_group(self, actor: Actor, group: Group):
-        """Remove a actor from a group."""
+    def remove_actor_from_group(self, actor: Actor | Group, group: Group):
+        """Remove a actor, or another group, from a group."""
         self.backend.remove_edge(source=actor, target=group)
+        self._invalidate_edge(actor)
+        if self.group_closure is not None and actor.vtype == "group":
+            self.group_closure.remove_edge(actor.id, group.id)
+        self._record("remove_actor_from_group", actor, group)
+
+    def _check_nesting(self, memberships: list[tuple[Actor | Group, Group]]) -> None:
+        """Raise ValueError if adding memberships, in order, would make a group a member of itself."""
+        added: dict[str, list[str]] = {}
+        for member, group in memberships:
+            if member.vtype != "group":
+                continue
+            # Walk up from group, looking for member
+            seen = {group.id}
+            stack = [group.id]
+            while stack and member.id not in seen:
+                group_id = stack.pop()
+                if self.group_closure is not None:
+                    parents = self.group_closure.parents.get(group_id, ())
+                elif self.backend.vertex_exists(ref := VertexRef(id=group_id, vtype="group")):
+                    parents = [
+                        target.id
+                        for target, etype in self.backend.get_edges_from(ref)
+                        if etype == EdgeType.MEMBER_OF and target.vtype == "group"
+                    ]
+                else:
+                    parents = ()
+                for parent in [*parents, *added.get(group_id, ())]:
+                    if parent not in seen:
+                        seen.add(parent)
+                        stack.append(parent)
+            if member.id in seen:
+                raise ValueError(f"{member} can't be a member of {group}, which is a member of it")
+            added.setdefault(member.id, []).append(group.id)
+
+    def _lazy_action(self, vertex: Vertex | VertexRef | VertexHandle) -> Action | None:
+        """Return the vertex as an Action if it is an action that lazy_actions has not added to the backend.
+
+        Raises ValueError if the action's resource does not exist, or its
+        resource type does not have the action.
+        """
+        if not self.lazy_actions or isinstance(vertex, int) or vertex.vtype != "action":
+            return None
+        if self.backend.vertex_exists(vertex):
+            return None
+        action = vertex if isinstance(vertex, Action) else Action.from_id(vertex.id)
+        self._check_action(action, resource_types={}, resources=set())
+        return action
+
+    def _check_action(self, action: Action, resource_types: dict[str, ResourceType], resources: set[str]) -> Resource:
+        """Return the resource of an action, checking that the action is one of its resource type's actions.
+
+        Args:
+            action: The action to check
+            resource_types: Resource types not yet in the backend, by name
+            resources: The ids of resources not yet in the backend
+
+        Raises ValueError if the resource does not exist, or its resource type
+        does not have the action.
+        """
+        resource = Resource(name=action.resource, resource_type=action.resource_type)
+        if resource.id not in resources and not self.backend.vertex_exists(resource):
+            raise ValueError(f"Vertex does not exist: {action}")
+        resource_type = resource_types.get(action.resource_type) or self.backend.vertex_factory(
+            f"resource_type:{action.resource_type}"
+        )
+        if action.name not in resource_type.actions:
+            raise ValueError(f"Vertex does not exist: {action}")
+        return resource
+
+    def _add_lazy_action(self, vertex: Vertex | VertexHandle) -> bool:
+        """Add an action to the backend if lazy_actions has not yet added it, returning True if it was added."""
+        if (action := self._lazy_action(vertex)) is None:
+            return False
+        self.backend.add_vertex(action)
+        self.backend.add_edge(
+            EdgeType.MEMBER_OF, action, Resource(name=action.resource, resource_type=action.resource_type)
+        )
+        return True
+
+    def _release_actions(self, vertices: Iterable[Vertex | VertexRef | VertexHandle]) -> None:
+        """Remove the actions among vertices that have no ALLOW or DENY edges left, if lazy_actions is set.
+
+        Such actions can't be reached by any actor, so removing them doesn't
+        change any decision.
+        """
+        if not self.lazy_actions:
+            return
+        for vertex in vertices:
+            if isinstance(vertex, int) or vertex.vtype != "action" or not self.backend.vertex_exists(vertex):
+                continue
+            # Every edge into an action is an ALLOW or DENY edge
+            if not self.backend.get_vertices_to(vertex) and all(
+                etype == EdgeType.MEMBER_OF for _, etype in self.backend.get_edges_from(vertex)
+            ):
+                self.backend.remove_vertex(vertex)
+
+    def _record(self, method: str, *args: Any) -> None:
+        """Record a change in the change log, if there is one."""
+        if self.changelog is not None:
+            self.changelog.record(method, args)
+
+    def _invalidate_edge(self, source: Vertex) -> None:
+        """Evict cached decisions that a new or removed edge out of source may change."""
+        if self.cache is not None:
+            self.cache.invalidate_edge(source.id)
+
+    def _invalidate_vertex(self, vertex: Vertex) -> None:
+        """Evict cached decisions that removing a vertex may change."""
+        if self.cache is not None:
+            self.cache.invalidate_vertex(vertex.id)
+
+    def bulk_load(
+        self,
+        actors: Iterable[Actor] = (),
+        groups: Iterable[Group] = (),
+        resource_types: Iterable[ResourceType] = (),
+        resources: Iterable[Resource] = (),
+        memberships: Iterable[tuple[Actor | Group, Group]] = (),
+        allows: Iterable[tuple[Actor | Group | Action, Action]] = (),
+        denies: Iterable[tuple[Actor | Group | Action, Action]] = (),
+    ) -> None:
+        """Add many vertices and edges to the permission graph at once.
+
+        This is equivalent to calling `add_actor`, `add_group`,
+        `add_resource_type`, `add_resource`, `add_actor_to_group`, `allow` and
+        `deny` for each argument, but adds all vertices with one call to the
+        backend and all edges with another. It is much faster for loading a
+        large graph.
+
+        Resources may be of a resource type in `resource_types` or of one
+        already in the graph. Edges may refer to vertices in this call or
+        already in the graph.
+
+        Raises ValueError, without changing the graph, if a vertex or edge
+        already exists or is given twice, or a group would be a member of
+        itself.
+        """
+        actors, groups, resource_types, resources = list(actors), list(groups), list(resource_types), list(resources)
+        memberships, allows, denies = list(memberships), list(allows), list(denies)
+        self._check_nesting(memberships)
+        resource_type_map = {resource_type.name: resource_type for resource_type in resource_types}
+        vertices = [*actors, *groups, *resource_types]
+        edges = []
+        for resource in resources:
+            if (resource_type := resource_type_map.get(resource.resource_type)) is None:
+                resource_type = self.backend.vertex_factory(f"resource_type:{resource.resource_type}")
+                resource_type_map[resource.resource_type] = resource_type
+            vertices.append(resource)
+            edges.append((EdgeType.MEMBER_OF, resource, resource_type))
+            if self.lazy_actions:
+                continue
+            for action_name in resource_type.actions:
+                action = Action(name=action_name, resource_type=resource.resource_type, resource=resource.name)
+                vertices.append(action)
+                edges.append((EdgeType.MEMBER_OF, action, resource))
+        edges.extend((EdgeType.MEMBER_OF, actor, group) for actor, group in memberships)
+        permissions = [(EdgeType.ALLOW, source, action) for source, action in allows]
+        permissions.extend((EdgeType.DENY, source, action) for source, action in denies)
+        if self.lazy_actions:
+            # Add the actions that the new permission edges connect
+            added = {vertex.id for vertex in vertices}
+            for _, source, target in permissions:
+                for vertex in (source, target):
+                    if vertex.vtype == "action" and vertex.id not in added and not self.backend.vertex_exists(vertex):
+                        action = vertex if isinstance(vertex, Action) else Action.from_id(vertex.id)
+                        resource = self._check_action(action, resource_type_map, added)
+                        vertices.append(action)
+                        edges.append((EdgeType.MEMBER_OF, action, resource))
+                        added.add(action.id)
+        edges.extend(permissions)
+
+        self.backend.add_vertices(
+            vertices, actions=[v.actions if isinstance(v, ResourceType) else None for v in vertices]
+        )
+        try:
+            self.backend.add_edges(edges)
+        except ValueError:
+            self.backend.remove_vertices(vertices)
+            raise
+        for source in {source.id: source for _, source, _ in edges}.values():
+            self._invalidate_edge(source)
+        if self.group_closure is not None:
+            for member, group in memberships:
+                if member.vtype == "group":
+                    self.group_closure.add_edge(member.id, group.id)
+        self._record("bulk_load", actors, groups, resource_types, resources, memberships, allows, denies)
+
+    def apply_changes(self, entries: Iterable[ChangeEntry], batch_size: int = 10_000) -> int:
+        """Replay the changes recorded in another graph's change log.
+
+        Runs of consecutive entries that only add vertices and edges
+        (`add_actor`, `add_group`, `add_resource_type`, `add_resource`,
+        `add_actor_to_group`, `allow`, `deny` and `bulk_load`) are applied in
+        batches of up to batch_size entries, each with one call to
+        `bulk_load`. Other entries call their method.
+
+        If this graph has a change log, entries it already has are skipped,
+        and the others are appended to it with their versions, so a replica
+        can resume from `changelog.version`. The graph should have the same
+        lazy_actions setting as the one the entries were recorded from.
+
+        Args:
+            entries: The entries to apply, in version order
+            batch_size: The maximum number of entries applied with one call to `bulk_load`
+
+        Returns:
+            The number of entries applied.
+
+        Raises ValueError if an entry fails, or doesn't follow the version of
+        this graph's change log. The entries before its batch have been
+        applied.
+        """
+        changelog, self.changelog = self.changelog, None
+        n_applied = 0
+        try:
+            batch = []
+            for entry in entries:
+                if changelog is not None:
+                    if entry.version <= changelog.version:
+                        continue
+                    if entry.version != changelog.version + len(batch) + 1:
+                        raise ValueError(f"Expected version {changelog.version + len(batch) + 1}, got {entry.version}")
+                if entry.method in _BULK_LOADABLE:
+                    if len(batch) == batch_size:
+                        n_applied += self._apply_batch(batch, changelog)
+                        batch = []
+                    batch.append(entry)
+                    continue
+                n_applied += self._apply_batch(batch, changelog)
+                batch = []
+                if entry.method not in RECORDED:
+                    raise ValueError(f"Can't apply {entry.method}")
+                getattr(self, entry.method)(*entry.args)
+                if changelog is not None:
+                    changelog.append(entry)
+                n_applied += 1
+            n_applied += self._apply_batch(batch, changelog)
+        finally:
+            self.changelog = changelog
+        return n_applied
+
+    def _apply_batch(self, batch: list[ChangeEntry], changelog: ChangeLog | None) -> int:
+        """Apply entries that only add vertices and edges with one call to `bulk_load`, returning how many."""
+        if not batch:
+            return 0
+        kwargs = {name: [] for name in _BULK_LOADABLE["bulk_load"]}
+        for entry in batch:
+            if entry.method == "bulk_load":
+                for name, values in zip(_BULK_LOADABLE["bulk_load"], entry.args):
+                    kwargs[name].extend(values)
+            else:
+                (name,) = _BULK_LOADABLE[entry.method]
+                kwargs[name].append(entry.args[0] if len(entry.args) == 1 else tuple(entry.args))
+        self.bulk_load(**kwargs)
+        if changelog is not None:
+            for entry in batch:
+                changelog.append(entry)
+        return len(batch)
+
+    def save(self, path: str | Path) -> None:
+        """Save the permission graph to a snapshot file.
+
+        See `permission_graph.snapshot` for the file format.
+        """
+        self.backend.save(path)
+
+    @classmethod
+    def load(
+        cls, path: str | Path, backend_class: type[PermissionGraphBackend] = IGraphMemoryBackend, **kwargs: Any
+    ) -> Self:
+        """Load a permission graph from a snapshot file.
+
+        Args:
+            path: The snapshot file, created by `save`
+            backend_class: The type of backend to load the graph into
+            **kwargs: Passed to `PermissionGraph.__init__`
+        """
+        return cls(backend=backend_class.load(path), **kwargs)
+
+    def copy(self) -> Self:
+        """Return an independent copy of this permission graph.
+
+        The copy has a copy of the backend and group closure, the same tie
+        breaker policy and lazy_actions setting, and shares the change log,
+        decision sampler and metrics registry, but has no decision cache.
+        Changes made to the copy are recorded in the same change log.
+        """
+        graph = type(self)(
+            backend=self.backend.copy(),
+            tie_breaker_policy=self.tie_breaker_policy,
+            lazy_actions=self.lazy_actions,
+            changelog=self.changelog,
+            sampler=self.sampler,
+            metrics=self.metrics,
+        )
+        if self.group_closure is not None:
+            graph.group_closure = self.group_closure.copy()
+        return graph
 
     def paths_to_targets(
         self,
         source: Vertex,
         target_vtype: Type | tuple[Type],
-        prefix: list[Vertex],
-        paths: list[list[Vertex]],
+        prefix: list[Vertex] | None = None,
+        paths: list[list[Vertex]] | None = None,
         reverse=False,
+        max_depth: int | None = None,
+        max_paths: int | None = None,
     ) -> list[list[Vertex]]:
         """Finds paths from a source vertex to other vertices of specified type.
 
@@ -115,6 +571,8 @@ class PermissionGraph:
         to all users within that group. Expanding those paths is possible
         through subsequent invocations of this function.
 
+        See `iter_paths_to_targets` for how paths are found.
+
         Args:
             source: The source vertex to find paths from
             target_vtype: The type(s) of vertices to look for. For any path,
@@ -123,70 +581,509 @@ class PermissionGraph:
             paths: list to which to append paths
             reverse: if True, will look backwards through the directed graph
                 (default False).
-        """
-        if reverse:
-            targets = self.backend.get_vertices_to(source)
-        else:
-            targets = self.backend.get_vertices_from(source)
-
-        # Recursively invoke on children
-        new_prefix = prefix + [source]
-        for target in targets:
-            if isinstance(target, target_vtype):
-                path = new_prefix + [target]
-                paths.append(path[::-1])
-            else:
-                self._paths_to_targets(
-                    target, target_vtype=target_vtype, prefix=new_prefix, paths=paths, reverse=reverse
-                )
+            max_depth: If given, the maximum number of edges in a path
+            max_paths: If given, the maximum number of paths to find
 
+        Returns:
+            `paths`, with each path found appended to it. Each path starts at
+            the target and ends with source, followed by `prefix` in reverse.
+        """
+        paths = [] if paths is None else paths
+        suffix = list(reversed(prefix or []))
+        paths.extend(
+            path + suffix
+            for path in self.iter_paths_to_targets(
+                source, target_vtype, reverse=reverse, max_depth=max_depth, max_paths=max_paths
+            )
+        )
         return paths
 
-    def action_is_authorized(self, actor: Actor, action: str) -> bool:
-        """Authorize actor to perform action on resource."""
-        shortest_paths = self.backend.shortest_paths(actor, action)
-        if len(shortest_paths) == 0:
+    def iter_paths_to_targets(
+        self,
+        source: Vertex,
+        target_vtype: Type | tuple[Type],
+        reverse=False,
+        max_depth: int | None = None,
+        max_paths: int | None = None,
+    ) -> Iterator[list[Vertex]]:
+        """Yield paths from a source vertex to other vertices of specified type.
+
+        Searches breadth first, visiting each vertex once, so cycles (e.g. in
+        action propagation) are safe. Each vertex keeps pointers to the
+        vertices before it on its shortest paths from source, and paths are
+        only built when a target is reached. So every target reachable without
+        passing through another target is found, along each of its shortest
+        paths from source. Paths are yielded shortest first.
+
+        Args:
+            source: The source vertex to find paths from
+            target_vtype: The type(s) of vertices to look for. For any path,
+                search will terminate with first node of specified type.
+            reverse: if True, will look backwards through the directed graph
+                (default False).
+            max_depth: If given, the maximum number of edges in a path
+            max_paths: If given, the maximum number of paths to yield
+
+        Yields:
+            Paths as lists of vertices, starting with the target and ending
+            with source.
+        """
+        neighbors = self.backend.get_vertices_to if reverse else self.backend.get_vertices_from
+        target_vtypes = {vtype for vtype, cls in VERTEX_TYPES.items() if issubclass(cls, target_vtype)}
+        depths = {source.id: 0}
+        parents: dict[str, list[Vertex | VertexRef]] = {source.id: []}
+        vertices: dict[str, Vertex] = {source.id: source}
+        frontier = [source]
+        depth = 0
+        n_paths = 0
+        if max_paths == 0:
+            return
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            targets = []
+            for vertex in frontier:
+                for neighbor in neighbors(vertex):
+                    if neighbor.id not in depths:
+                        depths[neighbor.id] = depth
+                        parents[neighbor.id] = [vertex]
+                        (targets if neighbor.vtype in target_vtypes else next_frontier).append(neighbor)
+                    elif depths[neighbor.id] == depth:
+                        parents[neighbor.id].append(vertex)
+            for target in targets:
+                for path in self._paths_from_parents(target, parents, vertices):
+                    yield path
+                    n_paths += 1
+                    if n_paths == max_paths:
+                        return
+            frontier = next_frontier
+
+    def _paths_from_parents(
+        self, target: VertexRef, parents: dict[str, list[Vertex | VertexRef]], vertices: dict[str, Vertex]
+    ) -> Iterator[list[Vertex]]:
+        """Yield every path from target back to the search source by following parent pointers.
+
+        Args:
+            target: The vertex to start from
+            parents: Maps vertex ids to the vertices before them on their
+                shortest paths from the source, which has no parents
+            vertices: Vertices already built from their ids, added to as
+                vertices are built
+        """
+
+        def vertex(ref: Vertex | VertexRef) -> Vertex:
+            if ref.id not in vertices:
+                vertices[ref.id] = self.backend.vertex_factory(ref.id)
+            return vertices[ref.id]
+
+        stack = [(target, [vertex(target)])]
+        while stack:
+            ref, path = stack.pop()
+            if not parents[ref.id]:
+                yield path
+            for parent in reversed(parents[ref.id]):
+                stack.append((parent, path + [vertex(parent)]))
+
+    def action_is_authorized(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool:
+        """Authorize actor to perform action on resource.
+
+        The actor and action may be given as handles (see
+        `PermissionGraphBackend.get_handle`), which avoids looking them up by id.
+        """
+        if self.metrics is not None:
+            start = time.perf_counter()
+            allowed = self._action_is_authorized(actor, action)
+            self.metrics.observe_check(time.perf_counter() - start, allowed)
+            return allowed
+        return self._action_is_authorized(actor, action)
+
+    def _action_is_authorized(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool:
+        """Decide a check for `action_is_authorized`."""
+        if (allowed := self._decide_without_search(actor, action)) is not None:
+            return allowed
+        result = self.backend.search_between(actor, action)
+        return result is not None and decide(result[1], self.tie_breaker_policy)
+
+    async def action_is_authorized_async(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool:
+        """Authorize actor to perform action on resource, awaiting the backend's `search_between_async`.
+
+        Decides the same way as `action_is_authorized`. Checks decided by
+        sampling, lazy actions, the decision cache or the group closure don't
+        use `search_between_async`, and are made without awaiting.
+        """
+        if self.metrics is not None:
+            start = time.perf_counter()
+            allowed = await self._action_is_authorized_async(actor, action)
+            self.metrics.observe_check(time.perf_counter() - start, allowed)
+            return allowed
+        return await self._action_is_authorized_async(actor, action)
+
+    async def _action_is_authorized_async(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool:
+        """Decide a check for `action_is_authorized_async`."""
+        if (allowed := self._decide_without_search(actor, action)) is not None:
+            return allowed
+        result = await self.backend.search_between_async(actor, action)
+        return result is not None and decide(result[1], self.tie_breaker_policy)
+
+    def _decide_without_search(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool | None:
+        """Decide a check without `search_between`, or return None if it must search between actor and action."""
+        if self.sampler is not None and self.sampler.sample():
+            return self._explain_sampled(actor, action)
+        if self._lazy_action(action) is not None:
+            if not self.backend.vertex_exists(actor):
+                raise ValueError(f"Vertex does not exist: {actor}")
             return False
-        elif len(shortest_paths) == 1:
-            shortest_path = shortest_paths[0]
-            return self.backend.get_edge_type(shortest_path[-2], shortest_path[-1]) == EdgeType.ALLOW
+        if self.cache is not None:
+            return self._authorize_cached(actor, [action])[0]
+        if self.group_closure is not None:
+            return self._authorize_closure(actor, [action])[0]
+        return None
+
+    def authorize_many(self, checks: Iterable[tuple[Actor | VertexHandle, Action | VertexHandle]]) -> list[bool]:
+        """Authorize many (actor, action) pairs at once.
+
+        Checks are grouped by actor, and the backend searches from each actor
+        once for all of the actions requested for it. Each decision is the same
+        as the one `action_is_authorized` would return for that pair.
+
+        Args:
+            checks: (actor, action) pairs to authorize, as vertices or handles
+
+        Returns:
+            A list of decisions, in the same order as `checks`.
+        """
+        checks = list(checks)
+        checks_by_actor: dict[str | VertexHandle, tuple[Actor | VertexHandle, list[int]]] = {}
+        sampled = {}
+        for i, (actor, action) in enumerate(checks):
+            if self.sampler is not None and self.sampler.sample():
+                sampled[i] = self._explain_sampled(actor, action)
+                continue
+            if self._lazy_action(action) is not None:
+                # No actor is authorized to perform an action that has not been added
+                if not self.backend.vertex_exists(actor):
+                    raise ValueError(f"Vertex does not exist: {actor}")
+                continue
+            key = actor if isinstance(actor, int) else actor.id
+            checks_by_actor.setdefault(key, (actor, []))[1].append(i)
+
+        decisions = [False] * len(checks)
+        for actor, indices in checks_by_actor.values():
+            actions = [checks[i][1] for i in indices]
+            if self.cache is not None:
+                actor_decisions = self._authorize_cached(actor, actions)
+            elif self.group_closure is not None:
+                actor_decisions = self._authorize_closure(actor, actions)
+            else:
+                actor_decisions = self._authorize_search(actor, actions)
+            for i, decision in zip(indices, actor_decisions):
+                decisions[i] = decision
+        for i, decision in sampled.items():
+            decisions[i] = decision
+        return decisions
+
+    def explain(
+        self, actor: Actor | VertexHandle, action: Action | VertexHandle, max_paths: int | None = 100
+    ) -> Decision:
+        """Explain the decision `action_is_authorized` makes for an actor and action.
+
+        Searches breadth first from the actor, keeping the vertices before
+        each vertex on its shortest paths, so it is slower than
+        `action_is_authorized`, and does not use the decision cache. The
+        decision is made from the last edge of every shortest path, but only
+        max_paths of the paths are built, as their number can grow
+        exponentially with the nesting of groups.
+
+        Args:
+            actor: The actor to explain the decision for
+            action: The action to explain the decision for
+            max_paths: The maximum number of paths to return (default 100),
+                or None for every shortest path
+
+        Raises ValueError if the actor or action does not exist, or max_paths
+        is less than 1.
+        """
+        if max_paths is not None and max_paths < 1:
+            raise ValueError(f"max_paths must be at least 1, got {max_paths}")
+        actor, action = self._resolve_handle(actor), self._resolve_handle(action)
+        if not self.backend.vertex_exists(actor):
+            raise ValueError(f"Vertex does not exist: {actor}")
+        if self._lazy_action(action) is not None:
+            # No actor can reach an action that has not been added
+            parents, final_edge_types = {}, {}
+        elif not self.backend.vertex_exists(action):
+            raise ValueError(f"Vertex does not exist: {action}")
         else:
-            match self.tie_breaker_policy:
-                case TieBreakerPolicy.ANY_ALLOW:
-                    policy = any
-                case TieBreakerPolicy.ALL_ALLOW:
-                    policy = all
-            return policy(self.backend.get_edge_type(path[-2], path[-1]) == EdgeType.ALLOW for path in shortest_paths)
-
-    def update_resource_type_actions(self, resource_type_name: str, new_actions: list[str]):
+            parents, final_edge_types = self._shortest_path_parents(actor, action)
+        vertices = {
+            actor.id: actor if isinstance(actor, Vertex) else self.backend.vertex_factory(actor.id),
+            action.id: action if isinstance(action, Vertex) else Action.from_id(action.id),
+        }
+        found = self._paths_from_parents(action, parents, vertices) if action.id in parents else iter(())
+        paths = [path[::-1] for path in itertools.islice(found, None if max_paths is None else max_paths + 1)]
+        truncated = max_paths is not None and len(paths) > max_paths
+        paths = paths[:max_paths]
+        effects = [Effect(final_edge_types[path[-2].id].value) for path in paths]
+        return Decision(
+            actor=vertices[actor.id],
+            action=vertices[action.id],
+            allowed=decide(set(final_edge_types.values()), self.tie_breaker_policy),
+            paths=paths,
+            effects=effects,
+            tie_breaker_policy=self.tie_breaker_policy,
+            tie_breaker_applied=len(set(final_edge_types.values())) > 1,
+            depth=len(paths[0]) - 1 if paths else None,
+            truncated=truncated,
+        )
+
+    def _shortest_path_parents(
+        self, source: Vertex | VertexRef, target: Vertex | VertexRef
+    ) -> tuple[dict[str, list[Vertex | VertexRef]], dict[str, EdgeType]]:
+        """Search breadth first from source until the level where target is reached.
+
+        Returns:
+            A (parents, final_edge_types) tuple. parents maps the id of each
+            vertex reached to the vertices before it on its shortest paths
+            from source, as used by `_paths_from_parents`, and has no entry
+            for target if it can't be reached. final_edge_types maps the id
+            of each vertex before target to the type of its edge to target.
+        """
+        parents: dict[str, list[Vertex | VertexRef]] = {source.id: []}
+        final_edge_types: dict[str, EdgeType] = {}
+        frontier = [source]
+        while frontier and target.id not in parents:
+            level: dict[str, list[Vertex | VertexRef]] = {}
+            next_frontier = []
+            for vertex in frontier:
+                for neighbor, etype in self.backend.get_edges_from(vertex):
+                    if neighbor.id in parents:
+                        continue
+                    if neighbor.id not in level:
+                        level[neighbor.id] = []
+                        next_frontier.append(neighbor)
+                    level[neighbor.id].append(vertex)
+                    if neighbor.id == target.id:
+                        final_edge_types[vertex.id] = etype
+            parents.update(level)
+            frontier = next_frontier
+        return parents, final_edge_types
+
+    def _explain_sampled(self, actor: Actor | VertexHandle, action: Action | VertexHandle) -> bool:
+        """Decide a sampled check with `explain`, recording the decision in the sampler."""
+        decision = self.explain(actor, action)
+        self.sampler.record(decision)
+        return decision.allowed
+
+    def _authorize_cached(self, actor: Actor | VertexHandle, actions: list[Action | VertexHandle]) -> list[bool]:
+        """Authorize an actor to perform actions, using and filling the decision cache."""
+        # The cache is keyed by vertex id
+        actor = self._resolve_handle(actor)
+        actions = [self._resolve_handle(action) for action in actions]
+        decisions = {action.id: self.cache.get(actor.id, action.id) for action in actions}
+        misses = [action for action in actions if decisions[action.id] is None]
+        if misses:
+            for action in misses:
+                if not self.backend.vertex_exists(action):
+                    raise ValueError(f"Vertex does not exist: {action}")
+            reached = search_from(self.backend, actor, targets=[action.id for action in misses])
+            depths = {}
+            for action in misses:
+                if (r := reached.get(action.id)) is None:
+                    decisions[action.id] = False
+                    depths[action.id] = math.inf
+                else:
+                    decisions[action.id] = decide(r.final_edge_types, self.tie_breaker_policy)
+                    depths[action.id] = r.depth
+            # The search stops early only once every action has been reached
+            radius = max(depths.values())
+            distances = {vertex_id: r.depth for vertex_id, r in reached.items()}
+            distances[actor.id] = 0
+            self.cache.put(
+                actor.id,
+                decisions={action.id: decisions[action.id] for action in misses},
+                depths=depths,
+                distances=distances,
+                radius=radius,
+            )
+        return [decisions[action.id] for action in actions]
+
+    def _authorize_search(self, actor: Actor | VertexHandle, actions: list[Action | VertexHandle]) -> list[bool]:
+        """Authorize an actor to perform actions with one breadth first search from the actor.
+
+        Only the depth and final edge types of each action are kept, so the
+        search does not grow with the number of shortest paths, and does not
+        search onwards from resources, which have no paths to actions.
+        """
+        actor = self._resolve_handle(actor)
+        actions = [self._resolve_handle(action) for action in actions]
+        for vertex in [actor, *actions]:
+            if not self.backend.vertex_exists(vertex):
+                raise ValueError(f"Vertex does not exist: {vertex}")
+        reached = search_from(self.backend, actor, targets=[action.id for action in actions], expand=ACTION_PATH_VTYPES)
+        return [
+            action.id in reached and decide(reached[action.id].final_edge_types, self.tie_breaker_policy)
+            for action in actions
+        ]
+
+    def _authorize_closure(self, actor: Actor | VertexHandle, actions: list[Action | VertexHandle]) -> list[bool]:
+        """Authorize an actor to perform actions, finding its groups with the group closure."""
+        distances = self.group_closure.distances_from(self.backend, self._resolve_handle(actor))
+        results = (
+            self.group_closure.search_between(self.backend, distances, self._resolve_handle(action))
+            for action in actions
+        )
+        return [result is not None and decide(result[1], self.tie_breaker_policy) for result in results]
+
+    def actors_authorized_for(self, action: Action) -> Iterator[Actor]:
+        """Yield every actor authorized to perform an action.
+
+        Searches backwards from the action once, and decides each actor it
+        reaches the same way as `action_is_authorized`. Actors are yielded a
+        level of the search at a time, so besides the ids of the vertices
+        seen, only one level is held in memory, e.g. every member of a large
+        group that grants the action.
+
+        Raises ValueError if the action does not exist.
+        """
+        if self._lazy_action(action) is not None:
+            return iter(())
+        if not self.backend.vertex_exists(action):
+            raise ValueError(f"Vertex does not exist: {action}")
+        search = search_to if self.group_closure is None else self.group_closure.search_to
+        return (
+            self.backend.vertex_factory(reached.vertex.id)
+            for reached in search(self.backend, action)
+            if reached.vertex.vtype == "actor" and decide(reached.final_edge_types, self.tie_breaker_policy)
+        )
+
+    def authorized_actions(
+        self,
+        actor: Actor,
+        resource_type: ResourceType | None = None,
+        resource: Resource | None = None,
+        page_size: int = 1000,
+    ) -> Iterator[list[Action]]:
+        """Yield pages of the actions an actor is authorized to perform.
+
+        Searches from the actor once, through groups and action propagation,
+        and decides every action it reaches the same way as
+        `action_is_authorized`. Actions are yielded nearest first.
+
+        Args:
+            actor: The actor to find actions for
+            resource_type: If given, only return actions on resources of this type
+            resource: If given, only return actions on this resource
+            page_size: The maximum number of actions in each page
+
+        Raises ValueError if the actor does not exist, or page_size is less than 1.
+        """
+        if not self.backend.vertex_exists(actor):
+            raise ValueError(f"Vertex does not exist: {actor}")
+        if page_size < 1:
+            raise ValueError(f"page_size must be at least 1, got {page_size}")
+        # Action ids start with the ids of their resource type and resource
+        prefixes = ["action:"]
+        if resource_type is not None:
+            prefixes.append(f"action:{resource_type.name}:")
+        if resource is not None:
+            prefixes.append(f"action:{resource.resource_type}:{resource.name}:")
+        return self._authorized_action_pages(actor, prefixes, page_size)
+
+    def _authorized_action_pages(self, actor: Actor, prefixes: list[str], page_size: int) -> Iterator[list[Action]]:
+        """Yield pages of the authorized actions whose ids start with every prefix."""
+        page = []
+        for reached in search_from(self.backend, actor).values():
+            vertex_id = reached.vertex.id
+            if all(vertex_id.startswith(prefix) for prefix in prefixes) and decide(
+                reached.final_edge_types, self.tie_breaker_policy
+            ):
+                page.append(Action.from_id(vertex_id))
+                if len(page) == page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    def _resolve_handle(self, vertex: Vertex | VertexHandle) -> Vertex | VertexRef:
+        """Return a VertexRef for a handle, or the vertex itself if it isn't a handle."""
+        if isinstance(vertex, int):
+            return self.backend.get_vertex_ref(vertex)
+        return vertex
+
+    def compile(self, actors: Iterable[Actor] | None = None) -> CompiledPermissionGraph:
+        """Precompute the authorization decisions of actors.
+
+        Searches once from each actor and records its decision for every
+        action in the graph. Checks against the returned graph give the same
+        answer as `action_is_authorized` on this graph at the time it was
+        compiled, but do not traverse the graph.
+
+        Args:
+            actors: The actors to compile decisions for (default all actors)
+        """
+        if actors is None:
+            actors = self.backend.get_vertices("actor")
+        action_index = {action.id: i for i, action in enumerate(self.backend.get_vertices("action"))}
+        allowed = {}
+        for actor in actors:
+            bits = bytearray((len(action_index) + 7) // 8)
+            for vertex_id, reached in search_from(self.backend, actor).items():
+                if vertex_id in action_index and decide(reached.final_edge_types, self.tie_breaker_policy):
+                    i = action_index[vertex_id]
+                    bits[i // 8] |= 1 << (i % 8)
+            allowed[actor.id] = bits
+        return CompiledPermissionGraph(action_index=action_index, allowed=allowed)
+
+    def update_resource_type_actions(
+        self,
+        resource_type_name: str,
+        new_actions: list[str],
+        batch_size: int = 100_000,
+        progress: Callable[[int, int], None] | None = None,
+    ):
         """Update the set of actions supported by ResourceType.
 
         This method updates the ResourceType definition, and updates all existing
-        resources of this resource type.
+        resources of this resource type. Resources are updated in batches, and
+        the actions of each batch are added with one call to the backend and
+        removed with another.
 
         Args:
             resource_type_name: The name of the resource type to update
-            new_actions: A full list of actions supported by this resource type
+            new_actions: A full list of actions supported by this resource
+                type. Repeated actions are only added once.
+            batch_size: The number of resources to update at once
+            progress: If given, called after each batch with the number of
+                resources updated so far and the total number of resources
         """
         resource_type = self.backend.vertex_factory(f"resource_type:{resource_type_name}")
-        self.backend.update_vertex_attributes(resource_type=resource_type, actions=new_actions)
-        old_action_set = set(resource_type.actions)
-        new_action_set = set(new_actions)
-        actions_to_add = new_action_set.difference(old_action_set)
-        actions_to_remove = old_action_set.difference(new_action_set)
+        new_actions = list(dict.fromkeys(new_actions))
+        actions_to_add = [action for action in new_actions if action not in resource_type.actions]
+        actions_to_remove = [action for action in resource_type.actions if action not in new_actions]
+        if self.lazy_actions:
+            # Only actions with permission edges exist
+            actions_to_add = []
         resources = self.backend.get_vertices_to(resource_type)
-        for resource in resources:
-            # Add actions_to_add
-            for action_name in actions_to_add:
-                action = Action(name=action_name, resource_type=resource_type_name, resource=resource.name)
-                self.backend.add_vertex(action)
-                self.backend.add_edge(EdgeType.MEMBER_OF, action, resource)
+        for start in range(0, len(resources), batch_size):
+            batch = [Resource.from_id(ref.id) for ref in resources[start : start + batch_size]]
+            added = [
+                (Action(name=action_name, resource_type=resource_type_name, resource=resource.name), resource)
+                for resource in batch
+                for action_name in actions_to_add
+            ]
+            self.backend.add_vertices([action for action, _ in added])
+            self.backend.add_edges([(EdgeType.MEMBER_OF, action, resource) for action, resource in added])
 
-            # Remove actions_to_remove
-            for action_name in actions_to_remove:
-                action = Action(
-                    name=action_name,
-                    resource_type=resource_type_name,
-                    resource=resource.name,
-                )
-                self.backend.remove_vertex(action)
+            removed = [
+                Action(name=action_name, resource_type=resource_type_name, resource=resource.name)
+                for resource in batch
+                for action_name in actions_to_remove
+            ]
+            if self.lazy_actions:
+                removed = [action for action in removed if self.backend.vertex_exists(action)]
+            self._remove_actions(removed)
+            if progress is not None:
+                progress(start + len(batch), len(resources))
+        # Only once every resource has the new actions
+        self.backend.update_vertex_attributes(resource_type, actions=new_actions)
+        self._record("update_resource_type_actions", resource_type_name, new_actions)
@@ -0,0 +1,128 @@
+"""Backend independent searches of the permission graph.
+
+`action_is_authorized` decides a check from the last edge of every shortest
+path between an actor and an action. Only the type of those final edges
+matters, so these searches track the set of final edge types for each
+vertex they reach instead of enumerating every path.
+"""
+from dataclasses import dataclass
+from typing import Collection, Iterable, Iterator
+
+from permission_graph.backends.base import PermissionGraphBackend
+from permission_graph.structs import EdgeType, TieBreakerPolicy, Vertex
+
+# The types of the vertices on paths from actors to actions. Resources and
+# resource types have no paths to actions.
+ACTION_PATH_VTYPES = frozenset(["actor", "group", "action"])
+
+
+@dataclass
+class ReachedVertex:
+    """A vertex reached by a breadth first search.
+
+    Attributes:
+        vertex: The vertex that was reached
+        depth: The length of the shortest paths from the source to the vertex
+        final_edge_types: The types of the last edge of the shortest paths to
+            the vertex
+    """
+
+    vertex: Vertex
+    depth: int
+    final_edge_types: set[EdgeType]
+
+
+def search_from(
+    backend: PermissionGraphBackend,
+    source: Vertex,
+    targets: Iterable[str] | None = None,
+    expand: Collection[str] | None = None,
+) -> dict[str, ReachedVertex]:
+    """Search breadth first from source to every vertex it can reach.
+
+    Args:
+        backend: The backend to search
+        source: The vertex to search from
+        targets: If given, the ids of the vertices being searched for. The
+            search stops once every target has been reached and every vertex
+            at the depth of the last target has been found.
+        expand: If given, the vertex types to search onwards from. Vertices
+            of other types are reached but not searched from, e.g.
+            `ACTION_PATH_VTYPES` to find only actions.
+
+    Returns:
+        A dict mapping the id of every vertex reached from source (excluding
+        source itself) to a `ReachedVertex`.
+    """
+    remaining = None if targets is None else set(targets)
+    reached = {source.id: ReachedVertex(vertex=source, depth=0, final_edge_types=set())}
+    frontier = [source]
+    depth = 0
+    while frontier and remaining != set():
+        depth += 1
+        next_frontier = []
+        for vertex in frontier:
+            for target, etype in backend.get_edges_from(vertex):
+                if (r := reached.get(target.id)) is None:
+                    reached[target.id] = ReachedVertex(vertex=target, depth=depth, final_edge_types={etype})
+                    if expand is None or target.vtype in expand:
+                        next_frontier.append(target)
+                    if remaining is not None:
+                        remaining.discard(target.id)
+                elif r.depth == depth:
+                    r.final_edge_types.add(etype)
+        frontier = next_frontier
+    del reached[source.id]
+    return reached
+
+
+def search_to(backend: PermissionGraphBackend, target: Vertex) -> Iterator[ReachedVertex]:
+    """Search breadth first backwards from target to every vertex that can reach it.
+
+    Vertices are yielded a level at a time, once the search has found every
+    vertex at their depth, so that their final edge types are complete. Only
+    one level of the search is held in memory besides the vertices seen.
+
+    Args:
+        backend: The backend to search
+        target: The vertex to search towards
+
+    Yields:
+        A `ReachedVertex` for every vertex that can reach target (excluding
+        target itself), where depth is the length of the shortest paths from
+        the vertex to target and final_edge_types are the types of the last
+        edge of those paths.
+    """
+    depths = {target.id: 0}
+    frontier = [ReachedVertex(vertex=target, depth=0, final_edge_types=set())]
+    depth = 0
+    while frontier:
+        depth += 1
+        level: dict[str, ReachedVertex] = {}
+        for reached in frontier:
+            for source, etype in backend.get_edges_to(reached.vertex):
+                types = {etype} if depth == 1 else reached.final_edge_types
+                if (r := level.get(source.id)) is not None:
+                    r.final_edge_types |= types
+                elif source.id not in depths:
+                    depths[source.id] = depth
+                    level[source.id] = ReachedVertex(vertex=source, depth=depth, final_edge_types=set(types))
+        frontier = list(level.values())
+        yield from frontier
+
+
+def decide(final_edge_types: set[EdgeType], tie_breaker_policy: TieBreakerPolicy) -> bool:
+    """Decide an authorization check from the final edge types of its shortest paths.
+
+    Args:
+        final_edge_types: The types of the last edge of each shortest path from
+            actor to action. Empty if there is no path.
+        tie_breaker_policy: The policy used when the shortest paths disagree
+    """
+    if not final_edge_types:
+        return False
+    match tie_breaker_policy:
+        case TieBreakerPolicy.ANY_ALLOW:
+            return EdgeType.ALLOW in final_edge_types
+        case TieBreakerPolicy.ALL_ALLOW:
+            return final_edge_types == {EdgeType.ALLOW}
@@ -0,0 +1,188 @@
+"""A compact binary file format for saving and loading permission graphs.
+
+A snapshot file contains, after a fixed size header:
+
+1. The vertex ids, utf-8 encoded and separated by null bytes
+2. The vtype of each vertex, one byte per vertex
+3. CSR offsets: for each vertex, the index of its first outgoing edge (int64),
+    followed by the number of edges
+4. The target vertex index of each edge (int64), ordered by source. The
+    source of each edge is given by the offsets.
+5. The etype of each edge, one byte per edge
+6. Any other vertex attributes (e.g. the actions of resource types), as JSON
+
+Sections are padded to a multiple of 8 bytes, so that the arrays can be read
+straight out of a memory mapped file.
+"""
+import json
+import mmap
+import struct
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Self
+
+MAGIC = b"PGRAPH\x00\x00"
+VERSION = 2
+HEADER = struct.Struct("<8sIIQQQQ")
+
+# Codes used to store vtypes and etypes, by position. Only append to these.
+VTYPES = ("actor", "group", "resource_type", "resource", "action")
+ETYPES = ("ALLOW", "DENY", "MEMBER_OF")
+
+
+@dataclass
+class Snapshot:
+    """The contents of a snapshot file.
+
+    Attributes:
+        vertex_ids: The id of each vertex
+        vtypes: The vtype of each vertex
+        offsets: The CSR offsets of each vertex's outgoing edges in
+            `targets`. When read from a file, this is an int64 memoryview.
+        targets: The target vertex index of each edge, ordered by source.
+            When read from a file, this is an int64 memoryview.
+        etypes: The etype of each edge
+        attributes: Maps attribute names to a dict of vertex index to value,
+            for vertices with other attributes set
+    """
+
+    vertex_ids: list[str]
+    vtypes: list[str]
+    offsets: Any
+    targets: Any
+    etypes: list[str]
+    attributes: dict[str, dict[int, Any]] = field(default_factory=dict)
+    _mmap: mmap.mmap | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_adjacency(
+        cls,
+        vertex_ids: list[str],
+        vtypes: list[str],
+        adjacency: list[list[tuple[int, str]]],
+        attributes: dict[str, dict[int, Any]] | None = None,
+    ) -> Self:
+        """Create a snapshot from per vertex lists of outgoing (target index, etype) edges."""
+        offsets = [0]
+        targets = []
+        etypes = []
+        for edges in adjacency:
+            for target, etype in edges:
+                targets.append(target)
+                etypes.append(etype)
+            offsets.append(len(etypes))
+        return cls(
+            vertex_ids=vertex_ids,
+            vtypes=vtypes,
+            offsets=offsets,
+            targets=targets,
+            etypes=etypes,
+            attributes=attributes or {},
+        )
+
+    def edge_pairs(self) -> list[tuple[int, int]]:
+        """Return the edges as a list of (source, target) tuples, taking each source from the offsets."""
+        offsets = self.offsets.tolist() if isinstance(self.offsets, memoryview) else self.offsets
+        targets = self.targets.tolist() if isinstance(self.targets, memoryview) else self.targets
+        sources = [source for source in range(len(offsets) - 1) for _ in range(offsets[source + 1] - offsets[source])]
+        return list(zip(sources, targets))
+
+    def close(self) -> None:
+        """Release the memory mapped file backing this snapshot, if any."""
+        if self._mmap is not None:
+            for view in (self.offsets, self.targets):
+                view.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def write_snapshot(path: str | Path, snapshot: Snapshot) -> None:
+    """Write a snapshot to a file.
+
+    Raises ValueError if a vertex id contains a null byte.
+    """
+    if any("\x00" in vertex_id for vertex_id in snapshot.vertex_ids):
+        raise ValueError("Vertex ids may not contain null bytes")
+    vtype_codes = {vtype: code for code, vtype in enumerate(VTYPES)}
+    etype_codes = {etype: code for code, etype in enumerate(ETYPES)}
+    names = "\x00".join(snapshot.vertex_ids).encode()
+    attributes = json.dumps(snapshot.attributes).encode()
+    sections = [
+        names,
+        bytes(vtype_codes[vtype] for vtype in snapshot.vtypes),
+        array("q", snapshot.offsets).tobytes(),
+        array("q", snapshot.targets).tobytes(),
+        bytes(etype_codes[etype] for etype in snapshot.etypes),
+        attributes,
+    ]
+    with open(path, "wb") as f:
+        f.write(
+            HEADER.pack(MAGIC, VERSION, 0, len(snapshot.vertex_ids), len(snapshot.etypes), len(names), len(attributes))
+        )
+        for section in sections:
+            f.write(section)
+            f.write(b"\x00" * _padding(len(section)))
+
+
+def read_snapshot(path: str | Path) -> Snapshot:
+    """Read a snapshot from a file.
+
+    The file is memory mapped, and the offsets and targets of the returned
+    snapshot are views of it. Call `Snapshot.close` (or use the snapshot as a
+    context manager) once they are no longer needed.
+
+    Raises ValueError if the file is not a snapshot.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < HEADER.size:
+        mm.close()
+        raise ValueError(f"Not a permission graph snapshot: {path}")
+    magic, version, _, n_vertices, n_edges, names_size, attributes_size = HEADER.unpack_from(mm)
+    if magic != MAGIC or version != VERSION:
+        mm.close()
+        raise ValueError(f"Not a permission graph snapshot (version {VERSION}): {path}")
+
+    buffer = memoryview(mm)
+    position = HEADER.size
+
+    def section(size: int) -> memoryview:
+        nonlocal position
+        view = buffer[position : position + size]
+        position += size + _padding(size)
+        return view
+
+    with buffer:
+        names = section(names_size)
+        vtypes = section(n_vertices)
+        offsets = section(8 * (n_vertices + 1)).cast("q")
+        targets = section(8 * n_edges).cast("q")
+        etypes = section(n_edges)
+        attributes = section(attributes_size)
+        snapshot = Snapshot(
+            vertex_ids=str(names, "utf-8").split("\x00") if n_vertices else [],
+            vtypes=[VTYPES[code] for code in vtypes],
+            offsets=offsets,
+            targets=targets,
+            etypes=[ETYPES[code] for code in etypes],
+            attributes={
+                name: {int(index): value for index, value in values.items()}
+                for name, values in json.loads(str(attributes, "utf-8")).items()
+            },
+            _mmap=mm,
+        )
+        for view in (names, vtypes, etypes, attributes):
+            view.release()
+    return snapshot
+
+
+def _padding(size: int) -> int:
+    """Return the number of bytes needed to pad size to a multiple of 8."""
+    return -size % 8
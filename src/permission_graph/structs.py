@@ -1,7 +1,7 @@
 import uuid
 from dataclasses import dataclass
 from enum import Enum
-from typing import Self
+from typing import NewType, Self
 
 from pydantic import BaseModel, Field
 
@@ -103,6 +103,53 @@ class Action(Vertex):
         return cls(vtype=vtype, resource_type=resource_type, resource=resource, name=name)
 
 
+VERTEX_TYPES: dict[str, type[Vertex]] = {
+    "actor": Actor,
+    "group": Group,
+    "resource_type": ResourceType,
+    "resource": Resource,
+    "action": Action,
+}
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class VertexRef:
+    """A lightweight reference to a vertex in the permission graph.
+
+    Backends return VertexRefs from traversals (`shortest_paths`,
+    `get_vertices_to`, ...) since building a pydantic model for every vertex
+    visited would dominate their cost. A VertexRef is hashable, and equal to
+    any Vertex or VertexRef with the same id. It can be passed to any backend
+    method in place of a Vertex; use `PermissionGraphBackend.vertex_factory`
+    to get the full Vertex.
+
+    Attributes:
+        id: The id of the vertex
+        vtype: The type of the vertex
+    """
+
+    id: str
+    vtype: str
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (VertexRef, Vertex)):
+            return self.id == other.id
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+
+VertexHandle = NewType("VertexHandle", int)
+"""A backend assigned integer identifying a vertex.
+
+Handles are stable for the lifetime of a backend: unlike backend internal
+indices, they don't change when other vertices are removed. They are not
+saved in snapshots. Backends accept a handle wherever they accept a Vertex,
+which skips looking the vertex up by id.
+"""
+
+
 class EdgeType(Enum):
     """Type for edges.
 
@@ -0,0 +1,288 @@
+"""Authorization in worker processes, to use more than one core.
+
+A `WorkerPool` starts worker processes that each hold a read-only copy of a
+`PermissionGraph`. With the "fork" start method the workers inherit the
+parent's graph, unless its backend isn't fork safe (e.g. `SQLiteBackend`).
+Otherwise the graph is saved to a snapshot file that each worker memory maps.
+Checks are sent to the workers as vertex ids, and changes made by the parent
+are broadcast to every worker as numbered versions.
+"""
+import itertools
+import multiprocessing
+import os
+import tempfile
+import threading
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Iterable, Self
+
+from permission_graph.permission_graph import PermissionGraph
+from permission_graph.structs import Action, Actor, VertexRef
+
+# PermissionGraph methods that can be published to workers
+PUBLISHABLE = frozenset(
+    [
+        "add_actor",
+        "remove_actor",
+        "add_group",
+        "remove_group",
+        "add_resource_type",
+        "remove_resource_type",
+        "add_resource",
+        "remove_resource",
+        "allow",
+        "deny",
+        "revoke",
+        "add_actor_to_group",
+        "remove_actor_from_group",
+        "bulk_load",
+        "update_resource_type_actions",
+    ]
+)
+
+
+class _Worker:
+    """A worker process, and the parent's end of the pipe to it."""
+
+    def __init__(self, process: multiprocessing.Process, connection: Connection) -> None:
+        self.process = process
+        self.connection = connection
+        # Held while sending a request and receiving its response
+        self.lock = threading.Lock()
+
+
+class WorkerPool:
+    """Answer authorization checks in a pool of worker processes.
+
+    The pool's `graph` is owned by the parent process. Change it only through
+    `publish`, which applies the changes to the parent's graph and then sends
+    them to every worker. Each worker handles messages in the order they were
+    sent, so checks made after `publish` returns see the changes.
+
+    Methods may be called from several threads. Each worker answers one
+    request at a time, and `authorize_many` splits its checks between all of
+    the workers.
+
+    Use as a context manager, or call `close`, to stop the workers.
+    """
+
+    def __init__(self, graph: PermissionGraph, processes: int | None = None, start_method: str | None = None) -> None:
+        """Initialize a new WorkerPool, and start its workers.
+
+        Args:
+            graph: The graph to answer checks from. Decision caches, change
+                logs and decision samplers are not copied to the workers.
+            processes: The number of worker processes (default the number of CPUs)
+            start_method: The multiprocessing start method (default "fork"
+                where available, else "spawn"). Workers only inherit the
+                graph when forked from a graph whose backend is fork safe.
+        """
+        if start_method is None:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+        self.graph = graph
+        self.version = 0
+        self._next_worker = itertools.count()
+        self._publish_lock = threading.Lock()
+
+        snapshot = None
+        if start_method == "fork" and graph.backend.fork_safe:
+            source = graph
+        else:
+            fd, snapshot = tempfile.mkstemp(suffix=".pg")
+            os.close(fd)
+            graph.save(snapshot)
+            settings = {
+                "tie_breaker_policy": graph.tie_breaker_policy,
+                "lazy_actions": graph.lazy_actions,
+                "group_closure": graph.group_closure is not None,
+            }
+            source = (snapshot, settings)
+        try:
+            self._workers = []
+            for _ in range(processes or os.cpu_count() or 1):
+                parent, child = context.Pipe()
+                process = context.Process(target=_serve, args=(source, child), daemon=True)
+                process.start()
+                child.close()
+                self._workers.append(_Worker(process, parent))
+            # Wait until every worker has its graph, so the snapshot can be removed
+            for worker in self._workers:
+                worker.connection.recv()
+        finally:
+            if snapshot is not None:
+                Path(snapshot).unlink()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the workers."""
+        for worker in self._workers:
+            with worker.lock:
+                worker.connection.send(None)
+                worker.connection.close()
+        for worker in self._workers:
+            worker.process.join()
+        self._workers = []
+
+    def publish(self, changes: Iterable[tuple[str, tuple]]) -> int:
+        """Apply changes to the graph, and send them to every worker.
+
+        Args:
+            changes: (method name, args) pairs, each calling a method of
+                `PermissionGraph` that changes the graph, e.g.
+                `("allow", (actor, action))`
+
+        Returns:
+            The new version number of the graph.
+
+        Raises ValueError if a change isn't a publishable method, or fails. The
+        changes before it have been applied to the parent's graph, and are
+        published. Also raises ValueError if a worker fails to apply a change
+        that the parent applied, after which that worker's graph differs from
+        the parent's and the pool should be replaced. If both happen, the
+        parent's error is raised, caused by the worker's.
+        """
+        changes = list(changes)
+        with self._publish_lock:
+            applied = []
+            try:
+                for name, args in changes:
+                    if name not in PUBLISHABLE:
+                        raise ValueError(f"Can't publish {name}")
+                    _apply(self.graph, name, args)
+                    applied.append((name, args))
+            except Exception as e:
+                # Publish the changes before it, then raise the change's own error
+                try:
+                    self._publish_applied(applied)
+                except ValueError as worker_error:
+                    raise e from worker_error
+                raise
+            self._publish_applied(applied)
+            return self.version
+
+    def _publish_applied(self, applied: list[tuple[str, Any]]) -> None:
+        """Send changes applied to the parent's graph to every worker as a new version, if there are any."""
+        if applied:
+            self.version += 1
+            self._broadcast(("publish", (self.version, applied)))
+
+    def _broadcast(self, message: tuple[str, Any]) -> None:
+        """Send a message to every worker, and wait for each to respond.
+
+        Raises the first error returned by a worker, as a ValueError.
+        """
+        # Lock workers in a fixed order, so concurrent calls can't deadlock
+        for worker in self._workers:
+            worker.lock.acquire()
+        try:
+            for worker in self._workers:
+                worker.connection.send(message)
+            responses = [worker.connection.recv() for worker in self._workers]
+        finally:
+            for worker in self._workers:
+                worker.lock.release()
+        for version, error in responses:
+            if error is not None:
+                raise ValueError(f"A worker failed to apply version {version}: {error!r}") from error
+
+    def action_is_authorized(self, actor: Actor, action: Action) -> bool:
+        """Authorize actor to perform action on resource, in one of the workers.
+
+        Raises ValueError if the actor or action does not exist.
+        """
+        worker = self._workers[next(self._next_worker) % len(self._workers)]
+        with worker.lock:
+            worker.connection.send(("authorize", [(actor.id, action.id)]))
+            return _result(worker.connection.recv())[0]
+
+    def authorize_many(self, checks: Iterable[tuple[Actor, Action]]) -> list[bool]:
+        """Authorize many (actor, action) pairs, split between the workers.
+
+        Returns:
+            A list of decisions, in the same order as `checks`.
+
+        Raises ValueError if any actor or action does not exist.
+        """
+        checks = [(actor.id, action.id) for actor, action in checks]
+        n_chunks = min(len(self._workers), len(checks))
+        size = -(-len(checks) // n_chunks) if checks else 0
+        chunks = [checks[i * size : (i + 1) * size] for i in range(n_chunks)]
+        workers = self._workers[:n_chunks]
+        # Lock workers in a fixed order, so concurrent calls can't deadlock
+        for worker in workers:
+            worker.lock.acquire()
+        try:
+            for worker, chunk in zip(workers, chunks):
+                worker.connection.send(("authorize", chunk))
+            responses = [worker.connection.recv() for worker in workers]
+        finally:
+            for worker in workers:
+                worker.lock.release()
+        return [decision for response in responses for decision in _result(response)]
+
+
+def _result(response: tuple[int, Any]) -> Any:
+    """Return the result of a worker response, raising it if it is an exception."""
+    _, result = response
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def _apply(graph: PermissionGraph, name: str, args: Any) -> None:
+    """Call a publishable method of graph, with keyword arguments for bulk_load."""
+    if name == "bulk_load":
+        getattr(graph, name)(**args)
+    else:
+        getattr(graph, name)(*args)
+
+
+def _ref(vertex_id: str) -> VertexRef:
+    """Return a VertexRef from a vertex id."""
+    return VertexRef(id=vertex_id, vtype=vertex_id.split(":", 1)[0])
+
+
+def _serve(source: PermissionGraph | tuple[str, dict[str, Any]], connection: Connection) -> None:
+    """Answer requests from the parent process until it sends None.
+
+    Args:
+        source: The graph, or the path of a snapshot of it and the arguments
+            to `PermissionGraph.load` that give it the parent's settings
+        connection: The worker's end of the pipe to the parent
+    """
+    if isinstance(source, PermissionGraph):
+        graph = source
+    else:
+        path, settings = source
+        graph = PermissionGraph.load(path, **settings)
+    # Decisions cached in the parent process would never be invalidated here
+    graph.cache = None
+    # Published changes are already recorded, and checks explained, by the parent
+    graph.changelog = None
+    graph.sampler = None
+    version = 0
+    connection.send(version)
+    while (message := connection.recv()) is not None:
+        kind, payload = message
+        if kind == "publish":
+            version, changes = payload
+            error = None
+            for name, args in changes:
+                # Keep serving after a failed change, and report it to the parent
+                try:
+                    _apply(graph, name, args)
+                except Exception as e:
+                    error = error or e
+            connection.send((version, error))
+        elif kind == "authorize":
+            try:
+                result = graph.authorize_many([(_ref(actor), _ref(action)) for actor, action in payload])
+            except ValueError as e:
+                result = e
+            connection.send((version, result))
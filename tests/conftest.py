@@ -1,6 +1,18 @@
+import random
+
 import pytest
 
-from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+from permission_graph import PermissionGraph
+from permission_graph.backends.base import PermissionGraphBackend
+from permission_graph.changelog import ChangeLog
+from permission_graph.structs import (
+    Action,
+    Actor,
+    Group,
+    Resource,
+    ResourceType,
+    TieBreakerPolicy,
+)
 
 
 @pytest.fixture
@@ -26,3 +38,98 @@ def document():
 @pytest.fixture
 def view_document():
     return Action(name="ViewDocument", resource_type="Document", resource="My_Document.csv")
+
+
+@pytest.fixture
+def random_graph():
+    """Return a function that builds a random PermissionGraph.
+
+    The graph has actors in overlapping groups, conflicting ALLOW and DENY
+    edges from actors, groups and actions, and action propagation. With
+    nested_groups, groups are also members of other groups.
+    """
+
+    def build(
+        seed: int,
+        tie_breaker_policy: TieBreakerPolicy = TieBreakerPolicy.ANY_ALLOW,
+        lazy_actions: bool = False,
+        backend: PermissionGraphBackend | None = None,
+        changelog: ChangeLog | None = None,
+        nested_groups: bool = False,
+        group_closure: bool = False,
+    ) -> PermissionGraph:
+        rng = random.Random(seed)
+        graph = PermissionGraph(
+            backend=backend,
+            tie_breaker_policy=tie_breaker_policy,
+            lazy_actions=lazy_actions,
+            changelog=changelog,
+            group_closure=group_closure,
+        )
+        actors = [Actor(name=f"actor{i}") for i in range(8)]
+        groups = [Group(name=f"group{i}") for i in range(4)]
+        for actor in actors:
+            graph.add_actor(actor)
+        for group in groups:
+            graph.add_group(group)
+        for actor in actors:
+            for group in rng.sample(groups, rng.randint(0, 2)):
+                graph.add_actor_to_group(actor, group)
+        if nested_groups:
+            # Groups only join groups before them, so there are no cycles
+            for i, group in enumerate(groups[1:], 1):
+                for parent in rng.sample(groups[:i], min(i, rng.randint(0, 2))):
+                    graph.add_actor_to_group(group, parent)
+
+        actions = []
+        for resource_type in [
+            ResourceType(name="Document", actions=["View", "Edit"]),
+            ResourceType(name="Folder", actions=["View"]),
+        ]:
+            graph.add_resource_type(resource_type)
+            for i in range(3):
+                resource = Resource(name=f"{resource_type.name.lower()}{i}", resource_type=resource_type.name)
+                graph.add_resource(resource)
+                actions.extend(
+                    Action(name=name, resource_type=resource_type.name, resource=resource.name)
+                    for name in resource_type.actions
+                )
+
+        sources = actors + groups + actions
+        for _ in range(40):
+            source, target = rng.choice(sources), rng.choice(actions)
+            if source != target and not graph.backend.edge_exists(source, target):
+                if rng.random() < 0.7:
+                    graph.allow(source, target)
+                else:
+                    graph.deny(source, target)
+        return graph
+
+    return build
+
+
+@pytest.fixture
+def diamond_graph(alice, document_type, document, view_document):
+    """Return a function that builds a graph with 2 ** levels shortest paths from alice to view_document.
+
+    Alice is in both groups of the first level, each group is in both groups
+    of the next level, and the two groups of the last level allow and deny
+    view_document.
+    """
+
+    def build(levels: int, tie_breaker_policy: TieBreakerPolicy = TieBreakerPolicy.ANY_ALLOW) -> PermissionGraph:
+        graph = PermissionGraph(tie_breaker_policy=tie_breaker_policy)
+        groups = [[Group(name=f"group{i}_{j}") for j in range(2)] for i in range(levels)]
+        graph.bulk_load(
+            actors=[alice],
+            groups=[group for level in groups for group in level],
+            resource_types=[document_type],
+            resources=[document],
+            memberships=[(alice, group) for group in groups[0]]
+            + [(child, parent) for below, above in zip(groups, groups[1:]) for child in below for parent in above],
+            allows=[(groups[-1][0], view_document)],
+            denies=[(groups[-1][1], view_document)],
+        )
+        return graph
+
+    return build
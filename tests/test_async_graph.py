@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.async_graph import AsyncPermissionGraph
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.changelog import ChangeLog
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+
+class CountingGraph(PermissionGraph):
+    """A PermissionGraph that records the checks passed to each authorize_many call."""
+
+    calls: list[list] = []
+
+    def authorize_many(self, checks):
+        checks = list(checks)
+        type(self).calls.append(checks)
+        return super().authorize_many(checks)
+
+
+class AsyncBackend(IGraphMemoryBackend):
+    """An igraph backend that claims to search natively async."""
+
+    supports_async = True
+    searches = 0
+
+    async def search_between_async(self, source, target):
+        type(self).searches += 1
+        await asyncio.sleep(0)
+        return self.search_between(source, target)
+
+
+def build_graph(graph: PermissionGraph) -> tuple[list[Actor], list[Action]]:
+    graph.add_resource_type(ResourceType(name="Document", actions=["View", "Edit"]))
+    graph.add_resource(Resource(name="doc", resource_type="Document"))
+    view = Action(name="View", resource_type="Document", resource="doc")
+    edit = Action(name="Edit", resource_type="Document", resource="doc")
+    admins = Group(name="Admins")
+    graph.add_group(admins)
+    actors = [Actor(name=f"actor{i}") for i in range(10)]
+    for i, actor in enumerate(actors):
+        graph.add_actor(actor)
+        if i % 2 == 0:
+            graph.add_actor_to_group(actor, admins)
+    graph.allow(admins, view)
+    graph.deny(actors[0], view)
+    graph.allow(actors[1], edit)
+    return actors, [view, edit]
+
+
+@pytest.mark.integration
+def test_checks_are_batched_and_coalesced():
+    graph = CountingGraph()
+    actors, actions = build_graph(graph)
+    checks = [(actor, action) for actor in actors for action in actions]
+    expected = graph.authorize_many(checks)
+    CountingGraph.calls = []
+
+    async def main():
+        async with AsyncPermissionGraph(graph, max_batch_size=15) as async_graph:
+            # Every check twice; duplicates share a result
+            results = await asyncio.gather(*(async_graph.action_is_authorized(a, b) for a, b in checks + checks))
+            assert list(results) == expected + expected
+            assert await async_graph.authorize_many(checks[:3]) == expected[:3]
+
+    asyncio.run(main())
+    # The copy-on-write versions of the graph are CountingGraphs too
+    assert [len(call) for call in CountingGraph.calls] == [15, 5, 3]
+
+
+@pytest.mark.integration
+def test_failed_checks_do_not_fail_the_batch():
+    graph = PermissionGraph()
+    actors, actions = build_graph(graph)
+
+    async def main():
+        async with AsyncPermissionGraph(graph) as async_graph:
+            results = await asyncio.gather(
+                async_graph.action_is_authorized(actors[2], actions[0]),
+                async_graph.action_is_authorized(Actor(name="missing"), actions[0]),
+                return_exceptions=True,
+            )
+            assert results[0] is True
+            assert isinstance(results[1], ValueError)
+
+    asyncio.run(main())
+
+
+@pytest.mark.integration
+def test_writes_and_queries():
+    async def main():
+        async with AsyncPermissionGraph() as async_graph:
+            await async_graph.add_resource_type(ResourceType(name="Document", actions=["View"]))
+            await async_graph.add_resource(Resource(name="doc", resource_type="Document"))
+            view = Action(name="View", resource_type="Document", resource="doc")
+            alice, bob = Actor(name="Alice"), Actor(name="Bob")
+            await async_graph.bulk_load(actors=[alice, bob], allows=[(alice, view)])
+            assert await async_graph.action_is_authorized(alice, view)
+            assert not await async_graph.action_is_authorized(bob, view)
+            assert [actor async for actor in async_graph.actors_authorized_for(view, chunk_size=1)] == [alice]
+            assert [page async for page in async_graph.authorized_actions(alice)] == [[view]]
+            await async_graph.revoke(alice, view)
+            assert not await async_graph.action_is_authorized(alice, view)
+            assert async_graph.graph.version == 4
+
+    asyncio.run(main())
+
+
+@pytest.mark.integration
+def test_bulk_changes_and_explain():
+    primary = PermissionGraph(changelog=ChangeLog())
+    actors, actions = build_graph(primary)
+    share = Action(name="Share", resource_type="Document", resource="doc")
+
+    async def main():
+        async with AsyncPermissionGraph() as async_graph:
+            assert (
+                await async_graph.apply_changes(primary.changelog.entries(), batch_size=5) == primary.changelog.version
+            )
+            progress = []
+            await async_graph.update_resource_type_actions(
+                "Document", ["View", "Share"], progress=lambda done, total: progress.append((done, total))
+            )
+            assert progress == [(1, 1)]
+            assert not await async_graph.run(async_graph.graph.vertex_exists, actions[1])
+            await async_graph.allow(actors[3], share)
+            assert await async_graph.action_is_authorized(actors[3], share)
+
+            decision = await async_graph.explain(actors[0], actions[0])
+            assert decision.allowed is False
+            assert decision.allowed == primary.action_is_authorized(actors[0], actions[0])
+            assert [path[0] for path in decision.paths] == [actors[0]]
+            with pytest.raises(ValueError):
+                await async_graph.explain(actors[0], actions[0], max_paths=0)
+
+    asyncio.run(main())
+
+
+@pytest.mark.integration
+def test_native_async_backend():
+    graph = PermissionGraph(backend=AsyncBackend())
+    actors, actions = build_graph(graph)
+    checks = [(actor, action) for actor in actors for action in actions]
+    expected = graph.authorize_many(checks)
+
+    async def main():
+        async with AsyncPermissionGraph(graph, max_workers=1) as async_graph:
+            # A slow job occupies the only thread, and checks don't wait for it
+            slow_job = asyncio.ensure_future(async_graph.run(time.sleep, 0.2))
+            results = await asyncio.wait_for(async_graph.authorize_many(checks), timeout=0.1)
+            await slow_job
+            return results
+
+    assert asyncio.run(main()) == expected
+    assert AsyncBackend.searches == len(checks)
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("options", [{"lazy_actions": True}, {"group_closure": True}])
+def test_native_async_backend_decides_like_action_is_authorized(options):
+    graph = PermissionGraph(backend=AsyncBackend(), **options)
+    actors, actions = build_graph(graph)
+    # A group in a group, and a resource whose actions have no edges
+    graph.add_group(Group(name="Staff"))
+    graph.add_actor_to_group(Group(name="Admins"), Group(name="Staff"))
+    graph.allow(Group(name="Staff"), actions[1])
+    graph.add_resource(Resource(name="other", resource_type="Document"))
+    actions.append(Action(name="View", resource_type="Document", resource="other"))
+    checks = [(actor, action) for actor in actors for action in actions]
+    expected = [graph.action_is_authorized(actor, action) for actor, action in checks]
+
+    async def main():
+        async with AsyncPermissionGraph(graph) as async_graph:
+            return await async_graph.authorize_many(checks)
+
+    assert asyncio.run(main()) == expected
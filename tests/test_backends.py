@@ -1,7 +1,12 @@
+import random
+from functools import partial
+
 import pytest
 
 from permission_graph.backends.base import PermissionGraphBackend
 from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.backends.sqlite import SQLiteBackend
+from permission_graph.search import search_from
 from permission_graph.structs import (
     Action,
     Actor,
@@ -10,10 +15,18 @@ from permission_graph.structs import (
     Resource,
     ResourceType,
     Vertex,
+    VertexRef,
 )
 
 
-@pytest.fixture(params=[pytest.param(IGraphMemoryBackend, id="igraph")])
+@pytest.fixture(
+    params=[
+        pytest.param(IGraphMemoryBackend, id="igraph"),
+        # Never compacts, so that every test sees dead vertices and edges
+        pytest.param(partial(IGraphMemoryBackend, tombstones=True, compaction_threshold=1.0), id="igraph-tombstones"),
+        pytest.param(SQLiteBackend, id="sqlite"),
+    ]
+)
 def backend(request):
     return request.param()
 
@@ -124,9 +137,283 @@ def test_remove_vertex(backend: PermissionGraphBackend, base_vertices: tuple[Ver
     assert not backend.vertex_exists(base_vertices[0])
 
 
+def test_remove_vertices(
+    backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group, view_document: Action
+) -> None:
+    for remove_vertices in (
+        backend.remove_vertices,
+        lambda vertices: PermissionGraphBackend.remove_vertices(backend, vertices),
+    ):
+        with pytest.raises(ValueError):
+            remove_vertices([alice, Actor(name="Bob")])
+        with pytest.raises(ValueError):
+            remove_vertices([alice, alice])
+        assert backend.vertex_exists(alice)
+    handle = backend.get_handle(view_document)
+    backend.remove_vertices([alice, admins])
+    assert not backend.vertex_exists(alice)
+    assert not backend.vertex_exists(admins)
+    assert backend.get_vertices_to(view_document) == []
+    assert backend.get_vertex_ref(handle) == view_document
+    PermissionGraphBackend.remove_vertices(backend, [handle])
+    assert not backend.vertex_exists(view_document)
+
+
+def test_count_vertices_and_edges(backend: PermissionGraphBackend, base_edges: None, alice: Actor) -> None:
+    expected_vertices = PermissionGraphBackend.count_vertices(backend)
+    expected_edges = PermissionGraphBackend.count_edges(backend)
+    assert backend.count_vertices() == expected_vertices
+    assert backend.count_edges() == expected_edges
+    assert expected_edges[EdgeType.MEMBER_OF] > 0
+    # Removes an edge too
+    backend.remove_vertex(alice)
+    assert backend.count_vertices() == PermissionGraphBackend.count_vertices(backend)
+    assert backend.count_edges() == PermissionGraphBackend.count_edges(backend)
+    assert backend.count_vertices().get("actor", 0) == expected_vertices["actor"] - 1
+    assert backend.count_edges()[EdgeType.MEMBER_OF] == expected_edges[EdgeType.MEMBER_OF] - 1
+
+
 def test_update_vertex_attributes(backend: PermissionGraphBackend, base_vertices: tuple[Vertex]) -> None:
     backend.update_vertex_attributes(base_vertices[0], foo="bar")
     # new attribute causes ValueError in vertex factory
     with pytest.raises(TypeError) as e:
         assert backend.vertex_factory(base_vertices[0].id)
         assert e == "Vertex.from_id() got an unexpected keyword argument 'foo'"
+
+
+def test_shortest_paths_many(
+    backend: PermissionGraphBackend,
+    base_edges: None,
+    alice: Actor,
+    admins: Group,
+    document: Resource,
+    view_document: Action,
+) -> None:
+    assert backend.shortest_paths_many(alice, [view_document, document, view_document]) == [
+        [[alice, admins, view_document]],
+        [[alice, admins, view_document, document]],
+        [[alice, admins, view_document]],
+    ]
+    assert backend.shortest_paths_many(admins, [alice]) == [[]]
+
+
+def test_edge_lookup_after_vertex_removal(
+    backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group, view_document: Action
+) -> None:
+    # Removing a vertex renumbers the vertices and edges that remain
+    backend.remove_vertex(alice)
+    assert backend.get_edge_type(admins, view_document) == EdgeType.ALLOW
+    backend.remove_edge(admins, view_document)
+    assert not backend.edge_exists(admins, view_document)
+    with pytest.raises(ValueError):
+        backend.remove_edge(admins, view_document)
+
+
+def test_get_vertices_to_and_from_resource_type(
+    backend: PermissionGraphBackend, base_edges: None, document_type: ResourceType, document: Resource
+) -> None:
+    assert backend.get_vertices_from(document) == [document_type]
+    assert backend.get_vertices_to(document_type) == [document]
+    assert backend.get_vertices_from(document_type) == []
+
+
+def test_get_vertices(backend: PermissionGraphBackend, base_vertices: tuple[Vertex], alice: Actor) -> None:
+    assert backend.get_vertices() == list(base_vertices)
+    assert backend.get_vertices("actor") == [alice]
+
+
+def test_get_edges_from(
+    backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group, view_document: Action
+) -> None:
+    backend.add_edge(EdgeType.DENY, alice, view_document)
+    assert backend.get_edges_from(alice) == [(admins, EdgeType.MEMBER_OF), (view_document, EdgeType.DENY)]
+    assert backend.get_edges_from(view_document) == [
+        (v, EdgeType.MEMBER_OF) for v in backend.get_vertices_from(view_document)
+    ]
+
+
+def test_get_edges_to(
+    backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group, view_document: Action
+) -> None:
+    assert backend.get_edges_to(view_document) == [(admins, EdgeType.ALLOW)]
+    assert backend.get_edges_to(admins) == [(alice, EdgeType.MEMBER_OF)]
+    assert backend.get_edges_to(alice) == []
+
+
+def test_add_vertices(
+    backend: PermissionGraphBackend, alice: Actor, admins: Group, document_type: ResourceType, document: Resource
+) -> None:
+    backend.add_vertices([alice, admins, document_type], actions=[None, None, document_type.actions])
+    assert backend.get_vertices() == [alice, admins, document_type]
+    with pytest.raises(ValueError):
+        backend.add_vertices([document, alice])
+    with pytest.raises(ValueError):
+        backend.add_vertices([document, document])
+    assert not backend.vertex_exists(document)
+
+
+def test_add_edges(
+    backend: PermissionGraphBackend, base_vertices: tuple[Vertex], alice: Actor, admins: Group, view_document: Action
+) -> None:
+    backend.add_edges([(EdgeType.MEMBER_OF, alice, admins), (EdgeType.ALLOW, admins, view_document)])
+    assert backend.get_edge_type(alice, admins) == EdgeType.MEMBER_OF
+    assert backend.get_edge_type(admins, view_document) == EdgeType.ALLOW
+    with pytest.raises(ValueError):
+        backend.add_edges([(EdgeType.DENY, alice, view_document), (EdgeType.MEMBER_OF, alice, admins)])
+    with pytest.raises(ValueError):
+        backend.add_edges([(EdgeType.DENY, alice, view_document), (EdgeType.ALLOW, alice, view_document)])
+    with pytest.raises(ValueError):
+        backend.add_edges([(EdgeType.DENY, alice, Actor(name="Bob"))])
+    assert not backend.edge_exists(alice, view_document)
+
+
+def test_save_and_load(backend: PermissionGraphBackend, base_edges: None, tmp_path) -> None:
+    backend.save(tmp_path / "graph.pg")
+    loaded = type(backend).load(tmp_path / "graph.pg")
+    assert loaded.get_vertices() == backend.get_vertices()
+    for vertex in backend.get_vertices():
+        assert loaded.get_edges_from(vertex) == backend.get_edges_from(vertex)
+
+
+def test_default_save_and_load(backend: PermissionGraphBackend, base_edges: None, tmp_path) -> None:
+    PermissionGraphBackend.save(backend, tmp_path / "graph.pg")
+    loaded = PermissionGraphBackend.load.__func__(type(backend), tmp_path / "graph.pg")
+    assert loaded.get_vertices() == backend.get_vertices()
+    for vertex in backend.get_vertices():
+        assert loaded.get_edges_from(vertex) == backend.get_edges_from(vertex)
+
+
+def test_traversals_return_vertex_refs(
+    backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group, view_document: Action
+) -> None:
+    (path,) = backend.shortest_paths(alice, view_document)
+    assert [type(v) for v in path] == [VertexRef] * 3
+    assert path[1] == admins and path[1].vtype == "group"
+    assert backend.get_edge_type(path[1], path[2]) == EdgeType.ALLOW
+    assert backend.vertex_factory(path[2].id) == view_document
+
+
+def test_handles(
+    backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group, view_document: Action
+) -> None:
+    handles = {vertex.id: backend.get_handle(vertex) for vertex in backend.get_vertices()}
+    assert len(set(handles.values())) == len(handles)
+    assert backend.get_vertex_ref(handles[admins.id]) == VertexRef(id=admins.id, vtype="group")
+    assert backend.get_edge_type(handles[admins.id], handles[view_document.id]) == EdgeType.ALLOW
+    assert backend.shortest_paths(handles[alice.id], handles[view_document.id]) == [[alice, admins, view_document]]
+
+
+def test_handles_are_stable(
+    backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group, view_document: Action
+) -> None:
+    handles = {vertex.id: backend.get_handle(vertex) for vertex in backend.get_vertices()}
+    # Removing a vertex renumbers the vertices that remain, but not their handles
+    backend.remove_vertex(alice)
+    assert not backend.vertex_exists(handles[alice.id])
+    with pytest.raises(ValueError):
+        backend.get_handle(alice)
+    with pytest.raises(ValueError):
+        backend.get_vertex_ref(handles[alice.id])
+    for vertex in backend.get_vertices():
+        assert backend.get_handle(vertex) == handles[vertex.id]
+        assert backend.get_vertex_ref(handles[vertex.id]) == vertex
+    assert backend.edge_exists(handles[admins.id], handles[view_document.id])
+
+    # Handles are never reused
+    backend.add_vertex(alice)
+    assert backend.get_handle(alice) not in handles.values()
+    backend.add_edge(EdgeType.MEMBER_OF, backend.get_handle(alice), handles[admins.id])
+    assert backend.shortest_paths(alice, view_document) == [[alice, admins, view_document]]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_search_between(backend: PermissionGraphBackend, random_graph, seed: int, tmp_path) -> None:
+    random_graph(seed).save(tmp_path / "graph.pg")
+    backend = type(backend).load(tmp_path / "graph.pg")
+    for actor in backend.get_vertices("actor"):
+        reached = search_from(backend, actor)
+        for action in backend.get_vertices("action"):
+            expected = (
+                None if action.id not in reached else (reached[action.id].depth, reached[action.id].final_edge_types)
+            )
+            assert backend.search_between(actor, action) == expected
+            assert PermissionGraphBackend.search_between(backend, actor, action) == expected
+
+
+def test_copy(backend: PermissionGraphBackend, base_edges: None, alice: Actor, admins: Group) -> None:
+    for copy in (backend.copy(), PermissionGraphBackend.copy(backend)):
+        assert copy.get_vertices() == backend.get_vertices()
+        for vertex in backend.get_vertices():
+            assert copy.get_edges_from(vertex) == backend.get_edges_from(vertex)
+        copy.remove_edge(alice, admins)
+        assert backend.edge_exists(alice, admins)
+    copy = backend.copy()
+    backend.remove_vertex(alice)
+    assert copy.vertex_exists(alice)
+    assert copy.get_handle(admins) == backend.get_handle(admins)
+
+
+def test_tombstone_compaction(alice: Actor, admins: Group, view_document: Action) -> None:
+    backend = IGraphMemoryBackend(tombstones=True, compaction_threshold=0.5)
+    backend.add_vertices([alice, admins, view_document])
+    backend.add_edges([(EdgeType.MEMBER_OF, alice, admins), (EdgeType.ALLOW, admins, view_document)])
+    handle = backend.get_handle(view_document)
+
+    backend.remove_edge(alice, admins)
+    assert backend.tombstone_ratio == 1 / 5
+    # Adding the edge back reuses the dead one
+    backend.add_edge(EdgeType.DENY, alice, admins)
+    assert backend.tombstone_ratio == 0
+    assert backend.get_edge_type(alice, admins) == EdgeType.DENY
+
+    backend.remove_vertex(alice)
+    assert backend.tombstone_ratio == 2 / 5
+    assert backend.get_vertices() == [admins, view_document]
+    assert backend.get_vertices_to(admins) == []
+    backend.add_vertex(alice)
+    assert backend.get_vertices_to(admins) == []
+    assert backend.shortest_paths(alice, view_document) == []
+    backend.add_edges([(EdgeType.MEMBER_OF, alice, admins)])
+    assert backend.shortest_paths(alice, view_document) == [[alice, admins, view_document]]
+    assert backend.tombstone_ratio == 2 / 7
+
+    # Passing the threshold compacts the graph, without changing handles
+    backend.remove_vertex(alice)
+    assert backend.tombstone_ratio == 0
+    assert backend.get_vertices() == [admins, view_document]
+    assert backend.get_vertex_ref(handle) == view_document
+    assert backend.get_edges_to(view_document) == [(admins, EdgeType.ALLOW)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_tombstones_match_deletes(random_graph, seed: int) -> None:
+    rng = random.Random(seed)
+    expected = random_graph(seed)
+    backend = IGraphMemoryBackend(tombstones=True, compaction_threshold=0.1)
+    graph = random_graph(seed, backend=backend)
+    compacted = False
+    for _ in range(20):
+        sources = expected.backend.get_vertices("actor") + expected.backend.get_vertices("group")
+        source = rng.choice(sources)
+        targets = [target for target in expected.backend.get_vertices_from(source) if target.vtype == "action"]
+        if targets and rng.random() < 0.8:
+            target = rng.choice(targets)
+            etype = expected.backend.get_edge_type(source, target)
+            readd = rng.random() < 0.5
+            for g in (expected, graph):
+                g.revoke(source, target)
+                if readd:
+                    # Re-adding the edge with the other type reuses the dead edge
+                    (g.deny if etype == EdgeType.ALLOW else g.allow)(source, target)
+        else:
+            for g in (expected, graph):
+                g.remove_actor(source) if source.vtype == "actor" else g.remove_group(source)
+        compacted = compacted or backend.tombstone_ratio == 0
+        assert backend.tombstone_ratio <= 0.1
+
+        assert [v.id for v in graph.backend.get_vertices()] == [v.id for v in expected.backend.get_vertices()]
+        actions = expected.backend.get_vertices("action")
+        checks = [(actor, action) for actor in expected.backend.get_vertices("actor") for action in actions]
+        assert graph.authorize_many(checks) == expected.authorize_many(checks)
+        assert [graph.action_is_authorized(*check) for check in checks] == expected.authorize_many(checks)
+    assert compacted
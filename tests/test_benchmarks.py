@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from benchmarks.suite.__main__ import main
+from benchmarks.suite.generators import GraphSpec, generate
+from benchmarks.suite.runner import BACKENDS, CASES, backend_factory, compare, run
+from permission_graph.backends.sqlite import SQLiteBackend
+
+
+@pytest.mark.unit
+def test_generate_is_deterministic() -> None:
+    spec = GraphSpec.for_edges(1_000)
+    first, second = generate(spec), generate(spec)
+    assert first.bulk_load_kwargs() == second.bulk_load_kwargs()
+    assert first.checks == second.checks
+    assert generate(GraphSpec.for_edges(1_000, seed=1)).memberships != first.memberships
+
+
+@pytest.mark.unit
+def test_generate_shape() -> None:
+    spec = GraphSpec.for_edges(10_000, deny_fraction=0.5)
+    workload = generate(spec)
+    sizes = sorted(
+        (sum(group.id == member_of.id for _, member_of in workload.memberships) for group in workload.groups),
+        reverse=True,
+    )
+    # Group sizes follow a power law
+    assert sizes[0] > 5 * sizes[len(sizes) // 2]
+    assert 0.4 < len(workload.denies) / (len(workload.allows) + len(workload.denies)) < 0.6
+    assert len(workload.checks) == spec.n_checks
+    assert not any(member.vtype == "group" for member, _ in workload.memberships)
+    nested = generate(GraphSpec.for_edges(10_000, nested_fraction=0.5)).memberships
+    assert 0.4 < sum(member.vtype == "group" for member, _ in nested) / spec.n_groups < 0.6
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+@pytest.mark.parametrize("group_closure", [False, True])
+def test_run(backend, group_closure) -> None:
+    spec = GraphSpec.for_edges(1_000, n_checks=50, nested_fraction=0.5)
+    result = run(spec, backend_factory(backend), repeat=1, group_closure=group_closure)
+    assert list(result["results"]) == CASES
+    assert all(case["ops"] > 0 for case in result["results"].values())
+    assert sum(result["graph"]["edges"].values()) == result["results"]["bulk_load"]["ops"]
+    assert result["graph"]["vertices"]["actor"] == result["spec"]["n_actors"]
+
+
+@pytest.mark.unit
+def test_backend_factory() -> None:
+    assert backend_factory("permission_graph.backends.sqlite:SQLiteBackend") is SQLiteBackend
+    with pytest.raises(ValueError):
+        backend_factory("unknown")
+
+
+@pytest.mark.integration
+def test_cli(tmp_path, capsys) -> None:
+    base, head = tmp_path / "base.json", tmp_path / "head.json"
+    args = ["run", "--size", "xs", "--cases", "bulk_load", "action_is_authorized", "--repeat", "1"]
+    assert main([*args, "--output", str(base)]) == 0
+    assert main([*args, "--output", str(head)]) == 0
+    results = json.loads(head.read_text())
+    assert results["runs"][0]["size"] == "xs"
+    assert list(results["runs"][0]["results"]) == ["bulk_load", "action_is_authorized"]
+
+    rows = compare(json.loads(base.read_text()), results)
+    assert [row["case"] for row in rows] == ["bulk_load", "action_is_authorized"]
+    # Every case is a regression when nothing may be slower than 0 times the base
+    assert main(["compare", str(base), str(head), "--threshold", "1000"]) == 0
+    assert main(["compare", str(base), str(head), "--threshold", "0"]) == 1
+    assert "action_is_authorized" in capsys.readouterr().out
@@ -0,0 +1,102 @@
+import pytest
+
+from permission_graph.bidirectional import bidirectional_level_search, bidirectional_search
+from permission_graph.structs import EdgeType
+
+ALLOW, DENY, MEMBER_OF = EdgeType.ALLOW, EdgeType.DENY, EdgeType.MEMBER_OF
+
+
+def search(edges: list[tuple[str, str, EdgeType]], source: str, target: str):
+    """Run bidirectional_search over a graph given as (source, target, etype) edges."""
+    return bidirectional_search(
+        source,
+        target,
+        successors=lambda vertex: [t for s, t, _ in edges if s == vertex],
+        predecessors=lambda vertex: [(s, etype) for s, t, etype in edges if t == vertex],
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "edges,expected",
+    [
+        # No path
+        ([("group", "action", ALLOW)], None),
+        # A direct edge
+        ([("actor", "action", DENY)], (1, {DENY})),
+        # Two paths through groups, with different final edges
+        (
+            [
+                ("actor", "group1", MEMBER_OF),
+                ("actor", "group2", MEMBER_OF),
+                ("group1", "action", ALLOW),
+                ("group2", "action", DENY),
+            ],
+            (2, {ALLOW, DENY}),
+        ),
+        # The shortest path wins over a longer one
+        (
+            [("actor", "group", MEMBER_OF), ("group", "action", ALLOW), ("actor", "action", DENY)],
+            (1, {DENY}),
+        ),
+        # A long chain of propagated actions, with a longer side branch
+        (
+            [("actor", "a0", ALLOW)]
+            + [(f"a{i}", f"a{i + 1}", ALLOW) for i in range(5)]
+            + [("a5", "action", ALLOW)]
+            + [("a2", "b0", DENY), ("b0", "b1", DENY), ("b1", "b2", DENY), ("b2", "b3", DENY), ("b3", "action", DENY)],
+            (7, {ALLOW}),
+        ),
+        # Paths of equal length that meet before the action share its final edge types
+        (
+            [
+                ("actor", "group1", MEMBER_OF),
+                ("actor", "group2", MEMBER_OF),
+                ("group1", "other", ALLOW),
+                ("group2", "other", DENY),
+                ("other", "action", DENY),
+            ],
+            (3, {DENY}),
+        ),
+    ],
+)
+def test_bidirectional_search(edges, expected):
+    assert search(edges, "actor", "action") == expected
+
+
+@pytest.mark.unit
+def test_bidirectional_search_expands_cheaper_frontier():
+    # The action is granted to many groups, and the actor is a member of one of them
+    edges = [("actor", "group0", MEMBER_OF)] + [(f"group{i}", "action", ALLOW) for i in range(100)]
+    expanded = []
+
+    def predecessors(vertex):
+        expanded.append(vertex)
+        return [(s, etype) for s, t, etype in edges if t == vertex]
+
+    result = bidirectional_search(
+        "actor",
+        "action",
+        successors=lambda vertex: [t for s, t, _ in edges if s == vertex],
+        predecessors=predecessors,
+    )
+    assert result == (2, {ALLOW})
+    # Only the first step searched backwards, from the action to its 100 groups
+    assert expanded == ["action"]
+
+
+@pytest.mark.unit
+def test_bidirectional_level_search_expands_whole_frontiers():
+    edges = [("actor", f"group{i}", MEMBER_OF) for i in range(3)] + [(f"group{i}", "action", ALLOW) for i in range(3)]
+    frontiers = []
+
+    def successors(frontier):
+        frontiers.append(frontier)
+        return [t for s, t, _ in edges if s in frontier]
+
+    def predecessors(frontier):
+        frontiers.append(frontier)
+        return [(t, s, etype) for s, t, etype in edges if t in frontier]
+
+    assert bidirectional_level_search("actor", "action", successors, predecessors) == (2, {ALLOW})
+    assert frontiers == [["action"], ["actor"]]
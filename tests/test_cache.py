@@ -0,0 +1,170 @@
+import math
+import random
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.cache import DecisionCache
+from permission_graph.search import decide
+from permission_graph.structs import Actor, Group, TieBreakerPolicy
+
+
+@pytest.mark.unit
+def test_hits_and_misses():
+    cache = DecisionCache()
+    assert cache.get("actor:Alice", "action:Doc:a:View") is None
+    cache.put(
+        "actor:Alice",
+        decisions={"action:Doc:a:View": True},
+        depths={"action:Doc:a:View": 1},
+        distances={"actor:Alice": 0, "action:Doc:a:View": 1},
+        radius=1,
+    )
+    assert cache.get("actor:Alice", "action:Doc:a:View") is True
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+
+@pytest.mark.unit
+def test_lru_eviction():
+    cache = DecisionCache(maxsize=2)
+    for name in ["a", "b", "c"]:
+        cache.put(f"actor:{name}", decisions={"x": True}, depths={"x": 1}, distances={"x": 1}, radius=1)
+        if name == "b":
+            cache.get("actor:a", "x")  # a is now more recently used than b
+    assert cache.get("actor:b", "x") is None
+    assert cache.get("actor:a", "x") is True
+    assert cache.cache_info().evictions == 1
+
+
+@pytest.mark.unit
+def test_ttl_expiry():
+    now = 0
+    cache = DecisionCache(ttl=10, timer=lambda: now)
+    cache.put("actor:a", decisions={"x": True}, depths={"x": math.inf}, distances={}, radius=math.inf)
+    now = 9
+    assert cache.get("actor:a", "x") is True
+    now = 10
+    assert cache.get("actor:a", "x") is None
+    assert cache.cache_info().evictions == 1
+
+
+@pytest.mark.unit
+def test_invalidate_edge_only_evicts_decisions_beyond_source():
+    cache = DecisionCache()
+    # actor:a -> group:g (1) -> action:x (2), action:y is unreachable
+    cache.put(
+        "actor:a",
+        decisions={"action:x": True, "action:y": False},
+        depths={"action:x": 2, "action:y": math.inf},
+        distances={"actor:a": 0, "group:g": 1, "action:x": 2},
+        radius=math.inf,
+    )
+    cache.put("actor:b", decisions={"action:x": True}, depths={"action:x": 1}, distances={"action:x": 1}, radius=1)
+    cache.invalidate_edge("action:x")
+    assert cache.cache_info().invalidations == 1
+    assert cache.get("actor:a", "action:y") is None
+    assert cache.get("actor:a", "action:x") is True
+    cache.invalidate_edge("group:g")
+    assert cache.get("actor:a", "action:x") is None
+    assert cache.get("actor:b", "action:x") is True
+    cache.invalidate_edge("group:h")
+    assert cache.get("actor:b", "action:x") is True
+
+
+@pytest.mark.unit
+def test_invalidate_vertex():
+    cache = DecisionCache()
+    cache.put(
+        "actor:a",
+        decisions={"action:x": True},
+        depths={"action:x": 2},
+        distances={"actor:a": 0, "group:g": 1, "action:x": 2},
+        radius=2,
+    )
+    cache.put("actor:b", decisions={"action:x": True}, depths={"action:x": 1}, distances={"action:x": 1}, radius=1)
+    cache.invalidate_vertex("actor:b")
+    assert cache.get("actor:b", "action:x") is None
+    cache.invalidate_vertex("action:x")
+    assert cache.get("actor:a", "action:x") is None
+    assert cache.cache_info().currsize == 0
+
+
+@pytest.mark.unit
+def test_invalidate_vertex_evicts_unreachable_action():
+    cache = DecisionCache()
+    cache.put("actor:a", decisions={"action:x": False}, depths={"action:x": math.inf}, distances={}, radius=math.inf)
+    cache.invalidate_vertex("group:g")
+    assert cache.get("actor:a", "action:x") is False
+    cache.invalidate_vertex("action:x")
+    assert cache.get("actor:a", "action:x") is None
+    assert cache.cache_info().currsize == 0
+
+
+@pytest.mark.integration
+def test_removed_action_is_not_cached(alice, document_type, document, view_document):
+    graph = PermissionGraph(cache=DecisionCache())
+    graph.add_actor(alice)
+    graph.add_resource_type(document_type)
+    graph.add_resource(document)
+    assert graph.action_is_authorized(alice, view_document) is False
+    graph.remove_resource(document)
+    with pytest.raises(ValueError):
+        graph.action_is_authorized(alice, view_document)
+
+
+@pytest.mark.integration
+def test_add_actor_to_group_only_evicts_that_actors_decisions(random_graph):
+    graph = random_graph(0)
+    graph.cache = DecisionCache()
+    actors = graph.backend.get_vertices("actor")
+    actions = graph.backend.get_vertices("action")
+    graph.authorize_many([(actor, action) for actor in actors for action in actions])
+    alice = Actor(name="Alice")
+    graph.add_actor(alice)
+    graph.add_group(Group(name="New"))
+    graph.add_actor_to_group(alice, Group(name="New"))
+    graph.add_actor_to_group(actors[0], Group(name="New"))
+    assert graph.cache.cache_info().invalidations == len(actions)
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("tie_breaker_policy", [TieBreakerPolicy.ANY_ALLOW, TieBreakerPolicy.ALL_ALLOW])
+@pytest.mark.parametrize("seed", range(5))
+def test_cached_decisions_match_after_mutations(random_graph, seed, tie_breaker_policy):
+    rng = random.Random(seed)
+    graph = random_graph(seed, tie_breaker_policy)
+    graph.cache = DecisionCache(maxsize=50)
+    actors = graph.backend.get_vertices("actor")
+    groups = graph.backend.get_vertices("group")
+
+    for _ in range(20):
+        actions = graph.backend.get_vertices("action")
+        checks = [(actor, action) for actor in actors for action in actions]
+        expected = [
+            decide(
+                {graph.backend.get_edge_type(p[-2], p[-1]) for p in graph.backend.shortest_paths(actor, action)},
+                tie_breaker_policy,
+            )
+            for actor, action in checks
+        ]
+        assert graph.authorize_many(checks) == expected
+        assert [graph.action_is_authorized(actor, action) for actor, action in checks] == expected
+
+        source = rng.choice(actors + groups + actions)
+        target = rng.choice(actions)
+        match rng.randint(0, 4):
+            case 0 | 1 if source != target and not graph.backend.edge_exists(source, target):
+                rng.choice([graph.allow, graph.deny])(source, target)
+            case 2 if graph.backend.get_vertices_from(source):
+                graph.revoke(source, rng.choice(graph.backend.get_vertices_from(source)))
+            case 3:
+                actor, group = rng.choice(actors), rng.choice(groups)
+                if graph.backend.edge_exists(actor, group):
+                    graph.remove_actor_from_group(actor, group)
+                else:
+                    graph.add_actor_to_group(actor, group)
+            case 4 if len(groups) > 1:
+                group = groups.pop(rng.randrange(len(groups)))
+                graph.remove_group(group)
+    assert graph.cache.cache_info().hits > 0
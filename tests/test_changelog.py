@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.async_graph import AsyncPermissionGraph
+from permission_graph.changelog import ChangeEntry, ChangeLog, FileSink, read_changes
+from permission_graph.concurrent import ConcurrentPermissionGraph
+from permission_graph.structs import (
+    Action,
+    Actor,
+    EdgeType,
+    Group,
+    Resource,
+    ResourceType,
+    VertexRef,
+)
+
+
+def test_entry_json_round_trip(alice, admins, document_type, view_document) -> None:
+    entries = [
+        ChangeEntry(1, "add_actor", (alice,)),
+        ChangeEntry(2, "add_resource_type", (document_type,)),
+        ChangeEntry(3, "remove_resource", (VertexRef(id="resource:Document:a.csv", vtype="resource"),)),
+        ChangeEntry(4, "update_resource_type_actions", ("Document", ["View", "Edit"])),
+        ChangeEntry(5, "bulk_load", ([alice], [admins], [], [], [(alice, admins)], [(admins, view_document)], [])),
+    ]
+    for entry in entries:
+        decoded = ChangeEntry.from_json(entry.to_json())
+        assert decoded.to_json() == entry.to_json()
+    assert ChangeEntry.from_json(entries[1].to_json()).args == (document_type,)
+    assert type(ChangeEntry.from_json(entries[2].to_json()).args[0]) is VertexRef
+
+
+def test_changelog_versions(alice, admins) -> None:
+    recorded = []
+    changelog = ChangeLog(sink=recorded.append, maxlen=2)
+    graph = PermissionGraph(changelog=changelog)
+    graph.add_actor(alice)
+    graph.add_group(admins)
+    graph.add_actor_to_group(alice, admins)
+    with pytest.raises(ValueError):
+        graph.add_actor(alice)
+
+    assert changelog.version == 3
+    assert [(entry.version, entry.method) for entry in recorded] == [
+        (1, "add_actor"),
+        (2, "add_group"),
+        (3, "add_actor_to_group"),
+    ]
+    assert changelog.entries(after=1) == recorded[1:]
+    assert changelog.entries(after=3) == []
+    with pytest.raises(ValueError):
+        changelog.entries()
+    with pytest.raises(ValueError):
+        changelog.append(recorded[2])
+    with pytest.raises(ValueError):
+        changelog.record("action_is_authorized", (alice,))
+
+
+def test_read_changes(tmp_path, alice, admins) -> None:
+    path = tmp_path / "changes.log"
+    with FileSink(path) as sink:
+        graph = PermissionGraph(changelog=ChangeLog(sink=sink))
+        graph.add_actor(alice)
+        graph.add_group(admins)
+    # A line still being written is not read
+    with open(path, "a") as file:
+        file.write('{"version": 3')
+    assert [entry.args for entry in read_changes(path)] == [(alice,), (admins,)]
+    assert [entry.version for entry in read_changes(path, after=1)] == [2]
+
+
+def test_apply_changes_skips_entries_already_applied(alice, admins) -> None:
+    primary = PermissionGraph(changelog=ChangeLog())
+    replica = PermissionGraph(changelog=ChangeLog())
+    primary.add_actor(alice)
+    assert replica.apply_changes(primary.changelog.entries()) == 1
+    primary.add_group(admins)
+    primary.add_actor_to_group(alice, admins)
+    assert replica.apply_changes(primary.changelog.entries()) == 2
+    assert replica.changelog.version == 3
+    assert replica.backend.edge_exists(alice, admins)
+
+    primary.remove_actor(alice)
+    with pytest.raises(ValueError):
+        replica.apply_changes(primary.changelog.entries()[-1:] + [ChangeEntry(6, "add_actor", (alice,))])
+    assert replica.changelog.version == 4
+    assert not replica.backend.vertex_exists(alice)
+
+
+@pytest.mark.system
+@pytest.mark.parametrize("lazy_actions", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_replica_matches_primary(random_graph, tmp_path, seed, lazy_actions) -> None:
+    path = tmp_path / "changes.log"
+    with FileSink(path) as sink:
+        primary = random_graph(seed, lazy_actions=lazy_actions, changelog=ChangeLog(sink=sink))
+        replica = PermissionGraph(lazy_actions=lazy_actions, changelog=ChangeLog())
+        replica.apply_changes(read_changes(path), batch_size=7)
+
+        group = Group(name="group0")
+        for target in primary.backend.get_vertices_from(group):
+            if target.vtype == "action":
+                primary.revoke(group, target)
+        primary.remove_actor(Actor(name="actor0"))
+        primary.update_resource_type_actions("Document", ["View", "Share"])
+        primary.remove_resource(Resource(name="folder0", resource_type="Folder"))
+        primary.add_resource_type(ResourceType(name="Report", actions=["Read"]))
+        report = Resource(name="report0", resource_type="Report")
+        read_report = Action(name="Read", resource_type="Report", resource=report.name)
+        primary.bulk_load(resources=[report], allows=[(group, read_report)])
+        primary.add_actor(Actor(name="actor8"))
+        primary.add_actor_to_group(Actor(name="actor8"), group)
+        replica.apply_changes(read_changes(path, after=replica.changelog.version), batch_size=7)
+    assert replica.changelog.version == primary.changelog.version
+
+    def edges(graph: PermissionGraph) -> set[tuple[str, str, EdgeType]]:
+        return {
+            (source.id, target.id, etype)
+            for source in graph.backend.get_vertices()
+            for target, etype in graph.backend.get_edges_from(source)
+        }
+
+    assert {v.id for v in replica.backend.get_vertices()} == {v.id for v in primary.backend.get_vertices()}
+    assert edges(replica) == edges(primary)
+    checks = list(itertools.product(primary.backend.get_vertices("actor"), primary.backend.get_vertices("action")))
+    assert replica.authorize_many(checks) == primary.authorize_many(checks)
+
+
+def test_copy_on_write_changes_are_recorded(alice, admins, document_type, document, view_document) -> None:
+    changelog = ChangeLog()
+    concurrent = ConcurrentPermissionGraph(PermissionGraph(changelog=changelog))
+    with concurrent.write() as graph:
+        graph.bulk_load(actors=[alice], groups=[admins], resource_types=[document_type], resources=[document])
+        graph.add_actor_to_group(alice, admins)
+    assert changelog.version == 2
+    # Changes discarded by a failed write aren't recorded
+    with pytest.raises(RuntimeError):
+        with concurrent.write() as graph:
+            graph.allow(alice, view_document)
+            raise RuntimeError()
+    assert changelog.version == 2
+    assert concurrent.snapshot().changelog is changelog
+
+    async def main():
+        async with AsyncPermissionGraph(concurrent) as async_graph:
+            await async_graph.allow(admins, view_document)
+
+    asyncio.run(main())
+    assert [entry.method for entry in changelog.entries()] == ["bulk_load", "add_actor_to_group", "allow"]
+    replica = PermissionGraph()
+    replica.apply_changes(changelog.entries())
+    assert replica.action_is_authorized(alice, view_document)
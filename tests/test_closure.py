@@ -0,0 +1,188 @@
+import random
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.backends.sqlite import SQLiteBackend
+from permission_graph.changelog import ChangeLog
+from permission_graph.closure import GroupClosure
+from permission_graph.search import search_to
+from permission_graph.structs import Actor, Group, TieBreakerPolicy
+
+
+def closure_of(edges: list[tuple[str, str]]) -> GroupClosure:
+    closure = GroupClosure()
+    for child, parent in edges:
+        closure.add_edge(child, parent)
+    return closure
+
+
+def nonempty(mapping: dict[str, dict[str, int]]) -> dict[str, dict[str, int]]:
+    return {key: value for key, value in mapping.items() if value}
+
+
+@pytest.mark.unit
+def test_add_and_remove_edges() -> None:
+    closure = closure_of([("b", "a"), ("c", "b"), ("d", "c")])
+    assert closure.ancestors["d"] == {"c": 1, "b": 2, "a": 3}
+    assert closure.descendants["a"] == {"b": 1, "c": 2, "d": 3}
+
+    # A shortcut shortens the distances through it
+    closure.add_edge("c", "a")
+    assert closure.ancestors["d"] == {"c": 1, "b": 2, "a": 2}
+    closure.remove_edge("c", "a")
+    assert closure.ancestors["d"] == {"c": 1, "b": 2, "a": 3}
+
+    closure.remove_edge("c", "b")
+    assert closure.ancestors["d"] == {"c": 1}
+    assert nonempty(closure.descendants) == {"a": {"b": 1}, "c": {"d": 1}}
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("edge", [("a", "a"), ("a", "c"), ("b", "c")])
+def test_cycles(edge: tuple[str, str]) -> None:
+    closure = closure_of([("b", "a"), ("c", "b")])
+    with pytest.raises(ValueError):
+        closure.add_edge(*edge)
+
+
+@pytest.mark.unit
+def test_remove_group() -> None:
+    closure = closure_of([("b", "a"), ("c", "b"), ("c", "x"), ("d", "c")])
+    closure.remove_group("b")
+    assert closure.ancestors["d"] == {"c": 1, "x": 2}
+    assert "b" not in closure.parents and "b" not in closure.ancestors
+    assert nonempty(closure.descendants) == {"c": {"d": 1}, "x": {"c": 1, "d": 2}}
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_matches_rebuild(seed: int) -> None:
+    rng = random.Random(seed)
+    groups = [f"g{i}" for i in range(12)]
+    closure = GroupClosure()
+    edges = set()
+    for _ in range(60):
+        if edges and rng.random() < 0.3:
+            edge = rng.choice(sorted(edges))
+            closure.remove_edge(*edge)
+            edges.remove(edge)
+        else:
+            # Children come after their parents, so there are no cycles
+            parent, child = sorted(rng.sample(groups, 2), key=groups.index)
+            if (child, parent) not in edges:
+                closure.add_edge(child, parent)
+                edges.add((child, parent))
+        rebuilt = closure_of(sorted(edges))
+        assert nonempty(closure.ancestors) == nonempty(rebuilt.ancestors)
+        assert nonempty(closure.descendants) == nonempty(rebuilt.descendants)
+
+
+@pytest.fixture
+def nested(alice, admins, document_type, document, view_document) -> PermissionGraph:
+    """Return a graph where alice is in engineers, which is in staff, which is in admins.
+
+    Admins are allowed to view the document.
+    """
+    graph = PermissionGraph(group_closure=True)
+    engineers, staff = Group(name="Engineers"), Group(name="Staff")
+    graph.bulk_load(
+        actors=[alice],
+        groups=[admins, engineers, staff],
+        resource_types=[document_type],
+        resources=[document],
+        memberships=[(alice, engineers), (engineers, staff), (staff, admins)],
+        allows=[(admins, view_document)],
+    )
+    return graph
+
+
+@pytest.mark.integration
+def test_nested_groups(nested, alice, admins, view_document) -> None:
+    engineers, staff = Group(name="Engineers"), Group(name="Staff")
+    assert nested.action_is_authorized(alice, view_document)
+    assert list(nested.actors_authorized_for(view_document)) == [alice]
+    assert nested.explain(alice, view_document).depth == 4
+
+    # A nearer group's permission wins
+    nested.deny(staff, view_document)
+    assert not nested.action_is_authorized(alice, view_document)
+    nested.revoke(staff, view_document)
+
+    nested.remove_actor_from_group(staff, admins)
+    assert not nested.action_is_authorized(alice, view_document)
+    nested.add_actor_to_group(engineers, admins)
+    assert nested.authorize_many([(alice, view_document)]) == [True]
+    assert nested.group_closure.ancestors[engineers.id] == {staff.id: 1, admins.id: 1}
+
+    nested.remove_group(engineers)
+    assert not nested.action_is_authorized(alice, view_document)
+    assert engineers.id not in nested.group_closure.ancestors
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("group_closure", [False, True])
+def test_nesting_cycles(group_closure, admins) -> None:
+    graph = PermissionGraph(group_closure=group_closure)
+    engineers, staff = Group(name="Engineers"), Group(name="Staff")
+    graph.bulk_load(groups=[admins, engineers, staff], memberships=[(engineers, staff), (staff, admins)])
+    with pytest.raises(ValueError):
+        graph.add_actor_to_group(admins, engineers)
+    with pytest.raises(ValueError):
+        graph.add_actor_to_group(admins, admins)
+    interns = Group(name="Interns")
+    with pytest.raises(ValueError):
+        graph.bulk_load(groups=[interns], memberships=[(interns, engineers), (admins, interns)])
+    assert not graph.backend.vertex_exists(interns)
+    assert not graph.backend.edge_exists(admins, engineers)
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("backend", [IGraphMemoryBackend, SQLiteBackend])
+@pytest.mark.parametrize("tie_breaker_policy", list(TieBreakerPolicy))
+@pytest.mark.parametrize("seed", range(5))
+def test_closure_matches_search(random_graph, backend, tie_breaker_policy, seed) -> None:
+    expected = random_graph(seed, tie_breaker_policy, backend=backend(), nested_groups=True)
+    graph = random_graph(seed, tie_breaker_policy, backend=backend(), nested_groups=True, group_closure=True)
+    actors = graph.backend.get_vertices("actor")
+    actions = graph.backend.get_vertices("action")
+    checks = [(actor, action) for actor in actors for action in actions]
+    decisions = [expected.action_is_authorized(actor, action) for actor, action in checks]
+    assert [graph.action_is_authorized(actor, action) for actor, action in checks] == decisions
+    assert graph.authorize_many(checks) == decisions
+    for action in actions:
+        reached = {r.vertex.id: (r.depth, r.final_edge_types) for r in search_to(expected.backend, action)}
+        assert {
+            r.vertex.id: (r.depth, r.final_edge_types) for r in graph.group_closure.search_to(graph.backend, action)
+        } == reached
+        assert sorted(actor.id for actor in graph.actors_authorized_for(action)) == sorted(
+            actor.id for actor in expected.actors_authorized_for(action)
+        )
+
+
+@pytest.mark.integration
+def test_closure_from_backend_and_copy(random_graph) -> None:
+    graph = random_graph(0, nested_groups=True, group_closure=True)
+    loaded = PermissionGraph(backend=graph.backend, group_closure=True)
+    assert nonempty(loaded.group_closure.ancestors) == nonempty(graph.group_closure.ancestors)
+
+    copy = graph.copy()
+    group = Group.from_id(next(group for group, parents in graph.group_closure.parents.items() if parents))
+    for parent in list(graph.group_closure.parents[group.id]):
+        copy.remove_actor_from_group(group, Group.from_id(parent))
+    assert not copy.group_closure.ancestors[group.id]
+    assert graph.group_closure.ancestors[group.id]
+
+
+@pytest.mark.integration
+def test_replicate_nested_groups(random_graph) -> None:
+    changelog = ChangeLog()
+    graph = random_graph(1, nested_groups=True, changelog=changelog)
+    graph.remove_actor_from_group(Group(name="group1"), Group(name="group0"))
+    replica = PermissionGraph(group_closure=True)
+    replica.apply_changes(changelog.entries())
+    assert nonempty(replica.group_closure.ancestors) == nonempty(GroupClosure.from_backend(graph.backend).ancestors)
+    actor = Actor(name="actor0")
+    for action in graph.backend.get_vertices("action"):
+        assert replica.action_is_authorized(actor, action) == graph.action_is_authorized(actor, action)
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from permission_graph.compiled import CompiledPermissionGraph
+from permission_graph.structs import Action, Actor, TieBreakerPolicy
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("tie_breaker_policy", [TieBreakerPolicy.ANY_ALLOW, TieBreakerPolicy.ALL_ALLOW])
+@pytest.mark.parametrize("seed", range(20))
+def test_compiled_matches_action_is_authorized(random_graph, seed, tie_breaker_policy):
+    graph = random_graph(seed, tie_breaker_policy)
+    compiled = graph.compile()
+    actors = graph.backend.get_vertices("actor")
+    actions = graph.backend.get_vertices("action")
+    checks = [(actor, action) for actor in actors for action in actions]
+    expected = [graph.action_is_authorized(actor, action) for actor, action in checks]
+    assert compiled.authorize_many(checks) == expected
+
+
+@pytest.mark.integration
+def test_compiled_is_a_snapshot(random_graph):
+    graph = random_graph(0)
+    actor = Actor(name="actor0")
+    action = Action(name="View", resource_type="Document", resource="document0")
+    if graph.backend.edge_exists(actor, action):
+        graph.revoke(actor, action)
+    graph.deny(actor, action)
+    compiled = graph.compile(actors=[actor])
+    graph.revoke(actor, action)
+    graph.allow(actor, action)
+    assert compiled.action_is_authorized(actor, action) is False
+    assert graph.action_is_authorized(actor, action) is True
+
+
+@pytest.mark.integration
+def test_compiled_raises_for_unknown_vertices(random_graph):
+    graph = random_graph(0)
+    compiled = graph.compile(actors=[Actor(name="actor0")])
+    action = Action(name="View", resource_type="Document", resource="document0")
+    with pytest.raises(ValueError):
+        compiled.action_is_authorized(Actor(name="actor1"), action)
+    with pytest.raises(ValueError):
+        compiled.action_is_authorized(Actor(name="actor0"), Action(name="View", resource_type="Document", resource="x"))
+
+
+@pytest.mark.unit
+def test_compiled_check_cost_does_not_grow_with_actions():
+    actor = Actor(name="actor0")
+    actions = [Action(name="View", resource_type="Document", resource=f"doc{i}") for i in range(100)]
+
+    def seconds_per_check(n_actions: int) -> float:
+        # The same actions, at the end of bitsets over n_actions actions
+        compiled = CompiledPermissionGraph(
+            action_index={action.id: n_actions - 1 - i for i, action in enumerate(actions)},
+            allowed={actor.id: bytearray(b"\xff" * ((n_actions + 7) // 8))},
+        )
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for action in actions * 20:
+                assert compiled.action_is_authorized(actor, action)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    assert seconds_per_check(2_000_000) < 5 * seconds_per_check(1_000)
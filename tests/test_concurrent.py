@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.cache import DecisionCache
+from permission_graph.concurrent import ConcurrentPermissionGraph
+from permission_graph.structs import Action, Actor, Group, Resource, ResourceType
+
+
+def build_graph(n_actors: int = 20, n_resources: int = 10) -> tuple[PermissionGraph, list[Actor], list[Action]]:
+    """Return a graph where every actor is in one group, and the group's actions."""
+    graph = PermissionGraph()
+    graph.add_resource_type(ResourceType(name="Document", actions=["View"]))
+    actions = []
+    for i in range(n_resources):
+        graph.add_resource(Resource(name=f"doc{i}", resource_type="Document"))
+        actions.append(Action(name="View", resource_type="Document", resource=f"doc{i}"))
+    actors = [Actor(name=f"actor{i}") for i in range(n_actors)]
+    graph.add_group(Group(name="staff"))
+    for actor in actors:
+        graph.add_actor(actor)
+        graph.add_actor_to_group(actor, Group(name="staff"))
+    return graph, actors, actions
+
+
+@pytest.mark.integration
+def test_write():
+    graph, actors, actions = build_graph()
+    concurrent = ConcurrentPermissionGraph(graph)
+    original = concurrent.snapshot()
+
+    concurrent.allow(actors[0], actions[0])
+    assert concurrent.version == 1
+    assert concurrent.action_is_authorized(actors[0], actions[0])
+    # Earlier versions don't change
+    assert not original.action_is_authorized(actors[0], actions[0])
+
+    with pytest.raises(RuntimeError):
+        with concurrent.write() as graph:
+            graph.revoke(actors[0], actions[0])
+            raise RuntimeError()
+    assert concurrent.version == 1
+    assert concurrent.action_is_authorized(actors[0], actions[0])
+
+    with pytest.raises(ValueError):
+        ConcurrentPermissionGraph(PermissionGraph(cache=DecisionCache()))
+
+
+@pytest.mark.integration
+def test_reads_do_not_wait_for_writes():
+    graph, actors, actions = build_graph()
+    concurrent = ConcurrentPermissionGraph(graph)
+    writing = threading.Event()
+    done = threading.Event()
+
+    def writer():
+        with concurrent.write() as graph:
+            graph.allow(Group(name="staff"), actions[0])
+            writing.set()
+            done.wait(timeout=5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    writing.wait(timeout=5)
+    assert not concurrent.action_is_authorized(actors[0], actions[0])
+    done.set()
+    thread.join()
+    assert concurrent.action_is_authorized(actors[0], actions[0])
+
+
+@pytest.mark.system
+def test_concurrent_reads_and_writes():
+    """Readers always see a whole write, while writers add and remove vertices."""
+    graph, actors, actions = build_graph()
+    staff = Group(name="staff")
+    concurrent = ConcurrentPermissionGraph(graph)
+    checks = [(actor, action) for actor in actors for action in actions]
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        for i in range(30):
+            with concurrent.write() as graph:
+                # Flip every decision at once, and renumber the vertices
+                for action in actions:
+                    if i % 2 == 0:
+                        graph.allow(staff, action)
+                    else:
+                        graph.revoke(staff, action)
+                graph.remove_actor(actors[0]) if i % 2 == 0 else graph.add_actor(actors[0])
+                if i % 2 == 1:
+                    graph.add_actor_to_group(actors[0], staff)
+        stop.set()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                decisions = concurrent.authorize_many(checks[len(actions) :])
+                assert len(set(decisions)) == 1, "saw a partial write"
+                # Several reads against the same version agree with each other
+                snapshot = concurrent.snapshot()
+                (expected,) = set(snapshot.authorize_many(checks[len(actions) :]))
+                for actor, action in checks[len(actions) :: 7]:
+                    assert snapshot.action_is_authorized(actor, action) == expected
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+            stop.set()
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    writer_thread.join(timeout=60)
+    for thread in readers:
+        thread.join(timeout=60)
+    assert not errors, errors
+    assert concurrent.version == 30
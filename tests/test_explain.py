@@ -0,0 +1,134 @@
+import itertools
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.explain import DecisionSampler
+from permission_graph.structs import Action, Actor, Effect, Group, TieBreakerPolicy
+
+
+@pytest.fixture
+def graph(alice, admins, document_type, document, view_document) -> PermissionGraph:
+    """Return a graph where alice is in admins, allowed to view the document, and in public, denied it."""
+    graph = PermissionGraph()
+    public = Group(name="Public")
+    graph.add_actor(alice)
+    graph.add_actor(Actor(name="Bob"))
+    graph.add_group(admins)
+    graph.add_group(public)
+    graph.add_resource_type(document_type)
+    graph.add_resource(document)
+    graph.add_actor_to_group(alice, admins)
+    graph.add_actor_to_group(alice, public)
+    graph.allow(admins, view_document)
+    graph.deny(public, view_document)
+    return graph
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("tie_breaker_policy", list(TieBreakerPolicy))
+def test_explain_tie(graph, alice, admins, view_document, tie_breaker_policy) -> None:
+    graph.tie_breaker_policy = tie_breaker_policy
+    decision = graph.explain(alice, view_document)
+    assert decision.allowed == graph.action_is_authorized(alice, view_document)
+    assert decision.allowed == (tie_breaker_policy == TieBreakerPolicy.ANY_ALLOW)
+    assert decision.actor == alice
+    assert decision.action == view_document
+    assert sorted(zip([path[1].name for path in decision.paths], decision.effects)) == [
+        ("Admins", Effect.ALLOW),
+        ("Public", Effect.DENY),
+    ]
+    assert [alice, admins, view_document] in decision.paths
+    assert isinstance(decision.paths[0][1], Group)
+    assert decision.tie_breaker_policy == tie_breaker_policy
+    assert decision.tie_breaker_applied
+    assert decision.depth == 2
+
+
+@pytest.mark.integration
+def test_explain_single_path_and_no_path(graph, alice, view_document) -> None:
+    graph.allow(alice, view_document)
+    decision = graph.explain(graph.backend.get_handle(alice), view_document)
+    assert decision.allowed
+    assert decision.paths == [[alice, view_document]]
+    assert decision.effects == [Effect.ALLOW]
+    assert not decision.tie_breaker_applied
+    assert decision.depth == 1
+
+    decision = graph.explain(Actor(name="Bob"), view_document)
+    assert not decision.allowed
+    assert (decision.paths, decision.effects, decision.depth) == ([], [], None)
+    with pytest.raises(ValueError):
+        graph.explain(Actor(name="Missing"), view_document)
+    with pytest.raises(ValueError):
+        graph.explain(alice, Action(name="Edit", resource_type="Document", resource="My_Document.csv"))
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("tie_breaker_policy", list(TieBreakerPolicy))
+def test_explain_diamond_lattice(diamond_graph, tie_breaker_policy, alice, view_document) -> None:
+    # 2 ** 40 shortest paths, of which only max_paths are built
+    graph = diamond_graph(40, tie_breaker_policy)
+    decision = graph.explain(alice, view_document, max_paths=10)
+    assert decision.allowed == (tie_breaker_policy == TieBreakerPolicy.ANY_ALLOW)
+    assert decision.tie_breaker_applied
+    assert decision.truncated
+    assert len(decision.paths) == len(decision.effects) == 10
+    assert decision.depth == 41
+    assert all(len(path) == 42 for path in decision.paths)
+
+    decision = diamond_graph(2).explain(alice, view_document, max_paths=None)
+    assert len(decision.paths) == 4
+    assert not decision.truncated
+    assert sorted(effect.value for effect in decision.effects) == ["ALLOW"] * 2 + ["DENY"] * 2
+    with pytest.raises(ValueError):
+        graph.explain(alice, view_document, max_paths=0)
+
+
+@pytest.mark.integration
+def test_sampler(graph, alice, view_document) -> None:
+    with pytest.raises(ValueError):
+        DecisionSampler(rate=1.5)
+    draws = itertools.cycle([0.1, 0.9])
+    graph.sampler = DecisionSampler(rate=0.5, maxlen=3, rng=lambda: next(draws))
+    bob = Actor(name="Bob")
+    assert graph.action_is_authorized(alice, view_document)
+    assert not graph.action_is_authorized(bob, view_document)
+    assert [decision.actor for decision in graph.sampler.decisions()] == [alice]
+
+    checks = [(alice, view_document), (bob, view_document)] * 2
+    assert graph.authorize_many(checks) == [True, False, True, False]
+    # The oldest decision is dropped
+    assert [decision.actor for decision in graph.sampler.decisions()] == [alice, alice, alice]
+    assert graph.copy().sampler is graph.sampler
+    graph.sampler.clear()
+    assert graph.sampler.decisions() == []
+
+
+@pytest.mark.system
+@pytest.mark.parametrize("lazy_actions", [False, True])
+@pytest.mark.parametrize("tie_breaker_policy", list(TieBreakerPolicy))
+@pytest.mark.parametrize("seed", range(3))
+def test_explain_matches_action_is_authorized(random_graph, seed, tie_breaker_policy, lazy_actions) -> None:
+    graph = random_graph(seed, tie_breaker_policy=tie_breaker_policy, lazy_actions=lazy_actions)
+    actions = random_graph(seed).backend.get_vertices("action")
+    checks = list(itertools.product(graph.backend.get_vertices("actor"), actions))
+    expected = graph.authorize_many(checks)
+    decisions = [graph.explain(actor, action) for actor, action in checks]
+    assert [decision.allowed for decision in decisions] == expected
+    for (actor, action), decision in zip(checks, decisions):
+        assert all(len(path) - 1 == decision.depth for path in decision.paths)
+        assert all(path[0] == decision.actor and path[-1] == decision.action for path in decision.paths)
+        if not lazy_actions:
+            expected_paths = graph.backend.shortest_paths(actor, action)
+            assert sorted([v.id for v in path] for path in decision.paths) == sorted(
+                [v.id for v in path] for path in expected_paths
+            )
+
+    graph.sampler = DecisionSampler(rate=0.5, maxlen=len(checks))
+    assert graph.authorize_many(checks) == expected
+    assert [graph.action_is_authorized(actor, action) for actor, action in checks] == expected
+    assert all(
+        decision.allowed == expected[checks.index((decision.actor, decision.action))]
+        for decision in graph.sampler.decisions()
+    )
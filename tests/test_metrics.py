@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.metrics import (
+    BACKEND_METHODS,
+    Histogram,
+    InstrumentedBackend,
+    MetricsRegistry,
+)
+from permission_graph.structs import Actor, EdgeType, Group
+
+
+@pytest.fixture
+def graph(alice, admins, document_type, document, view_document) -> PermissionGraph:
+    """Return an instrumented graph where alice is in admins, allowed to view the document, and in public, denied it."""
+    graph = PermissionGraph(metrics=MetricsRegistry())
+    public = Group(name="Public")
+    graph.add_actor(alice)
+    graph.add_actor(Actor(name="Bob"))
+    graph.add_group(admins)
+    graph.add_group(public)
+    graph.add_resource_type(document_type)
+    graph.add_resource(document)
+    graph.add_actor_to_group(alice, admins)
+    graph.add_actor_to_group(alice, public)
+    graph.allow(admins, view_document)
+    graph.deny(public, view_document)
+    return graph
+
+
+def samples(text: str) -> dict[str, float]:
+    """Return the samples of a Prometheus text exposition, by name and labels."""
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+@pytest.mark.unit
+def test_histogram() -> None:
+    histogram = Histogram((1, 2, 4))
+    for value in (0.5, 1, 3, 4, 10):
+        histogram.observe(value)
+    assert histogram.counts == [2, 0, 2, 1]
+    assert (histogram.sum, histogram.count) == (18.5, 5)
+
+
+@pytest.mark.unit
+def test_backend_methods() -> None:
+    assert {"add_vertex", "search_between", "search_between_async", "count_edges", "copy"} <= BACKEND_METHODS
+    assert "load" not in BACKEND_METHODS
+
+
+@pytest.mark.integration
+def test_not_instrumented_without_registry() -> None:
+    assert type(PermissionGraph().backend) is IGraphMemoryBackend
+
+
+@pytest.mark.integration
+def test_instrumented_graph(graph, alice, view_document) -> None:
+    metrics = graph.metrics
+    assert isinstance(graph.backend, InstrumentedBackend)
+    assert graph.action_is_authorized(alice, view_document)
+    assert not graph.action_is_authorized(Actor(name="Bob"), view_document)
+    assert graph.authorize_many([(alice, view_document)]) == [True]
+    asyncio.run(graph.backend.search_between_async(alice, view_document))
+    assert len(graph.backend.shortest_paths(alice, view_document)) == 2
+
+    assert metrics.checks == {True: 1, False: 1}
+    assert metrics.check_seconds.count == 2
+    assert metrics.backend_seconds["search_between"].count == 2
+    assert metrics.backend_seconds["search_between_async"].count == 1
+    assert metrics.backend_seconds["get_edges_from"].count >= 1
+    assert metrics.backend_seconds["shortest_paths"].count == 1
+    assert metrics.backend_seconds["add_vertex"].count >= 5
+    # Alice's two paths end in ALLOW and DENY edges
+    assert metrics.path_length.count == 3
+    assert metrics.path_length.sum == 6
+    assert metrics.path_count.counts[metrics.path_count.buckets.index(2)] == 1
+    assert metrics.tie_breaks == 2
+
+    # Copies share the registry
+    graph.copy().action_is_authorized(alice, view_document)
+    assert metrics.checks[True] == 2
+
+
+@pytest.mark.integration
+def test_prometheus(graph, alice, view_document, tmp_path) -> None:
+    graph.action_is_authorized(alice, view_document)
+    text = graph.metrics.to_prometheus()
+    assert "# TYPE permission_graph_backend_call_seconds histogram" in text
+    values = samples(text)
+    assert values['permission_graph_checks_total{decision="allow"}'] == 1
+    assert values['permission_graph_check_seconds_bucket{le="+Inf"}'] == 1
+    assert values['permission_graph_path_length_bucket{le="1.0"}'] == 0
+    assert values['permission_graph_path_length_bucket{le="2.0"}'] == 1
+    assert values['permission_graph_backend_call_seconds_count{method="search_between"}'] == 1
+    assert values['permission_graph_vertices{vtype="actor"}'] == 2
+    assert values['permission_graph_vertices{vtype="action"}'] == 1
+    assert values['permission_graph_edges{etype="ALLOW"}'] == 1
+    assert (
+        values['permission_graph_edges{etype="MEMBER_OF"}'] == graph.backend.wrapped.count_edges()[EdgeType.MEMBER_OF]
+    )
+    # Buckets are cumulative
+    buckets = [value for name, value in values.items() if name.startswith("permission_graph_check_seconds_bucket")]
+    assert buckets == sorted(buckets)
+
+    graph.metrics.write_prometheus(tmp_path / "permission_graph.prom")
+    assert samples((tmp_path / "permission_graph.prom").read_text()).keys() == values.keys()
+    assert [path.name for path in tmp_path.iterdir()] == ["permission_graph.prom"]
+
+
+@pytest.mark.integration
+def test_prometheus_tombstone_ratio(alice, admins) -> None:
+    graph = PermissionGraph(
+        backend=IGraphMemoryBackend(tombstones=True, compaction_threshold=0.5), metrics=MetricsRegistry()
+    )
+    graph.add_actor(alice)
+    graph.add_group(admins)
+    graph.add_actor_to_group(alice, admins)
+    assert samples(graph.metrics.to_prometheus())["permission_graph_tombstone_ratio"] == 0
+    graph.remove_actor_from_group(alice, admins)
+    assert samples(graph.metrics.to_prometheus())["permission_graph_tombstone_ratio"] == 1 / 3
@@ -103,51 +103,73 @@ def test_revoke(graph):
 
 @pytest.mark.unit
 @pytest.mark.parametrize(
-    "shortest_paths,terminal_edge_types,tie_breaker_policy,expected",
+    "search_result,tie_breaker_policy,expected",
     [
         # No paths connecting agent to action - DENY
-        ([], [EdgeType.ALLOW], TieBreakerPolicy.ANY_ALLOW, False),
+        (None, TieBreakerPolicy.ANY_ALLOW, False),
         # One path that allows access - ALLOW
-        ([[ALICE, VIEW_DOCUMENT]], [EdgeType.ALLOW], TieBreakerPolicy.ANY_ALLOW, True),
+        ((1, {EdgeType.ALLOW}), TieBreakerPolicy.ANY_ALLOW, True),
         # One path that denies access - DENY
-        ([[ALICE, VIEW_DOCUMENT]], [EdgeType.DENY], TieBreakerPolicy.ANY_ALLOW, False),
+        ((1, {EdgeType.DENY}), TieBreakerPolicy.ANY_ALLOW, False),
         # Two paths, one allows one denies, tiebreaker policy ANY_ALLOW -- ALLOW
-        (
-            [
-                [ALICE, VIEW_DOCUMENT],
-                [ALICE, VIEW_DOCUMENT],
-            ],
-            [EdgeType.ALLOW, EdgeType.DENY],
-            TieBreakerPolicy.ANY_ALLOW,
-            True,
-        ),
+        ((2, {EdgeType.ALLOW, EdgeType.DENY}), TieBreakerPolicy.ANY_ALLOW, True),
         # Two paths, one allows one denies, tiebreaker policy ALL_ALLOW -- DENY
-        (
-            [
-                [ALICE, VIEW_DOCUMENT],
-                [ALICE, VIEW_DOCUMENT],
-            ],
-            [EdgeType.ALLOW, EdgeType.DENY],
-            TieBreakerPolicy.ALL_ALLOW,
-            False,
-        ),
+        ((2, {EdgeType.ALLOW, EdgeType.DENY}), TieBreakerPolicy.ALL_ALLOW, False),
         # Two paths, both deny, tiebreaker policy ANY_ALLOW -- DENY
-        (
-            [
-                [ALICE, VIEW_DOCUMENT],
-                [ALICE, VIEW_DOCUMENT],
-            ],
-            [EdgeType.DENY, EdgeType.DENY],
-            TieBreakerPolicy.ANY_ALLOW,
-            False,
-        ),
+        ((2, {EdgeType.DENY}), TieBreakerPolicy.ANY_ALLOW, False),
     ],
 )
-def test_action_is_authorized(mock_backend, shortest_paths, terminal_edge_types, tie_breaker_policy, expected):
+def test_action_is_authorized(mock_backend, search_result, tie_breaker_policy, expected):
     graph = PermissionGraph(backend=mock_backend, tie_breaker_policy=tie_breaker_policy)
-    graph.backend.shortest_paths.return_value = shortest_paths
-    graph.backend.get_edge_type.side_effect = terminal_edge_types
+    graph.backend.search_between.return_value = search_result
     assert graph.action_is_authorized(ALICE, VIEW_DOCUMENT) is expected
+    graph.backend.search_between.assert_called_once_with(ALICE, VIEW_DOCUMENT)
+
+
+@pytest.mark.unit
+def test_authorize_many(graph):
+    bob = Actor(name="Bob")
+    edges = {ALICE.id: [(VIEW_DOCUMENT, EdgeType.ALLOW)], bob.id: [(VIEW_DOCUMENT, EdgeType.DENY)]}
+    graph.backend.get_edges_from.side_effect = lambda vertex: edges.get(vertex.id, [])
+    checks = [(ALICE, VIEW_DOCUMENT), (bob, VIEW_DOCUMENT), (ALICE, DOCUMENT)]
+    assert graph.authorize_many(checks) == [True, False, False]
+    # One search from each actor, which stops once its actions are reached
+    assert [call.args[0] for call in graph.backend.get_edges_from.call_args_list] == [ALICE, VIEW_DOCUMENT, bob]
+    graph.backend.shortest_paths_many.assert_not_called()
+
+
+@pytest.mark.unit
+def test_bulk_load(graph):
+    graph.bulk_load(
+        actors=[ALICE],
+        groups=[ADMINS],
+        resource_types=[DOCUMENT_TYPE],
+        resources=[DOCUMENT],
+        memberships=[(ALICE, ADMINS)],
+        allows=[(ADMINS, VIEW_DOCUMENT)],
+        denies=[(ALICE, VIEW_DOCUMENT)],
+    )
+    graph.backend.add_vertices.assert_called_once_with(
+        [ALICE, ADMINS, DOCUMENT_TYPE, DOCUMENT, VIEW_DOCUMENT], actions=[None, None, ["ViewDocument"], None, None]
+    )
+    graph.backend.add_edges.assert_called_once_with(
+        [
+            (EdgeType.MEMBER_OF, DOCUMENT, DOCUMENT_TYPE),
+            (EdgeType.MEMBER_OF, VIEW_DOCUMENT, DOCUMENT),
+            (EdgeType.MEMBER_OF, ALICE, ADMINS),
+            (EdgeType.ALLOW, ADMINS, VIEW_DOCUMENT),
+            (EdgeType.DENY, ALICE, VIEW_DOCUMENT),
+        ]
+    )
+
+
+@pytest.mark.unit
+def test_bulk_load_rolls_back_vertices(graph):
+    graph.backend.add_edges.side_effect = ValueError("There is already an edge")
+    with pytest.raises(ValueError):
+        graph.bulk_load(actors=[ALICE], groups=[ADMINS], memberships=[(ALICE, ADMINS), (ALICE, ADMINS)])
+    graph.backend.remove_vertices.assert_called_once_with([ALICE, ADMINS])
+    graph.backend.remove_vertex.assert_not_called()
 
 
 @pytest.mark.unit
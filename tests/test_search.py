@@ -0,0 +1,79 @@
+import pytest
+
+from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.search import ACTION_PATH_VTYPES, decide, search_from, search_to
+from permission_graph.structs import EdgeType, TieBreakerPolicy
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "final_edge_types,tie_breaker_policy,expected",
+    [
+        (set(), TieBreakerPolicy.ANY_ALLOW, False),
+        ({EdgeType.ALLOW}, TieBreakerPolicy.ANY_ALLOW, True),
+        ({EdgeType.DENY}, TieBreakerPolicy.ANY_ALLOW, False),
+        ({EdgeType.ALLOW, EdgeType.DENY}, TieBreakerPolicy.ANY_ALLOW, True),
+        ({EdgeType.ALLOW}, TieBreakerPolicy.ALL_ALLOW, True),
+        ({EdgeType.ALLOW, EdgeType.DENY}, TieBreakerPolicy.ALL_ALLOW, False),
+    ],
+)
+def test_decide(final_edge_types, tie_breaker_policy, expected):
+    assert decide(final_edge_types, tie_breaker_policy) is expected
+
+
+@pytest.mark.integration
+def test_search_from(alice, admins, document_type, document, view_document):
+    backend = IGraphMemoryBackend()
+    for vertex in (alice, admins, document, view_document):
+        backend.add_vertex(vertex)
+    backend.add_vertex(document_type, actions=document_type.actions)
+    backend.add_edge(EdgeType.MEMBER_OF, alice, admins)
+    backend.add_edge(EdgeType.MEMBER_OF, view_document, document)
+    backend.add_edge(EdgeType.ALLOW, admins, view_document)
+    backend.add_edge(EdgeType.DENY, alice, document)
+
+    reached = search_from(backend, alice)
+    assert set(reached) == {admins.id, view_document.id, document.id}
+    assert reached[view_document.id].depth == 2
+    assert reached[view_document.id].final_edge_types == {EdgeType.ALLOW}
+    assert reached[document.id].depth == 1
+    assert reached[document.id].final_edge_types == {EdgeType.DENY}
+
+
+@pytest.mark.integration
+def test_search_from_expand(alice, admins, document_type, document, view_document):
+    backend = IGraphMemoryBackend()
+    for vertex in (alice, admins, document, view_document):
+        backend.add_vertex(vertex)
+    backend.add_vertex(document_type, actions=document_type.actions)
+    backend.add_edge(EdgeType.MEMBER_OF, alice, admins)
+    backend.add_edge(EdgeType.MEMBER_OF, view_document, document)
+    backend.add_edge(EdgeType.MEMBER_OF, document, document_type)
+    backend.add_edge(EdgeType.ALLOW, admins, view_document)
+
+    reached = search_from(backend, alice, expand=ACTION_PATH_VTYPES)
+    # The resource is reached from the action, but its resource type is not
+    assert set(reached) == {admins.id, view_document.id, document.id}
+    assert reached[view_document.id].final_edge_types == {EdgeType.ALLOW}
+
+
+@pytest.mark.integration
+def test_search_to(alice, admins, document_type, document, view_document):
+    backend = IGraphMemoryBackend()
+    for vertex in (alice, admins, document, view_document):
+        backend.add_vertex(vertex)
+    backend.add_vertex(document_type, actions=document_type.actions)
+    backend.add_edge(EdgeType.MEMBER_OF, alice, admins)
+    backend.add_edge(EdgeType.MEMBER_OF, view_document, document)
+    backend.add_edge(EdgeType.ALLOW, admins, view_document)
+    backend.add_edge(EdgeType.DENY, alice, document)
+
+    reached = {r.vertex.id: r for r in search_to(backend, document)}
+    assert set(reached) == {alice.id, admins.id, view_document.id}
+    assert reached[view_document.id].depth == 1
+    assert reached[view_document.id].final_edge_types == {EdgeType.MEMBER_OF}
+    assert reached[admins.id].depth == 2
+    assert reached[admins.id].final_edge_types == {EdgeType.MEMBER_OF}
+    assert reached[alice.id].depth == 1
+    assert reached[alice.id].final_edge_types == {EdgeType.DENY}
+    assert [r.vertex for r in search_to(backend, alice)] == []
@@ -0,0 +1,61 @@
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.snapshot import Snapshot, read_snapshot, write_snapshot
+from permission_graph.structs import TieBreakerPolicy
+
+
+@pytest.mark.unit
+def test_write_and_read_snapshot(tmp_path):
+    snapshot = Snapshot.from_adjacency(
+        vertex_ids=["actor:Alice", "group:Admins", "action:Document:MyDoc:View"],
+        vtypes=["actor", "group", "action"],
+        adjacency=[[(1, "MEMBER_OF"), (2, "DENY")], [(2, "ALLOW")], []],
+        attributes={"foo": {1: "bar"}},
+    )
+    write_snapshot(tmp_path / "graph.pg", snapshot)
+    with read_snapshot(tmp_path / "graph.pg") as loaded:
+        assert loaded.vertex_ids == snapshot.vertex_ids
+        assert loaded.vtypes == snapshot.vtypes
+        assert loaded.offsets.tolist() == [0, 2, 3, 3]
+        assert loaded.targets.tolist() == [1, 2, 2]
+        assert loaded.edge_pairs() == [(0, 1), (0, 2), (1, 2)]
+        assert loaded.etypes == ["MEMBER_OF", "DENY", "ALLOW"]
+        assert loaded.attributes == {"foo": {1: "bar"}}
+
+
+@pytest.mark.unit
+def test_write_and_read_empty_snapshot(tmp_path):
+    write_snapshot(tmp_path / "graph.pg", Snapshot.from_adjacency(vertex_ids=[], vtypes=[], adjacency=[]))
+    with read_snapshot(tmp_path / "graph.pg") as loaded:
+        assert loaded.vertex_ids == []
+        assert loaded.targets.tolist() == []
+        assert loaded.edge_pairs() == []
+
+
+@pytest.mark.unit
+def test_read_snapshot_rejects_other_files(tmp_path):
+    (tmp_path / "graph.pg").write_bytes(b"not a snapshot, but long enough to hold a header")
+    with pytest.raises(ValueError):
+        read_snapshot(tmp_path / "graph.pg")
+
+
+@pytest.mark.unit
+def test_write_snapshot_rejects_null_bytes(tmp_path):
+    snapshot = Snapshot.from_adjacency(vertex_ids=["actor:\x00"], vtypes=["actor"], adjacency=[[]])
+    with pytest.raises(ValueError):
+        write_snapshot(tmp_path / "graph.pg", snapshot)
+
+
+@pytest.mark.integration
+def test_save_and_load_permission_graph(random_graph, tmp_path):
+    graph = random_graph(0, TieBreakerPolicy.ALL_ALLOW)
+    graph.save(tmp_path / "graph.pg")
+    loaded = PermissionGraph.load(tmp_path / "graph.pg", tie_breaker_policy=TieBreakerPolicy.ALL_ALLOW)
+    checks = [
+        (actor, action)
+        for actor in graph.backend.get_vertices("actor")
+        for action in graph.backend.get_vertices("action")
+    ]
+    assert loaded.authorize_many(checks) == graph.authorize_many(checks)
+    assert loaded.backend.get_vertices("resource_type") == graph.backend.get_vertices("resource_type")
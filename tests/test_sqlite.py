@@ -0,0 +1,94 @@
+import itertools
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.async_graph import AsyncPermissionGraph
+from permission_graph.backends.sqlite import SQLiteBackend
+from permission_graph.concurrent import ConcurrentPermissionGraph
+from permission_graph.metrics import MetricsRegistry
+from permission_graph.structs import EdgeType, Group, TieBreakerPolicy
+
+
+@pytest.mark.integration
+def test_file_database(tmp_path, alice, admins, view_document) -> None:
+    backend = SQLiteBackend(tmp_path / "graph.db")
+    backend.add_vertices([alice, admins, view_document])
+    backend.add_edges([(EdgeType.MEMBER_OF, alice, admins), (EdgeType.ALLOW, admins, view_document)])
+    assert backend._connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+    # Another connection can read while this one has a write in progress
+    reader = SQLiteBackend(tmp_path / "graph.db")
+    with backend._transaction():
+        backend.remove_edge(admins, view_document)
+        assert reader.edge_exists(admins, view_document)
+    assert not reader.edge_exists(admins, view_document)
+    backend.close()
+    reader.close()
+
+    reopened = SQLiteBackend(tmp_path / "graph.db")
+    assert reopened.get_vertices() == [alice, admins, view_document]
+    assert reopened.get_edges_from(alice) == [(admins, EdgeType.MEMBER_OF)]
+
+
+@pytest.mark.integration
+def test_copy_of_file_database(tmp_path, alice, admins, view_document) -> None:
+    backend = SQLiteBackend(tmp_path / "graph.db")
+    backend.add_vertices([alice, admins, view_document])
+    assert backend.persistent
+    assert not SQLiteBackend().persistent
+
+    # The copy is in memory, so its changes aren't saved
+    copy = backend.copy()
+    assert not copy.persistent
+    copy.add_edges([(EdgeType.ALLOW, alice, view_document)])
+    assert not backend.edge_exists(alice, view_document)
+    with pytest.raises(ValueError):
+        ConcurrentPermissionGraph(PermissionGraph(backend=backend))
+    with pytest.raises(ValueError):
+        AsyncPermissionGraph(PermissionGraph(backend=backend, metrics=MetricsRegistry()))
+    backend.close()
+    assert SQLiteBackend(tmp_path / "graph.db").get_edges_from(alice) == []
+
+
+@pytest.mark.integration
+def test_load_into_file_database(tmp_path, random_graph) -> None:
+    graph = random_graph(0)
+    graph.save(tmp_path / "graph.pg")
+    SQLiteBackend.load(tmp_path / "graph.pg", database=tmp_path / "graph.db").close()
+    with pytest.raises(ValueError):
+        SQLiteBackend.load(tmp_path / "graph.pg", database=tmp_path / "graph.db")
+    loaded = PermissionGraph(backend=SQLiteBackend(tmp_path / "graph.db"))
+    assert loaded.backend.get_vertices() == graph.backend.get_vertices()
+
+
+@pytest.mark.integration
+def test_search_between_fetches_each_frontier_at_once(alice, view_document) -> None:
+    backend = SQLiteBackend()
+    groups = [Group(name=f"group{i}") for i in range(10)]
+    staff = Group(name="Staff")
+    backend.add_vertices([alice, staff, view_document, *groups])
+    backend.add_edges(
+        [(EdgeType.MEMBER_OF, alice, group) for group in groups]
+        + [(EdgeType.MEMBER_OF, group, staff) for group in groups]
+        + [(EdgeType.ALLOW, staff, view_document)]
+    )
+    statements = []
+    backend._connection.set_trace_callback(statements.append)
+    assert backend.search_between(alice, view_document) == (3, {EdgeType.ALLOW})
+    # Back to Staff, back to the groups, then forward from Alice to them
+    assert len([statement for statement in statements if "FROM edges" in statement]) == 3
+
+
+@pytest.mark.system
+@pytest.mark.parametrize("tie_breaker_policy", list(TieBreakerPolicy))
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_igraph_backend(random_graph, tmp_path, seed, tie_breaker_policy) -> None:
+    graph = random_graph(seed, tie_breaker_policy=tie_breaker_policy)
+    graph.save(tmp_path / "graph.pg")
+    sqlite_graph = PermissionGraph.load(
+        tmp_path / "graph.pg", backend_class=SQLiteBackend, tie_breaker_policy=tie_breaker_policy
+    )
+    checks = list(itertools.product(graph.backend.get_vertices("actor"), graph.backend.get_vertices("action")))
+    assert sqlite_graph.authorize_many(checks) == graph.authorize_many(checks)
+    assert [sqlite_graph.action_is_authorized(*check) for check in checks] == graph.authorize_many(checks)
@@ -0,0 +1,14 @@
+import pytest
+
+from permission_graph.structs import Actor, VertexRef
+
+
+@pytest.mark.unit
+def test_vertex_ref_equality():
+    ref = VertexRef(id="actor:Alice", vtype="actor")
+    assert ref == Actor(name="Alice")
+    assert Actor(name="Alice") == ref
+    assert ref != Actor(name="Bob")
+    assert ref == VertexRef(id="actor:Alice", vtype="actor")
+    assert ref != "actor:Alice"
+    assert {ref: True}[VertexRef(id="actor:Alice", vtype="actor")]
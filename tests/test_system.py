@@ -3,9 +3,11 @@ import pytest
 
 from permission_graph import PermissionGraph
 from permission_graph.backends.igraph import IGraphMemoryBackend
+from permission_graph.cache import DecisionCache
 from permission_graph.structs import (
     Action,
     Actor,
+    EdgeType,
     Group,
     Resource,
     ResourceType,
@@ -72,3 +74,295 @@ def test_system(igraph):
     )
     igraph.allow(bob, Action(name="Share", resource_type="Directory", resource="Home"))
     assert igraph.action_is_authorized(bob, Action(name="Share", resource_type="Document", resource="MyDoc"))
+
+
+@pytest.mark.system
+@pytest.mark.integration
+@pytest.mark.parametrize("tie_breaker_policy", [TieBreakerPolicy.ANY_ALLOW, TieBreakerPolicy.ALL_ALLOW])
+def test_authorize_many_matches_action_is_authorized(tie_breaker_policy):
+    graph = PermissionGraph(tie_breaker_policy=tie_breaker_policy)
+    document_type = ResourceType(name="Document", actions=["View", "Edit"])
+    graph.add_resource_type(document_type)
+    document = Resource(name="MyDoc", resource_type="Document")
+    graph.add_resource(document)
+    view = Action(name="View", resource_type="Document", resource="MyDoc")
+    edit = Action(name="Edit", resource_type="Document", resource="MyDoc")
+
+    alice, bob, carol = Actor(name="Alice"), Actor(name="Bob"), Actor(name="Carol")
+    admins, public = Group(name="Admins"), Group(name="Public")
+    for actor in (alice, bob, carol):
+        graph.add_actor(actor)
+    for group in (admins, public):
+        graph.add_group(group)
+    graph.add_actor_to_group(alice, admins)
+    graph.add_actor_to_group(alice, public)
+    graph.add_actor_to_group(bob, public)
+    graph.allow(admins, view)
+    graph.deny(public, view)
+    graph.allow(admins, edit)
+    graph.deny(bob, edit)
+
+    checks = [(actor, action) for actor in (alice, bob, carol) for action in (view, edit)]
+    checks.append((alice, view))
+    assert graph.authorize_many(checks) == [graph.action_is_authorized(actor, action) for actor, action in checks]
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("tie_breaker_policy", list(TieBreakerPolicy))
+def test_authorize_many_diamond_lattice(diamond_graph, tie_breaker_policy, alice, view_document):
+    # 2 ** 40 shortest paths, which must not be enumerated
+    graph = diamond_graph(40, tie_breaker_policy)
+    expected = tie_breaker_policy == TieBreakerPolicy.ANY_ALLOW
+    assert graph.action_is_authorized(alice, view_document) is expected
+    assert graph.authorize_many([(alice, view_document)]) == [expected]
+
+
+@pytest.mark.system
+@pytest.mark.integration
+@pytest.mark.parametrize("lazy_actions", [False, True])
+def test_bulk_load_matches_incremental_load(random_graph, lazy_actions):
+    expected = random_graph(0, lazy_actions=lazy_actions)
+    backend = expected.backend
+    memberships, allows, denies = [], [], []
+    for source in backend.get_vertices("actor") + backend.get_vertices("group") + backend.get_vertices("action"):
+        for target, etype in backend.get_edges_from(source):
+            match etype:
+                case EdgeType.ALLOW:
+                    allows.append((source, target))
+                case EdgeType.DENY:
+                    denies.append((source, target))
+                case EdgeType.MEMBER_OF if target.vtype == "group":
+                    memberships.append((source, target))
+
+    graph = PermissionGraph(lazy_actions=lazy_actions)
+    graph.bulk_load(
+        actors=backend.get_vertices("actor"),
+        groups=backend.get_vertices("group"),
+        resource_types=backend.get_vertices("resource_type"),
+        resources=backend.get_vertices("resource"),
+        memberships=memberships,
+        allows=allows,
+        denies=denies,
+    )
+    assert sorted(v.id for v in graph.backend.get_vertices()) == sorted(v.id for v in backend.get_vertices())
+    checks = [(actor, action) for actor in backend.get_vertices("actor") for action in backend.get_vertices("action")]
+    assert graph.authorize_many(checks) == expected.authorize_many(checks)
+
+    with pytest.raises(ValueError):
+        graph.bulk_load(actors=[Actor(name="New")], allows=allows[:1])
+    assert not graph.backend.vertex_exists(Actor(name="New"))
+
+
+@pytest.mark.system
+@pytest.mark.integration
+@pytest.mark.parametrize("seed", range(5))
+def test_lazy_actions_match_eager_actions(random_graph, seed):
+    eager = random_graph(seed)
+    lazy = random_graph(seed, lazy_actions=True)
+    group = Group(name="group0")
+
+    def assert_same_decisions():
+        actors = eager.backend.get_vertices("actor")
+        actions = eager.backend.get_vertices("action")
+        checks = [(actor, action) for actor in actors for action in actions]
+        expected = eager.authorize_many(checks)
+        assert lazy.authorize_many(checks) == expected
+        assert [lazy.action_is_authorized(actor, action) for actor, action in checks] == expected
+        for action in actions:
+            assert sorted(a.id for a in lazy.actors_authorized_for(action)) == sorted(
+                a.id for a in eager.actors_authorized_for(action)
+            )
+        # Only actions with ALLOW or DENY edges are in the backend
+        lazy_actions = lazy.backend.get_vertices("action")
+        assert {action.id for action in lazy_actions} <= {action.id for action in actions}
+        for action in lazy_actions:
+            assert lazy.backend.get_vertices_to(action) or len(lazy.backend.get_vertices_from(action)) > 1
+
+    assert_same_decisions()
+    granted = [target for target in eager.backend.get_vertices_from(group) if target.vtype == "action"]
+    for graph in (eager, lazy):
+        graph.update_resource_type_actions("Document", ["View", "Share"])
+        graph.remove_resource(Resource(name="folder0", resource_type="Folder"))
+        for target in granted:
+            if graph.backend.edge_exists(group, target):
+                graph.revoke(group, target)
+        graph.remove_actor(Actor(name="actor0"))
+    assert_same_decisions()
+    # No Share action has an edge yet
+    assert len(lazy.backend.get_vertices("action")) < len(eager.backend.get_vertices("action"))
+
+    # Actions that aren't in the backend must still be valid
+    alice = Actor(name="actor1")
+    for action in (
+        Action(name="Edit", resource_type="Document", resource="document0"),
+        Action(name="View", resource_type="Document", resource="missing"),
+    ):
+        with pytest.raises(ValueError):
+            lazy.action_is_authorized(alice, action)
+        with pytest.raises(ValueError):
+            lazy.allow(alice, action)
+        assert not lazy.backend.vertex_exists(action)
+    share = Action(name="Share", resource_type="Document", resource="document0")
+    with pytest.raises(ValueError):
+        lazy.allow(Actor(name="missing"), share)
+    assert not lazy.backend.vertex_exists(share)
+    lazy.allow(alice, share)
+    assert lazy.action_is_authorized(alice, share)
+
+
+@pytest.mark.system
+@pytest.mark.integration
+@pytest.mark.parametrize("lazy_actions", [False, True])
+def test_update_and_remove_resource_type(random_graph, lazy_actions):
+    graph = random_graph(0, lazy_actions=lazy_actions)
+    documents = graph.backend.get_vertices_to(graph.backend.vertex_factory("resource_type:Document"))
+    progress = []
+    graph.update_resource_type_actions(
+        "Document", ["View", "Share"], batch_size=2, progress=lambda done, total: progress.append((done, total))
+    )
+    assert progress == [(2, 3), (3, 3)]
+    assert graph.backend.vertex_factory("resource_type:Document").actions == ["View", "Share"]
+    actions = {action.id for action in graph.backend.get_vertices("action") if action.resource_type == "Document"}
+    assert not any(action.endswith(":Edit") for action in actions)
+    if not lazy_actions:
+        assert actions == {f"action:Document:{d.id.split(':')[-1]}:{a}" for d in documents for a in ["View", "Share"]}
+
+    progress = []
+    graph.remove_resource_type(
+        graph.backend.vertex_factory("resource_type:Document"),
+        batch_size=2,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+    assert progress == [(2, 3), (3, 3)]
+    assert not any(
+        vertex.id.startswith(("action:Document:", "resource:Document:")) for vertex in graph.backend.get_vertices()
+    )
+    assert not graph.backend.vertex_exists(ResourceType(name="Document", actions=[]))
+    # Lazy actions with edges only from the removed ones are removed too
+    for action in graph.backend.get_vertices("action") if lazy_actions else []:
+        assert graph.backend.get_vertices_to(action) or len(graph.backend.get_vertices_from(action)) > 1
+
+
+@pytest.mark.system
+@pytest.mark.integration
+def test_update_resource_type_actions_with_repeated_actions(random_graph, monkeypatch):
+    graph = random_graph(0)
+    document_type = graph.backend.vertex_factory("resource_type:Document")
+    documents = graph.backend.get_vertices_to(document_type)
+    graph.update_resource_type_actions("Document", ["View", "Share", "Share", "View"])
+    assert graph.backend.vertex_factory("resource_type:Document").actions == ["View", "Share"]
+    assert len([a for a in graph.backend.get_vertices("action") if a.id.endswith(":Share")]) == len(documents)
+
+    # A failed update leaves the resource type's actions as they were
+    def add_vertices(vertices, **kwargs):
+        raise ValueError("Failed")
+
+    monkeypatch.setattr(graph.backend, "add_vertices", add_vertices)
+    with pytest.raises(ValueError):
+        graph.update_resource_type_actions("Document", ["View", "Share", "Print"])
+    assert graph.backend.vertex_factory("resource_type:Document").actions == ["View", "Share"]
+
+
+@pytest.mark.system
+@pytest.mark.integration
+@pytest.mark.parametrize("cached", [False, True])
+def test_authorize_with_handles(random_graph, cached):
+    graph = random_graph(0)
+    if cached:
+        graph.cache = DecisionCache()
+    backend = graph.backend
+    checks = [(actor, action) for actor in backend.get_vertices("actor") for action in backend.get_vertices("action")]
+    handle_checks = [(backend.get_handle(actor), backend.get_handle(action)) for actor, action in checks]
+    expected = graph.authorize_many(checks)
+    assert graph.authorize_many(handle_checks) == expected
+    assert [graph.action_is_authorized(actor, action) for actor, action in handle_checks] == expected
+
+    # Handles stay valid after other vertices are removed
+    removed = backend.get_vertices("actor")[0]
+    graph.remove_actor(removed)
+    remaining = [(check, handle_check) for check, handle_check in zip(checks, handle_checks) if check[0] != removed]
+    assert graph.authorize_many([handle_check for _, handle_check in remaining]) == graph.authorize_many(
+        [check for check, _ in remaining]
+    )
+
+
+@pytest.mark.system
+@pytest.mark.integration
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("tie_breaker_policy", [TieBreakerPolicy.ANY_ALLOW, TieBreakerPolicy.ALL_ALLOW])
+def test_actors_authorized_for_matches_action_is_authorized(random_graph, seed, tie_breaker_policy):
+    graph = random_graph(seed, tie_breaker_policy)
+    actors = graph.backend.get_vertices("actor")
+    for action in graph.backend.get_vertices("action"):
+        authorized = list(graph.actors_authorized_for(action))
+        assert all(isinstance(actor, Actor) for actor in authorized)
+        assert sorted(actor.id for actor in authorized) == sorted(
+            actor.id for actor in actors if graph.action_is_authorized(actor, action)
+        )
+
+    with pytest.raises(ValueError):
+        graph.actors_authorized_for(Action(name="View", resource_type="Document", resource="missing"))
+
+
+@pytest.mark.system
+@pytest.mark.integration
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("tie_breaker_policy", [TieBreakerPolicy.ANY_ALLOW, TieBreakerPolicy.ALL_ALLOW])
+def test_authorized_actions_matches_action_is_authorized(random_graph, seed, tie_breaker_policy):
+    graph = random_graph(seed, tie_breaker_policy)
+    actions = graph.backend.get_vertices("action")
+    document_type = graph.backend.vertex_factory("resource_type:Document")
+    folder0 = Resource(name="folder0", resource_type="Folder")
+    for actor in graph.backend.get_vertices("actor"):
+        expected = [action for action in actions if graph.action_is_authorized(actor, action)]
+        pages = list(graph.authorized_actions(actor, page_size=2))
+        assert all(1 <= len(page) <= 2 for page in pages)
+        assert sorted(action.id for page in pages for action in page) == sorted(action.id for action in expected)
+
+        documents = [a for page in graph.authorized_actions(actor, resource_type=document_type) for a in page]
+        assert sorted(a.id for a in documents) == sorted(a.id for a in expected if a.resource_type == "Document")
+        folder = [a for page in graph.authorized_actions(actor, resource=folder0) for a in page]
+        assert sorted(a.id for a in folder) == sorted(a.id for a in expected if a.resource == "folder0")
+        assert list(graph.authorized_actions(actor, resource_type=document_type, resource=folder0)) == []
+
+    with pytest.raises(ValueError):
+        graph.authorized_actions(Actor(name="missing"))
+    with pytest.raises(ValueError):
+        graph.authorized_actions(actor, page_size=0)
+
+
+@pytest.mark.system
+@pytest.mark.integration
+def test_paths_to_targets():
+    graph = PermissionGraph()
+    graph.add_resource_type(ResourceType(name="Document", actions=["View", "Edit"]))
+    graph.add_resource(Resource(name="MyDoc", resource_type="Document"))
+    view = Action(name="View", resource_type="Document", resource="MyDoc")
+    edit = Action(name="Edit", resource_type="Document", resource="MyDoc")
+    alice = Actor(name="Alice")
+    admins, editors = Group(name="Admins"), Group(name="Editors")
+    graph.add_actor(alice)
+    for group in (admins, editors):
+        graph.add_group(group)
+        graph.add_actor_to_group(alice, group)
+    graph.allow(admins, view)
+    graph.allow(editors, view)
+    graph.allow(admins, edit)
+    # A cycle of action propagation
+    graph.allow(view, edit)
+    graph.allow(edit, view)
+
+    paths = graph.paths_to_targets(alice, Action)
+    assert sorted(paths, key=str) == sorted(
+        [[view, admins, alice], [view, editors, alice], [edit, admins, alice]], key=str
+    )
+    assert graph.paths_to_targets(alice, Group, prefix=[view]) == [[admins, alice, view], [editors, alice, view]]
+    assert list(graph.iter_paths_to_targets(alice, Action, max_paths=1)) == paths[:1]
+    assert graph.paths_to_targets(alice, Action, max_depth=1) == []
+
+    # Searching backwards stops at the first Actor or Group
+    paths = graph.paths_to_targets(edit, (Actor, Group), reverse=True)
+    assert paths == [[admins, edit], [editors, view, edit]]
+    # Only shortest paths are followed, and the cycle between the actions doesn't stop the search
+    assert graph.paths_to_targets(edit, Actor, reverse=True) == [[alice, admins, edit]]
+    assert graph.paths_to_targets(view, Actor, reverse=True) == [[alice, admins, view], [alice, editors, view]]
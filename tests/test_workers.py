@@ -0,0 +1,162 @@
+import itertools
+
+import pytest
+
+from permission_graph import PermissionGraph
+from permission_graph.backends.sqlite import SQLiteBackend
+from permission_graph.changelog import ChangeLog, FileSink, read_changes
+from permission_graph.structs import (
+    Action,
+    Actor,
+    Group,
+    Resource,
+    ResourceType,
+    TieBreakerPolicy,
+)
+from permission_graph.workers import WorkerPool
+
+
+def build_graph(n_actors: int = 20, n_resources: int = 10) -> tuple[PermissionGraph, list[Actor], list[Action]]:
+    """Return a graph where even actors are in a group allowed to view even documents."""
+    graph = PermissionGraph()
+    graph.add_resource_type(ResourceType(name="Document", actions=["View"]))
+    actions = []
+    for i in range(n_resources):
+        graph.add_resource(Resource(name=f"doc{i}", resource_type="Document"))
+        actions.append(Action(name="View", resource_type="Document", resource=f"doc{i}"))
+    actors = [Actor(name=f"actor{i}") for i in range(n_actors)]
+    graph.add_group(Group(name="staff"))
+    for i, actor in enumerate(actors):
+        graph.add_actor(actor)
+        if i % 2 == 0:
+            graph.add_actor_to_group(actor, Group(name="staff"))
+    for action in actions[::2]:
+        graph.allow(Group(name="staff"), action)
+    return graph, actors, actions
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_worker_pool(start_method):
+    graph, actors, actions = build_graph()
+    checks = list(itertools.product(actors, actions))
+    with WorkerPool(graph, processes=2, start_method=start_method) as pool:
+        assert pool.authorize_many(checks) == graph.authorize_many(checks)
+        assert pool.authorize_many([]) == []
+        assert pool.action_is_authorized(actors[0], actions[0])
+        assert not pool.action_is_authorized(actors[1], actions[0])
+        with pytest.raises(ValueError):
+            pool.action_is_authorized(Actor(name="missing"), actions[0])
+        # The workers keep working after a failed check
+        assert pool.action_is_authorized(actors[0], actions[0])
+
+
+@pytest.mark.integration
+def test_forked_workers_do_not_inherit_sqlite_connection(tmp_path, monkeypatch):
+    graph, actors, actions = build_graph()
+    graph.save(tmp_path / "graph.pg")
+    graph = PermissionGraph.load(tmp_path / "graph.pg", backend_class=SQLiteBackend)
+    saved = []
+    monkeypatch.setattr(graph, "save", lambda path: saved.append(path) or PermissionGraph.save(graph, path))
+    checks = list(itertools.product(actors, actions))
+    with WorkerPool(graph, processes=2, start_method="fork") as pool:
+        # The workers load a snapshot instead
+        assert len(saved) == 1
+        assert pool.authorize_many(checks) == graph.authorize_many(checks)
+
+
+@pytest.mark.integration
+def test_publish():
+    graph, actors, actions = build_graph()
+    with WorkerPool(graph, processes=2) as pool:
+        version = pool.publish(
+            [
+                ("add_actor", (Actor(name="new"),)),
+                ("add_actor_to_group", (Actor(name="new"), Group(name="staff"))),
+                ("deny", (actors[0], actions[0])),
+            ]
+        )
+        assert version == pool.version == 1
+        # Both workers see the changes
+        for _ in range(2):
+            assert pool.action_is_authorized(Actor(name="new"), actions[0])
+            assert not pool.action_is_authorized(actors[0], actions[0])
+
+        with pytest.raises(ValueError):
+            pool.publish([("revoke", (actors[0], actions[0])), ("save", ("graph.pg",))])
+        # Changes before the failed one are still published
+        assert pool.version == 2
+        assert pool.action_is_authorized(actors[0], actions[0])
+
+        checks = list(itertools.product(actors, actions))
+        assert pool.authorize_many(checks) == graph.authorize_many(checks)
+
+
+@pytest.mark.integration
+def test_workers_do_not_record_changes(tmp_path):
+    graph, actors, actions = build_graph()
+    path = tmp_path / "changes.log"
+    with FileSink(path) as sink:
+        graph.changelog = ChangeLog(sink=sink)
+        with WorkerPool(graph, processes=3, start_method="fork") as pool:
+            pool.publish([("allow", (actors[1], actions[1]))])
+            assert pool.action_is_authorized(actors[1], actions[1])
+    # Once by the parent, not once more by each worker
+    assert [entry.method for entry in read_changes(path)] == ["allow"]
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_workers_keep_settings(random_graph, start_method):
+    graph = random_graph(0, TieBreakerPolicy.ALL_ALLOW, lazy_actions=True, nested_groups=True, group_closure=True)
+    actor, group = Actor(name="actor0"), Group(name="group0")
+    # Not added to the graph until it is first granted
+    share = Action(name="Share", resource_type="Document", resource="document0")
+    graph.update_resource_type_actions("Document", ["View", "Edit", "Share"])
+    with WorkerPool(graph, processes=2, start_method=start_method) as pool:
+        assert not pool.action_is_authorized(actor, share)
+        pool.publish([("add_actor_to_group", (actor, group)), ("allow", (group, share))])
+        checks = list(itertools.product(graph.backend.get_vertices("actor"), graph.backend.get_vertices("action")))
+        assert pool.authorize_many(checks) == graph.authorize_many(checks)
+        assert pool.action_is_authorized(actor, share) == graph.action_is_authorized(actor, share)
+
+
+@pytest.mark.integration
+def test_failed_change_in_worker():
+    graph, actors, actions = build_graph()
+    with WorkerPool(graph, processes=2, start_method="fork") as pool:
+        # Added behind the workers' backs, so they can't add it to a group
+        late = Actor(name="late")
+        graph.add_actor(late)
+        with pytest.raises(ValueError):
+            pool.publish([("add_actor_to_group", (late, Group(name="staff"))), ("allow", (actors[1], actions[1]))])
+        assert pool.version == 1
+        # The workers keep serving, with the changes after the failed one applied
+        for _ in range(2):
+            assert pool.action_is_authorized(actors[1], actions[1])
+
+
+@pytest.mark.integration
+def test_failed_change_in_parent_and_worker():
+    graph, actors, actions = build_graph()
+    with WorkerPool(graph, processes=2, start_method="fork") as pool:
+        late = Actor(name="late")
+        graph.add_actor(late)
+        with pytest.raises(ValueError, match="actor:missing") as excinfo:
+            # The workers fail the first change, and the parent the second
+            pool.publish(
+                [("add_actor_to_group", (late, Group(name="staff"))), ("allow", (Actor(name="missing"), actions[1]))]
+            )
+        assert "A worker failed to apply version 1" in str(excinfo.value.__cause__)
+        assert pool.version == 1
+
+
+@pytest.mark.integration
+def test_publish_resource_type_actions():
+    graph, actors, actions = build_graph()
+    share = Action(name="Share", resource_type="Document", resource="doc0")
+    with WorkerPool(graph, processes=2) as pool:
+        pool.publish([("update_resource_type_actions", ("Document", ["View", "Share"])), ("allow", (actors[0], share))])
+        for _ in range(2):
+            assert pool.action_is_authorized(actors[0], share)
+            assert not pool.action_is_authorized(actors[1], share)